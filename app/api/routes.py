@@ -1,58 +1,520 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, Query
+from fastapi import APIRouter, File, UploadFile, HTTPException, Query, Request
+from fastapi.responses import FileResponse, StreamingResponse
 import cv2
 import numpy as np
 import base64
+import asyncio
+import os
+import tempfile
+import time
+import traceback
+import weakref
+from contextlib import asynccontextmanager
 from typing import List, Optional
 
+import psutil
+
 from app.models.detector import detector, COCO_CLASSES
-from app.core.config import BATCH_PROCESSING
+from app.models.registry import get_model_registry, ModelRegistryConfig, UnknownModelError
+from app.core.config import BATCH_PROCESSING, MICRO_BATCHING, INFERENCE_EXECUTOR, JOBS, RESULT_CACHE, MODEL_REGISTRY, PROFILING, ANNOTATION_STYLE
+from app.utils.micro_batcher import get_micro_batcher, MicroBatcher, MicroBatchConfig
+from app.utils.inference_executor import (
+    get_inference_executor, InferenceExecutorConfig, run_blocking
+)
+from app.utils.serialization import RESULT_FORMATS, build_class_table, dumps_json, get_serializer_info, negotiated_response
+from app.utils.annotation import ANNOTATION_FORMATS, AnnotationOptions, encode_annotated_image
+from app.utils.box_renderer import get_box_renderer, RenderStyle
+from app.utils.image_decoder import ParallelImageDecoder, decode_image
+from app.utils.result_cache import get_result_cache, ResultCacheConfig
+from app.utils.job_manager import (
+    get_job_manager, JobConfig, JobQueueFull, JOB_COMPLETED, JOB_QUEUED, JOB_RUNNING
+)
+from app.utils.metrics import get_metrics, STAGE_UPLOAD_READ, STAGE_DECODE, STAGE_ANNOTATE, STAGE_ENCODE
+from app.utils.profiling import get_request_profiler, ProfilingConfig
 
 router = APIRouter()
 
+# 专用推理执行器，所有模型调用都经由它执行，事件循环只处理 I/O
+inference_executor = get_inference_executor(InferenceExecutorConfig(
+    max_workers=INFERENCE_EXECUTOR["max_workers"]
+))
+
+# 单张检测请求的微批处理调度器
+micro_batch_config = MicroBatchConfig(
+    enabled=MICRO_BATCHING["enabled"],
+    max_wait_ms=MICRO_BATCHING["max_wait_ms"],
+    max_batch_size=MICRO_BATCHING["max_batch_size"]
+)
+micro_batcher = get_micro_batcher(detector, micro_batch_config, executor=inference_executor)
+
+# 多模型注册表：请求通过 model 参数选择模型，非默认模型按需加载并按 LRU 卸载
+model_registry = get_model_registry(detector, ModelRegistryConfig(
+    max_models=MODEL_REGISTRY["max_models"],
+    memory_budget_mb=MODEL_REGISTRY["memory_budget_mb"],
+    allowed_models=MODEL_REGISTRY["allowed_models"],
+    custom_models=MODEL_REGISTRY["custom_models"],
+    loader_threads=MODEL_REGISTRY["loader_threads"]
+))
+
+# 非默认模型的微批处理调度器，模型被卸载时一并释放
+model_micro_batchers = {}
+model_registry.add_eviction_listener(lambda name: model_micro_batchers.pop(name, None))
+
+# 非默认模型的批处理器（保留自适应批大小的统计），模型被卸载时一并释放
+model_batch_processors = {}
+model_registry.add_eviction_listener(lambda name: model_batch_processors.pop(name, None))
+
+# 标注图像的检测框绘制器（所有模型共用）
+box_renderer = get_box_renderer(RenderStyle(**ANNOTATION_STYLE))
+
+# 单张检测结果缓存
+result_cache = get_result_cache(ResultCacheConfig(
+    enabled=RESULT_CACHE["enabled"],
+    max_entries=RESULT_CACHE["max_entries"],
+    ttl_seconds=RESULT_CACHE["ttl_seconds"],
+    max_memory_mb=RESULT_CACHE["max_memory_mb"]
+))
+
+# 视频/批量检测的后台任务管理器
+job_manager = get_job_manager(JobConfig(
+    max_workers=JOBS["max_workers"],
+    max_pending_jobs=JOBS["max_pending_jobs"],
+    max_retained_jobs=JOBS["max_retained_jobs"]
+))
+
+# 分阶段耗时等服务指标，由 /metrics 导出
+metrics = get_metrics()
+
+# 单请求分析器
+request_profiler = get_request_profiler(ProfilingConfig(
+    enabled=PROFILING["enabled"],
+    sample_rate=PROFILING["sample_rate"],
+    max_profiles=PROFILING["max_profiles"],
+    **({"output_dir": PROFILING["output_dir"]} if PROFILING["output_dir"] else {})
+))
+
+
+def _collect_queue_metrics():
+    """抓取 /metrics 时采集推理队列、微批处理、任务和缓存的瞬时值"""
+    executor_stats = inference_executor.get_stats()
+    jobs_stats = job_manager.get_stats()
+    cache_stats = result_cache.get_stats()
+    samples = [
+        ("yolo_inference_queue_depth", "Calls waiting for the inference thread", {}, executor_stats["queue_depth"]),
+        ("yolo_inference_in_flight", "Calls running on the inference thread", {}, executor_stats["in_flight"]),
+        ("yolo_result_cache_entries", "Entries in the detect result cache", {}, cache_stats["entries"]),
+        ("yolo_result_cache_inflight", "Detect computations shared by concurrent identical requests", {}, cache_stats["inflight"]),
+        ("yolo_loaded_models", "Models loaded on demand besides the default model", {}, len(model_registry.get_stats()["loaded_models"])),
+        ("yolo_process_resident_memory_bytes", "Resident set size of the server process", {}, psutil.Process().memory_info().rss),
+    ]
+    for status in (JOB_QUEUED, JOB_RUNNING):
+        samples.append(("yolo_jobs", "Background jobs by status", {"status": status}, jobs_stats[status]))
+    for batcher in [micro_batcher, *model_micro_batchers.values()]:
+        samples.append((
+            "yolo_micro_batch_pending", "Detect requests waiting to be micro-batched",
+            {"model": batcher.detector.model_name or ""}, batcher.get_stats()["pending"]
+        ))
+    return samples
+
+
+metrics.add_collector(_collect_queue_metrics)
+
+
+def _validate_result_format(result_format: str):
+    """校验结果格式参数"""
+    if result_format not in RESULT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid format: {result_format}, expected one of {list(RESULT_FORMATS)}"
+        )
+
+
+def _encode_image_data_url(image: np.ndarray) -> str:
+    """将图像编码为 JPEG 格式的 data URL"""
+    _, buffer = cv2.imencode('.jpg', image)
+    annotated_b64 = base64.b64encode(buffer).decode('utf-8')
+    return f"data:image/jpeg;base64,{annotated_b64}"
+
+
+def _encode_timed(image: np.ndarray, endpoint: str, model: Optional[str]) -> str:
+    """编码标注图像为 data URL 并记录编码耗时"""
+    with metrics.time_stage(STAGE_ENCODE, endpoint, model):
+        return _encode_image_data_url(image)
+
+
+def _decode_timed(contents: bytes, endpoint: str, model: Optional[str]) -> Optional[np.ndarray]:
+    """解码上传的图片并记录解码耗时"""
+    with metrics.time_stage(STAGE_DECODE, endpoint, model):
+        return decode_image(contents)
+
+
+def _render_annotation(raw_result, options: AnnotationOptions, endpoint: str, model: Optional[str]) -> str:
+    """渲染并编码一张标注图像（在推理线程以外执行），分别记录标注和编码耗时"""
+    with metrics.time_stage(STAGE_ANNOTATE, endpoint, model):
+        annotated = detector.render_annotation(raw_result)
+    with metrics.time_stage(STAGE_ENCODE, endpoint, model):
+        return encode_annotated_image(annotated, options)
+
+
+def _format_stream_item(item: dict, use_sse: bool) -> bytes:
+    """把一条流式结果格式化为 NDJSON 行或 SSE 事件"""
+    if use_sse:
+        return b"event: " + item["type"].encode() + b"\ndata: " + dumps_json(item) + b"\n\n"
+    return dumps_json(item) + b"\n"
+
+
+def _remove_file(path: str):
+    """删除临时文件（已不存在时忽略）"""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+@asynccontextmanager
+async def _tracking_session(model_detector):
+    """
+    在整个视频处理期间持有检测器的跟踪锁，同一模型的视频跟踪依次执行
+
+    在默认线程池中阻塞等待锁，等待期间不占用推理线程，也不阻塞事件循环，等待者按锁的唤醒顺序依次执行；
+    等待中被取消时，锁在拿到之后立即释放，不会被遗留
+    """
+    lock = model_detector.track_lock
+    acquiring = asyncio.get_running_loop().run_in_executor(None, lock.acquire)
+    try:
+        await asyncio.shield(acquiring)
+    except asyncio.CancelledError:
+        # 线程中的 acquire 无法中断，拿到锁后由回调释放
+        acquiring.add_done_callback(
+            lambda f: lock.release() if not f.cancelled() and f.exception() is None else None
+        )
+        raise
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+def _parse_class_list(classes: Optional[str]) -> Optional[List[str]]:
+    """解析逗号分隔的类别参数"""
+    if not classes:
+        return None
+    return [c.strip() for c in classes.split(',')]
+
+
+async def _read_uploads(image_files: List[UploadFile], endpoint: str, model: Optional[str] = None):
+    """
+    读取上传图片的字节数据（不写入磁盘），记录整个请求的上传读取耗时
+
+    Returns:
+        (字节数据列表, 对应的文件名列表)
+    """
+    blobs = []
+    filenames = []
+    started = time.perf_counter()
+    for file in image_files:
+        if not file.content_type.startswith('image/'):
+            raise HTTPException(status_code=400, detail=f"Invalid file type: {file.content_type}")
+        blobs.append(await file.read())
+        filenames.append(file.filename)
+    metrics.observe_stage(STAGE_UPLOAD_READ, time.perf_counter() - started, endpoint, model)
+    return blobs, filenames
+
+
+def _decode_observer(endpoint: str, model: Optional[str]):
+    """ParallelImageDecoder 的解码耗时回调"""
+    return lambda seconds: metrics.observe_stage(STAGE_DECODE, seconds, endpoint, model)
+
+
+def _video_stage_observer(endpoint: str, model: Optional[str]):
+    """VideoPipeline 的阶段耗时回调，记录逐帧的解码、跟踪、标注和编码耗时"""
+    return lambda stage, seconds: metrics.observe_stage(stage, seconds, endpoint, model)
+
+
+async def _read_batch_images(image_files: List[UploadFile], max_workers: int, endpoint: str, model: Optional[str] = None):
+    """
+    读取并在内存中并行解码上传的图片
+
+    Args:
+        image_files: 上传的图片文件
+        max_workers: 解码线程数
+        endpoint: 端点（指标标签）
+        model: 模型名称（指标标签）
+
+    Returns:
+        (图像列表, 对应的文件名列表, 解码失败的文件名列表)
+    """
+    blobs, filenames = await _read_uploads(image_files, endpoint, model)
+    with ParallelImageDecoder(max_workers, decode_observer=_decode_observer(endpoint, model)) as decoder:
+        decoded = await decoder.decode_all(blobs)
+
+    images = [image for image in decoded if image is not None]
+    if not images:
+        raise HTTPException(status_code=400, detail="No valid images found")
+
+    valid_filenames = [name for name, image in zip(filenames, decoded) if image is not None]
+    failed_files = [name for name, image in zip(filenames, decoded) if image is None]
+    return images, valid_filenames, failed_files
+
+
+def _submit_batch_job(images: List[np.ndarray], filenames: List[str], failed_files: List[str],
+                      class_list: Optional[List[str]], model_detector=None, endpoint: str = "/api/v1/jobs/batch"):
+    """
+    提交批量检测后台任务
+
+    推理在推理线程中执行，BatchProcessor 每处理完一块就更新任务进度，并在任务被取消时停止；
+    进程池模式下推理在工作进程中执行，任务线程直接等待结果，不占用推理线程
+    """
+    def run(job):
+        batch_processor = _get_batch_processor(model_detector)
+        batch_options = dict(classes=class_list, return_annotated=True, progress_callback=job.set_progress)
+        if batch_processor.uses_process_pool:
+            results = batch_processor.process_batch(images, **batch_options)
+        else:
+            results = inference_executor.call(batch_processor.process_batch, images, **batch_options)
+
+        model_name = batch_processor.detector.model_name
+        for result, filename in zip(results, filenames):
+            result["filename"] = filename
+            metrics.observe_result(result, endpoint, model_name)
+            if result.get("annotated_image") is not None:
+                result["annotated_image"] = _encode_timed(result["annotated_image"], endpoint, model_name)
+
+        return {
+            "total_processed": len(results),
+            "failed_count": len(failed_files),
+            "failed_files": failed_files,
+            "results": results
+        }
+
+    try:
+        return job_manager.submit("batch", run)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+
+def _get_batch_processor(model_detector=None):
+    """获取批处理器：默认模型使用全局批处理器，其他模型使用绑定该模型的批处理器"""
+    from app.utils.batch_processor import get_batch_processor, BatchConfig, BatchProcessor
+
+    config = BatchConfig(
+        batch_size=BATCH_PROCESSING["default_batch_size"],
+        max_workers=BATCH_PROCESSING["default_max_workers"],
+        memory_threshold=BATCH_PROCESSING["memory_threshold"],
+        enable_shape_bucketing=BATCH_PROCESSING["enable_shape_bucketing"],
+        imgsz=BATCH_PROCESSING["imgsz"],
+        execution_mode=BATCH_PROCESSING["execution_mode"],
+        process_workers=BATCH_PROCESSING["process_workers"],
+        threads_per_worker=BATCH_PROCESSING["threads_per_worker"],
+        adaptive_batching=BATCH_PROCESSING["adaptive_batching"],
+        target_latency_ms=BATCH_PROCESSING["target_latency_ms"],
+        min_batch_size=BATCH_PROCESSING["min_batch_size"],
+        max_adaptive_batch_size=BATCH_PROCESSING["max_adaptive_batch_size"]
+    )
+    if model_detector is None or model_detector is detector:
+        return get_batch_processor(detector, config)
+
+    processor = model_batch_processors.get(model_detector.model_name)
+    if processor is None or processor.detector is not model_detector:
+        processor = BatchProcessor(model_detector, config)
+        model_batch_processors[model_detector.model_name] = processor
+    return processor
+
+
+def _warmup_in_executor(model_detector):
+    """在推理线程中预热新加载的模型（从模型加载线程调用）"""
+    inference_executor.call(model_detector.warmup)
+
+
+async def _resolve_detector(model: Optional[str]):
+    """
+    根据 model 参数获取检测器
+
+    已加载的模型直接返回；未加载的模型在模型加载线程中加载（下载、导出都不占用推理线程），
+    只有预热推理进入推理线程，同一模型的并发请求共用一次加载
+
+    Raises:
+        HTTPException: 模型不在允许列表中
+    """
+    if model_registry.is_default(model):
+        return detector
+    try:
+        model_registry.validate(model)
+    except UnknownModelError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    model_detector = model_registry.lookup(model)
+    if model_detector is None:
+        model_detector = await asyncio.wrap_future(model_registry.load_async(model, warmup=_warmup_in_executor))
+    return model_detector
+
+
+async def shutdown_micro_batchers():
+    """关闭所有模型的微批处理调度器（取消等待中的请求和进行中的批次）"""
+    for batcher in [micro_batcher, *model_micro_batchers.values()]:
+        await batcher.shutdown()
+
+
+def _get_micro_batcher(model_detector) -> MicroBatcher:
+    """获取模型对应的微批处理调度器"""
+    if model_detector is detector:
+        return micro_batcher
+    name = model_detector.model_name
+    batcher = model_micro_batchers.get(name)
+    if batcher is None or batcher.detector is not model_detector:
+        batcher = MicroBatcher(model_detector, micro_batch_config, executor=inference_executor)
+        model_micro_batchers[name] = batcher
+    return batcher
+
+
+def _get_job_or_404(job_id: str):
+    """获取任务，不存在时返回 404"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
+
+
+def _detect_profiled(model_detector, contents: bytes, class_list: Optional[List[str]], conf_threshold: float) -> dict:
+    """被分析请求的完整同步处理过程：解码、推理、标注和编码都在同一线程中执行，便于分析器完整采样"""
+    started = time.perf_counter()
+    image = decode_image(contents)
+    stage_ms = {"decode": (time.perf_counter() - started) * 1000}
+    if image is None:
+        raise HTTPException(status_code=400, detail="Invalid image file")
+
+    result = model_detector.detect_objects(
+        image, return_annotated=True, classes=class_list, conf_threshold=conf_threshold
+    )
+    if result.get("annotated_image") is not None:
+        started = time.perf_counter()
+        result["annotated_image"] = _encode_image_data_url(result["annotated_image"])
+        stage_ms["encode"] = (time.perf_counter() - started) * 1000
+    return {**result, "stage_ms": stage_ms}
+
+
+def _build_timings(result: dict, stage_ms: dict, total_seconds: float) -> dict:
+    """
+    单个请求的耗时分解（毫秒）
+
+    预处理、推理、后处理和标注取自检测结果的 speed 字段，其余为本服务各阶段的实测耗时；
+    结果来自缓存或共享的并发计算时，只包含本请求实际执行的阶段
+    """
+    timings = {f"{stage}_ms": round(value, 2) for stage, value in stage_ms.items()}
+    if "decode" in stage_ms:
+        # 本请求执行了推理，模型阶段的耗时属于本请求
+        if "queue_wait_ms" in result:
+            timings["queue_wait_ms"] = result["queue_wait_ms"]
+        timings.update({f"{stage}_ms": value for stage, value in (result.get("speed") or {}).items()})
+    timings["total_ms"] = round(total_seconds * 1000, 2)
+    return timings
+
 
 @router.post("/detect")
 async def detect(
+    request: Request,
     file: UploadFile = File(...),
     classes: Optional[str] = Query(None, description="要检测的类别，逗号分隔，例如 'person' 或 'person,car'"),
-    conf_threshold: float = Query(0.5, ge=0.1, le=0.9, description="置信度阈值")
+    conf_threshold: float = Query(0.5, ge=0.1, le=0.9, description="置信度阈值"),
+    model: Optional[str] = Query(None, description="模型名称，例如 'yolov8s'，默认使用 YOLO_MODEL 指定的模型"),
+    timings: bool = Query(False, description="是否在响应中附带本请求的分阶段耗时"),
+    profile: bool = Query(False, description="是否在分析器下执行本请求（也可使用请求头 X-Profile: 1）")
 ):
     """
     单张图片物体检测
     - file: 图片文件
     - classes: 要检测的类别，逗号分隔，例如 'person' 或 'person,car'。不传则检测所有 80 个类别
     - conf_threshold: 置信度阈值，默认 0.5
+    - model: 模型名称，可选值见 /health 的 models.available_models
+    - timings: 附带 timings 字段：上传读取、解码、排队、预处理、推理、后处理、标注、编码和总耗时
+    - profile: 跳过缓存和微批处理，在推理线程中于分析器下执行整个请求，响应附带 profile 摘要，
+      完整结果通过 /profiles/{id} 下载
     """
-    contents = await file.read()
+    request_started = time.perf_counter()
+    model_detector = await _resolve_detector(model)
+    model_name = model_detector.model_name
+    stage_ms = {}
+    with metrics.time_stage(STAGE_UPLOAD_READ, "/api/v1/detect", model_name):
+        contents = await file.read()
+    stage_ms["upload_read"] = (time.perf_counter() - request_started) * 1000
 
-    nparr = np.frombuffer(contents, np.uint8)
-    image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    # 解析类别参数
+    class_list = _parse_class_list(classes)
 
-    if image is None:
-        raise HTTPException(status_code=400, detail="Invalid image file")
+    profile_requested = profile or request.headers.get("x-profile", "").lower() in ("1", "true")
+    if request_profiler.should_profile(profile_requested):
+        result, profile_info = await inference_executor.submit(
+            request_profiler.run, _detect_profiled, model_detector, contents, class_list, conf_threshold
+        )
+        stage_ms.update(result.pop("stage_ms"))
+        response = {
+            **result,
+            "cache": "bypass",
+            "profile": {**profile_info, "url": f"/api/v1/profiles/{profile_info['id']}"}
+        }
+        if timings:
+            response["timings"] = _build_timings(result, stage_ms, time.perf_counter() - request_started)
+        return response
 
-    # 解析类别参数
-    class_list = None
-    if classes:
-        class_list = [c.strip() for c in classes.split(',')]
+    async def compute():
+        started = time.perf_counter()
+        image = await run_blocking(_decode_timed, contents, "/api/v1/detect", model_name)
+        stage_ms["decode"] = (time.perf_counter() - started) * 1000
+        if image is None:
+            raise HTTPException(status_code=400, detail="Invalid image file")
 
-    result = detector.detect_objects(image, return_annotated=True, classes=class_list, conf_threshold=conf_threshold)
+        # 经由微批处理调度器，与并发到达的兼容请求合并为一次批量推理
+        result = await _get_micro_batcher(model_detector).submit(image, classes=class_list, conf_threshold=conf_threshold, return_annotated=True)
+        metrics.observe_result(result, "/api/v1/detect", model_name)
 
-    if result.get("annotated_image") is not None:
-        _, buffer = cv2.imencode('.jpg', result["annotated_image"])
-        annotated_b64 = base64.b64encode(buffer).decode('utf-8')
-        result["annotated_image"] = f"data:image/jpeg;base64,{annotated_b64}"
+        if result.get("annotated_image") is not None:
+            started = time.perf_counter()
+            result["annotated_image"] = await run_blocking(_encode_timed, result["annotated_image"], "/api/v1/detect", model_name)
+            stage_ms["encode"] = (time.perf_counter() - started) * 1000
+        return result
+
+    # 相同内容和参数的请求直接返回缓存结果，并发的相同请求共享一次推理
+    cache_key = result_cache.make_key(
+        contents,
+        model_detector._parse_classes(class_list),
+        conf_threshold,
+        model_detector.model_id
+    )
+    result, cache_status = await result_cache.get_or_compute(cache_key, compute)
 
-    return result
+    response = {**result, "cache": cache_status}
+    if timings:
+        response["timings"] = _build_timings(result, stage_ms, time.perf_counter() - request_started)
+    return response
+
+
+@router.get("/profiles")
+async def list_profiles():
+    """列出保存的请求分析结果"""
+    return {**request_profiler.get_stats(), "profiles": request_profiler.list_profiles()}
+
+
+@router.get("/profiles/{profile_id}")
+async def download_profile(profile_id: str):
+    """下载请求分析结果：pyinstrument 为 HTML，cProfile 为 pstats 文件（用 snakeviz 等工具查看）"""
+    path = request_profiler.find(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile not found: {profile_id}")
+    media_type = "text/html" if path.suffix == ".html" else "application/octet-stream"
+    return FileResponse(str(path), media_type=media_type, filename=path.name)
 
 
 @router.post("/video")
 async def detect_video(
+    request: Request,
     file: UploadFile = File(...),
     return_video: str = "true",
     classes: Optional[str] = Query(None, description="要检测的类别，逗号分隔"),
     use_batch_processing: bool = Query(True, description="是否使用批处理优化"),
     batch_size: int = Query(8, ge=1, le=32, description="批处理大小"),
-    frame_interval: int = Query(1, ge=1, le=5, description="帧处理间隔")
+    frame_interval: int = Query(1, ge=1, le=5, description="帧处理间隔"),
+    result_format: str = Query("objects", alias="format", description="结果格式：objects 或 columnar"),
+    stream: bool = Query(False, description="是否以 NDJSON / SSE 流式返回逐帧结果"),
+    model: Optional[str] = Query(None, description="模型名称，默认使用 YOLO_MODEL 指定的模型")
 ):
     """
     上传视频文件进行检测
@@ -62,49 +524,94 @@ async def detect_video(
     - use_batch_processing: 是否使用批处理优化
     - batch_size: 批处理大小 (1-32)
     - frame_interval: 帧处理间隔 (1=每帧处理，2=隔帧处理)
+    - format: 结果格式，columnar 为每帧列式数组并附带类别名称表，支持 Accept: application/msgpack
+    - stream: 边处理边返回逐帧结果（默认 NDJSON，Accept: text/event-stream 时为 SSE），此时不返回视频文件
+    - model: 模型名称
     """
-    import tempfile
-    import os
-    import asyncio
+    _validate_result_format(result_format)
+    model_detector = await _resolve_detector(model)
 
     should_return_video = return_video.lower() == "true"
-    print(f"接收到的 return_video 参数：{return_video}")
-    print(f"转换后的布尔值：{should_return_video}")
-    print(f"批处理参数：use_batch_processing={use_batch_processing}, batch_size={batch_size}, frame_interval={frame_interval}")
+    class_list = _parse_class_list(classes)
 
     input_path = None
     output_path = None
 
-    # 解析类别参数
-    class_list = None
-    if classes:
-        class_list = [c.strip() for c in classes.split(',')]
-
     try:
         # 保存上传的视频到临时文件
         suffix = os.path.splitext(file.filename)[1] or ".mp4"
         with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            content = await file.read()
+            with metrics.time_stage(STAGE_UPLOAD_READ, "/api/v1/video", model_detector.model_name):
+                content = await file.read()
             tmp.write(content)
             input_path = tmp.name
 
+        # 流式返回：逐帧推进生成器，每处理完一帧就发送一行结果，内存占用与视频长度无关
+        if stream:
+            use_sse = "text/event-stream" in request.headers.get("accept", "")
+            stream_path = input_path
+
+            async def stream_results():
+                try:
+                    async with _tracking_session(model_detector):
+                        # 拿到跟踪锁后才打开视频，响应没有开始时不会留下未关闭的生成器
+                        items = inference_executor.iterate(model_detector.iter_video_track(
+                            stream_path,
+                            None,
+                            classes=class_list,
+                            use_batch_processing=use_batch_processing,
+                            batch_size=batch_size,
+                            frame_interval=frame_interval,
+                            result_format=result_format,
+                            stage_observer=_video_stage_observer("/api/v1/video", model_detector.model_name)
+                        ))
+                        try:
+                            async for item in items:
+                                if item["type"] == "meta":
+                                    item["filename"] = file.filename
+                                    if result_format == "columnar":
+                                        item["class_names"] = build_class_table(COCO_CLASSES.keys())
+                                yield _format_stream_item(item, use_sse)
+                        finally:
+                            # 释放跟踪锁之前关闭生成器（aclose 会等待推理线程中的关闭完成）
+                            await items.aclose()
+                except Exception as e:
+                    # 响应已经开始，无法再返回错误状态码，以 error 行结束流
+                    print(f"视频流处理错误：{e}")
+                    yield _format_stream_item({"type": "error", "error": str(e)}, use_sse)
+                finally:
+                    _remove_file(stream_path)
+
+            body = stream_results()
+            # 客户端在响应开始前断开时生成器不会执行，回收时删除上传的临时文件
+            weakref.finalize(body, _remove_file, stream_path)
+            return StreamingResponse(
+                body,
+                media_type="text/event-stream" if use_sse else "application/x-ndjson"
+            )
+
         # 处理视频
-        print(f"should_return_video={should_return_video}, 准备设置 output_path")
         if should_return_video:
             base_name = os.path.splitext(os.path.basename(input_path))[0]
             output_path = os.path.join(os.path.dirname(input_path), f"{base_name}_output.mp4")
-            print(f"output_path 已设置：{output_path}")
-        else:
-            print(f"不返回视频，output_path 保持为 None")
-
-        result = detector.process_video_file_track(
-            input_path,
-            output_path,
-            classes=class_list,
-            use_batch_processing=use_batch_processing,
-            batch_size=batch_size,
-            frame_interval=frame_interval
-        )
+
+        # 逐项在推理线程中推进，两批之间推理线程可以处理其他请求，不会被整段视频独占
+        async with _tracking_session(model_detector):
+            items = inference_executor.iterate(model_detector.iter_video_track(
+                input_path,
+                output_path,
+                classes=class_list,
+                use_batch_processing=use_batch_processing,
+                batch_size=batch_size,
+                frame_interval=frame_interval,
+                result_format=result_format,
+                stage_observer=_video_stage_observer("/api/v1/video", model_detector.model_name)
+            ))
+            try:
+                video_items = [item async for item in items]
+            finally:
+                await items.aclose()
+        result = model_detector.collect_video_track(video_items)
 
         if should_return_video and output_path and os.path.exists(output_path):
             file_size = os.path.getsize(output_path)
@@ -114,8 +621,6 @@ async def detect_video(
                 print(f"视频文件太小，可能生成失败")
                 raise HTTPException(status_code=500, detail="视频文件生成失败，文件大小异常")
 
-            from fastapi.responses import FileResponse
-
             async def cleanup_files():
                 await asyncio.sleep(2)
                 try:
@@ -138,6 +643,15 @@ async def detect_video(
         if input_path and os.path.exists(input_path):
             os.unlink(input_path)
 
+        if result_format == "columnar":
+            return negotiated_response(request, {
+                "success": True,
+                "filename": file.filename,
+                "format": "columnar",
+                "class_names": build_class_table(result["class_counts"].keys()),
+                **result
+            })
+
         return {
             "success": True,
             "filename": file.filename,
@@ -156,7 +670,6 @@ async def detect_video(
             except:
                 pass
 
-        import traceback
         error_detail = traceback.format_exc()
         print(f"视频处理错误:\n{error_detail}")
         raise HTTPException(status_code=500, detail=f"视频处理失败：{str(e)}")
@@ -164,17 +677,9 @@ async def detect_video(
 
 @router.get("/health")
 async def health_check():
-    from app.utils.batch_processor import get_batch_processor, BatchConfig
-    from app.core.config import BATCH_PROCESSING
-
-    # 获取批处理器性能统计
+    # 获取批处理器性能统计（复用全局批处理器，不在每次调用时重新构建配置）
     try:
-        batch_processor = get_batch_processor(detector, BatchConfig(
-            batch_size=BATCH_PROCESSING["default_batch_size"],
-            max_workers=BATCH_PROCESSING["default_max_workers"],
-            memory_threshold=BATCH_PROCESSING["memory_threshold"]
-        ))
-        perf_stats = batch_processor.get_performance_stats()
+        perf_stats = _get_batch_processor().get_performance_stats()
     except Exception as e:
         perf_stats = {"error": str(e)}
 
@@ -182,140 +687,382 @@ async def health_check():
         "status": "healthy",
         "model_loaded": detector.model_loaded,
         "device": detector.device if detector.model_loaded else None,
+        "backend": detector.backend,
         "batch_processing_enabled": True,
         "batch_processing_config": BATCH_PROCESSING,
+        "micro_batching": micro_batcher.get_stats(),
+        "models": model_registry.get_stats(),
+        "inference_executor": inference_executor.get_stats(),
+        "result_cache": result_cache.get_stats(),
+        "annotation": box_renderer.get_stats(),
+        "serializers": get_serializer_info(),
+        "jobs": job_manager.get_stats(),
         "supported_classes": list(COCO_CLASSES.values()),
         "performance_stats": perf_stats
     }
 
 
+async def _iter_batch_detect(
+    blobs: List[bytes],
+    filenames: List[str],
+    max_workers: int,
+    batch_size: int,
+    class_list: Optional[List[str]],
+    result_format: str,
+    annotation: Optional[AnnotationOptions],
+    model_detector=None
+):
+    """
+    逐张产出批量检测结果
+
+    上传数据按块在内存中并行解码（预取下一块），每块按宽高比分桶批量推理；
+    需要标注图像时保留原始推理结果，推理完成后在解码线程池中并行渲染和编码，
+    按顺序每张编码完成即产出，任何时刻最多只持有一块的标注图像
+
+    Yields:
+        {"type": "image", ...} 每张图片的检测结果，无法解码的图片为 {"type": "error", ...}
+    """
+    model_name = (model_detector or detector).model_name
+    with ParallelImageDecoder(max_workers, decode_observer=_decode_observer("/api/v1/batch/detect", model_name)) as decoder:
+        async for start, decoded in decoder.iter_chunks(blobs, batch_size):
+            valid = [image is not None for image in decoded]
+            images = [image for image in decoded if image is not None]
+
+            results = []
+            if images:
+                # 块内按宽高比分桶推理，结果按原始顺序返回
+                results = await inference_executor.submit(
+                    _get_batch_processor(model_detector).predict_bucketed, images,
+                    classes=class_list,
+                    result_format=result_format,
+                    return_raw=annotation is not None
+                )
+            del images, decoded
+            for result in results:
+                metrics.observe_result(result, "/api/v1/batch/detect", model_name)
+
+            # 本块的标注图像立即开始并行渲染和编码
+            renders = [
+                decoder.submit(_render_annotation, result.pop("raw_result"), annotation, "/api/v1/batch/detect", model_name)
+                if annotation is not None else None
+                for result in results
+            ]
+
+            pending = iter(zip(results, renders))
+            for offset, is_valid in enumerate(valid):
+                index = start + offset
+                filename = filenames[index]
+                if not is_valid:
+                    yield {"type": "error", "index": index, "filename": filename, "error": "Invalid image file"}
+                    continue
+
+                result, render = next(pending)
+                result.pop("annotated_image", None)
+                if render is not None:
+                    result["annotated_image"] = await render
+                yield {"type": "image", "index": index, "filename": filename, **result}
+
+
 @router.post("/batch/detect")
 async def batch_detect(
+    request: Request,
     image_files: List[UploadFile] = File(...),
     classes: Optional[str] = Query(None, description="要检测的类别，逗号分隔"),
     max_workers: int = Query(BATCH_PROCESSING["default_max_workers"], ge=1, le=BATCH_PROCESSING["max_workers"]),
-    batch_size: int = Query(BATCH_PROCESSING["default_batch_size"], ge=1, le=BATCH_PROCESSING["max_batch_size"])
+    batch_size: int = Query(BATCH_PROCESSING["default_batch_size"], ge=1, le=BATCH_PROCESSING["max_batch_size"]),
+    result_format: str = Query("objects", alias="format", description="结果格式：objects 或 columnar"),
+    annotate: Optional[bool] = Query(None, description="是否返回标注图像，默认 objects 格式返回、columnar 格式不返回"),
+    image_format: str = Query("jpeg", description="标注图像格式：jpeg、png 或 webp"),
+    quality: int = Query(85, ge=1, le=100, description="标注图像质量（JPEG / WebP）"),
+    max_dim: Optional[int] = Query(None, ge=32, le=8192, description="标注图像最大边长"),
+    stream: bool = Query(False, description="是否以 NDJSON / SSE 流式返回逐张结果"),
+    model: Optional[str] = Query(None, description="模型名称，默认使用 YOLO_MODEL 指定的模型")
 ):
     """
     批量图片检测
     - image_files: 图片文件列表
     - classes: 要检测的类别，逗号分隔，例如 'person' 或 'person,car'
-    - max_workers: 最大工作线程数
-    - batch_size: 批处理大小
+    - max_workers: 解码和标注渲染的线程数
+    - batch_size: 批处理大小，每块解码完成后送入一次批量推理，同时解码下一块
+    - format: 结果格式，columnar 为每张图片的列式数组并附带类别名称表，支持 Accept: application/msgpack
+    - annotate: 是否渲染标注图像，只在需要时渲染并按 image_format / quality / max_dim 编码
+    - stream: 每张图片处理完成即发送一行结果（默认 NDJSON，Accept: text/event-stream 时为 SSE）
+    - model: 模型名称
     """
+    _validate_result_format(result_format)
+    model_detector = await _resolve_detector(model)
+
     if len(image_files) == 0:
         raise HTTPException(status_code=400, detail="At least one image file is required")
+    if image_format not in ANNOTATION_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid image_format: {image_format}, expected one of {list(ANNOTATION_FORMATS)}"
+        )
 
-    import tempfile
-
-    # 解析类别参数
-    class_list = None
-    if classes:
-        class_list = [c.strip() for c in classes.split(',')]
+    if annotate is None:
+        annotate = result_format != "columnar"
+    annotation = AnnotationOptions(image_format=image_format, quality=quality, max_dim=max_dim) if annotate else None
 
-    with tempfile.TemporaryDirectory() as temp_dir:
-        saved_paths = []
+    class_list = _parse_class_list(classes)
+    blobs, filenames = await _read_uploads(image_files, "/api/v1/batch/detect", model_detector.model_name)
+    items = _iter_batch_detect(
+        blobs, filenames, max_workers, batch_size, class_list, result_format, annotation, model_detector
+    )
 
-        for file in image_files:
-            if not file.content_type.startswith('image/'):
-                raise HTTPException(status_code=400, detail=f"Invalid file type: {file.content_type}")
+    if stream:
+        use_sse = "text/event-stream" in request.headers.get("accept", "")
 
-            file_path = os.path.join(temp_dir, file.filename)
-            with open(file_path, "wb") as f:
-                content = await file.read()
-                f.write(content)
-            saved_paths.append(file_path)
+        async def stream_results():
+            yield _format_stream_item({"type": "meta", "total": len(blobs), "format": result_format}, use_sse)
+            processed = 0
+            failed = 0
+            try:
+                async for item in items:
+                    if item["type"] == "image":
+                        processed += 1
+                    else:
+                        failed += 1
+                    yield _format_stream_item(item, use_sse)
+            except Exception as e:
+                yield _format_stream_item({"type": "error", "error": f"Batch processing failed: {str(e)}"}, use_sse)
+                return
 
-        # 读取所有图像
-        images = []
-        for path in saved_paths:
-            image = cv2.imread(path)
-            if image is not None:
-                images.append(image)
+            summary = {"type": "summary", "total_processed": processed, "failed_count": failed}
+            if result_format == "columnar":
+                summary["class_names"] = build_class_table(COCO_CLASSES.keys())
+            yield _format_stream_item(summary, use_sse)
 
-        if not images:
-            raise HTTPException(status_code=400, detail="No valid images found")
+        return StreamingResponse(
+            stream_results(),
+            media_type="text/event-stream" if use_sse else "application/x-ndjson"
+        )
 
-        try:
-            results = detector.batch_predict_optimized(images, return_annotated=True, classes=class_list)
+    successful_results = []
+    failed_files = []
+    try:
+        async for item in items:
+            if item.pop("type") == "image":
+                successful_results.append(item)
+            else:
+                failed_files.append(item["filename"])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch processing failed: {str(e)}")
 
-            successful_results = []
-            failed_count = len(saved_paths) - len(images)
+    if not successful_results:
+        raise HTTPException(status_code=400, detail="No valid images found")
 
-            for result, original_path in zip(results, saved_paths[:len(results)]):
-                result["input_path"] = original_path
-                successful_results.append(result)
+    if result_format == "columnar":
+        class_ids = [c for result in successful_results for c in result["class_ids"]]
+        return negotiated_response(request, {
+            "success": True,
+            "format": "columnar",
+            "class_names": build_class_table(class_ids),
+            "total_processed": len(successful_results),
+            "failed_count": len(failed_files),
+            "failed_files": failed_files,
+            "results": successful_results
+        })
 
-            return {
-                "success": True,
-                "total_processed": len(successful_results),
-                "failed_count": failed_count,
-                "results": successful_results
-            }
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Batch processing failed: {str(e)}")
+    return {
+        "success": True,
+        "total_processed": len(successful_results),
+        "failed_count": len(failed_files),
+        "failed_files": failed_files,
+        "results": successful_results
+    }
 
 
 @router.post("/batch/detect-with-progress")
 async def batch_detect_with_progress(
     image_files: List[UploadFile] = File(...),
     classes: Optional[str] = Query(None, description="要检测的类别，逗号分隔"),
-    max_workers: int = Query(BATCH_PROCESSING["default_max_workers"], ge=1, le=BATCH_PROCESSING["max_workers"])
+    max_workers: int = Query(BATCH_PROCESSING["default_max_workers"], ge=1, le=BATCH_PROCESSING["max_workers"]),
+    wait: bool = Query(True, description="是否等待任务完成后再返回"),
+    model: Optional[str] = Query(None, description="模型名称，默认使用 YOLO_MODEL 指定的模型")
 ):
     """
     带进度反馈的批量检测
     - image_files: 图片文件列表
     - classes: 要检测的类别，逗号分隔
     - max_workers: 最大工作线程数
+    - wait: 为 false 时立即返回 task_id，通过 /jobs/{task_id} 查询进度
+    - model: 模型名称
     """
-    import tempfile
-    import uuid
+    model_detector = await _resolve_detector(model)
+    images, filenames, failed_files = await _read_batch_images(
+        image_files, max_workers, "/api/v1/batch/detect-with-progress", model_detector.model_name
+    )
+    job = _submit_batch_job(
+        images, filenames, failed_files, _parse_class_list(classes), model_detector,
+        endpoint="/api/v1/batch/detect-with-progress"
+    )
 
-    task_id = str(uuid.uuid4())
+    if not wait:
+        return {"task_id": job.job_id, **job.to_dict()}
 
-    # 解析类别参数
-    class_list = None
-    if classes:
-        class_list = [c.strip() for c in classes.split(',')]
+    await asyncio.wrap_future(job.future)
+    if job.status != JOB_COMPLETED:
+        raise HTTPException(status_code=500, detail=f"Batch processing failed: {job.error or job.status}")
 
-    with tempfile.TemporaryDirectory() as temp_dir:
-        saved_paths = []
+    return {
+        "task_id": job.job_id,
+        "status": job.status,
+        **job.result
+    }
 
-        for file in image_files:
-            if not file.content_type.startswith('image/'):
-                raise HTTPException(status_code=400, detail=f"Invalid file type: {file.content_type}")
 
-            file_path = os.path.join(temp_dir, file.filename)
-            with open(file_path, "wb") as f:
-                content = await file.read()
-                f.write(content)
-            saved_paths.append(file_path)
+@router.post("/jobs/video")
+async def submit_video_job(
+    file: UploadFile = File(...),
+    return_video: bool = Query(True, description="是否生成标注后的视频"),
+    classes: Optional[str] = Query(None, description="要检测的类别，逗号分隔"),
+    use_batch_processing: bool = Query(True, description="是否使用批处理优化"),
+    batch_size: int = Query(8, ge=1, le=32, description="批处理大小"),
+    frame_interval: int = Query(1, ge=1, le=5, description="帧处理间隔"),
+    result_format: str = Query("objects", alias="format", description="结果格式：objects 或 columnar"),
+    model: Optional[str] = Query(None, description="模型名称，默认使用 YOLO_MODEL 指定的模型")
+):
+    """
+    提交视频检测后台任务，立即返回任务 ID
+    - 参数与 /video 相同
+    - 通过 /jobs/{job_id} 查询进度，/jobs/{job_id}/result 获取结果，/jobs/{job_id}/video 下载标注视频
+    """
+    _validate_result_format(result_format)
+    model_detector = await _resolve_detector(model)
+
+    suffix = os.path.splitext(file.filename)[1] or ".mp4"
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        with metrics.time_stage(STAGE_UPLOAD_READ, "/api/v1/jobs/video", model_detector.model_name):
+            content = await file.read()
+        tmp.write(content)
+        input_path = tmp.name
 
-        images = []
-        for path in saved_paths:
-            image = cv2.imread(path)
-            if image is not None:
-                images.append(image)
+    output_path = None
+    if return_video:
+        base_name = os.path.splitext(os.path.basename(input_path))[0]
+        output_path = os.path.join(os.path.dirname(input_path), f"{base_name}_output.mp4")
 
-        if not images:
-            raise HTTPException(status_code=400, detail="No valid images found")
+    class_list = _parse_class_list(classes)
+    filename = file.filename
 
+    def run(job):
         try:
-            results = detector.batch_predict_optimized(images, return_annotated=True, classes=class_list)
+            # 同一模型的视频跟踪串行执行，整个视频处理期间持有跟踪锁，避免多个视频交错更新同一个跟踪器
+            with model_detector.track_lock:
+                video_frames = model_detector.iter_video_track(
+                    input_path,
+                    output_path,
+                    classes=class_list,
+                    use_batch_processing=use_batch_processing,
+                    batch_size=batch_size,
+                    frame_interval=frame_interval,
+                    result_format=result_format,
+                    stage_observer=_video_stage_observer("/api/v1/jobs/video", model_detector.model_name)
+                )
+                # 逐项在推理线程中推进，两批之间推理线程可以处理其他请求
+                items = inference_executor.iterate_blocking(video_frames)
+                try:
+                    result = model_detector.collect_video_track(
+                        items,
+                        progress_callback=lambda read, total: job.update_progress(total, read)
+                    )
+                finally:
+                    # 释放跟踪锁之前关闭生成器，确保跟踪器不再被使用
+                    items.close()
+        finally:
+            if os.path.exists(input_path):
+                os.unlink(input_path)
+
+        if result_format == "columnar":
+            result = {
+                "format": "columnar",
+                "class_names": build_class_table(result["class_counts"].keys()),
+                **result
+            }
+        return {"filename": filename, **result}
 
-            successful_results = []
-            failed_count = len(saved_paths) - len(images)
+    try:
+        job = job_manager.submit("video", run, output_path=output_path, cleanup_paths=[input_path])
+    except JobQueueFull as e:
+        os.unlink(input_path)
+        raise HTTPException(status_code=429, detail=str(e))
 
-            for result, original_path in zip(results, saved_paths[:len(results)]):
-                result["input_path"] = original_path
-                successful_results.append(result)
+    return job.to_dict()
 
-            return {
-                "task_id": task_id,
-                "status": "completed",
-                "total_processed": len(successful_results),
-                "failed_count": failed_count,
-                "results": successful_results
-            }
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Batch processing failed: {str(e)}")
+
+@router.post("/jobs/batch")
+async def submit_batch_job(
+    image_files: List[UploadFile] = File(...),
+    classes: Optional[str] = Query(None, description="要检测的类别，逗号分隔"),
+    max_workers: int = Query(BATCH_PROCESSING["default_max_workers"], ge=1, le=BATCH_PROCESSING["max_workers"]),
+    model: Optional[str] = Query(None, description="模型名称，默认使用 YOLO_MODEL 指定的模型")
+):
+    """
+    提交批量图片检测后台任务，立即返回任务 ID
+    - image_files: 图片文件列表
+    - classes: 要检测的类别，逗号分隔
+    - max_workers: 解码线程数
+    - model: 模型名称
+    """
+    model_detector = await _resolve_detector(model)
+    images, filenames, failed_files = await _read_batch_images(
+        image_files, max_workers, "/api/v1/jobs/batch", model_detector.model_name
+    )
+    job = _submit_batch_job(images, filenames, failed_files, _parse_class_list(classes), model_detector)
+    return job.to_dict()
+
+
+@router.get("/jobs")
+async def list_jobs():
+    """列出所有任务及其状态"""
+    return {
+        "jobs": job_manager.list_jobs(),
+        "stats": job_manager.get_stats()
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """查询任务状态、进度百分比和预计剩余时间"""
+    return _get_job_or_404(job_id).to_dict()
+
+
+@router.get("/jobs/{job_id}/result")
+async def get_job_result(request: Request, job_id: str):
+    """获取已完成任务的检测结果，支持 Accept: application/msgpack"""
+    job = _get_job_or_404(job_id)
+    if job.status != JOB_COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+
+    return negotiated_response(request, {
+        "success": True,
+        "job_id": job.job_id,
+        **job.result
+    })
+
+
+@router.get("/jobs/{job_id}/video")
+async def get_job_video(job_id: str):
+    """下载视频任务生成的标注视频"""
+    job = _get_job_or_404(job_id)
+    if job.status != JOB_COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    if not job.output_path or not os.path.exists(job.output_path):
+        raise HTTPException(status_code=404, detail="No video output for this job")
+
+    filename = os.path.splitext(job.result.get("filename") or "video")[0]
+    return FileResponse(
+        job.output_path,
+        media_type="video/mp4",
+        filename=f"detected_{filename}.mp4"
+    )
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """取消任务：排队中的任务不再执行，运行中的任务在处理完当前批次后停止"""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job.to_dict()
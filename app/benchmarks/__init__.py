@@ -0,0 +1,7 @@
+"""
+基准测试模块
+
+在合成数据上离线测量检测器和批处理器的吞吐量、延迟和内存峰值：
+    python -m app.benchmarks --output baseline.json
+    python -m app.benchmarks --compare baseline.json --tolerance 0.1
+"""
@@ -0,0 +1,5 @@
+"""命令行入口：python -m app.benchmarks"""
+
+from app.benchmarks.runner import main
+
+main()
@@ -0,0 +1,355 @@
+"""
+负载生成模块
+
+以固定并发（闭环：每个虚拟用户收到响应后立即发送下一个请求）压测正在运行的服务，
+报告吞吐量和尾延迟，用于调优 uvicorn 工作进程、微批处理、推理线程和背压等服务层参数：
+- detect：POST /api/v1/detect，单张图片
+- batch：POST /api/v1/batch/detect，每个请求携带多张图片
+- ws：/ws/detect，每个虚拟用户一个连接，发送一帧后等待该帧的结果
+
+配合 YOLO_BACKEND=mock 启动服务时不需要模型权重和 GPU，推理耗时由模拟后端的环境变量控制：
+    YOLO_BACKEND=mock YOLO_MOCK_PER_IMAGE_MS=8 uvicorn app.main:app --port 8000
+    python -m app.benchmarks.loadgen --url http://127.0.0.1:8000 --endpoints detect,batch,ws --concurrency 32
+"""
+
+import argparse
+import http.client
+import itertools
+import json
+import ssl
+import statistics
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+import cv2
+
+from app.benchmarks.runner import percentile
+from app.benchmarks.synthetic import generate_images
+
+ENDPOINTS = ("detect", "batch", "ws")
+
+# WebSocket 返回模式：image 返回标注后的 JPEG，json / binary 只返回检测框
+WS_MODES = ("image", "json", "binary")
+
+
+def encode_multipart(field: str, files: List[bytes]) -> Tuple[bytes, str]:
+    """
+    构建 multipart/form-data 请求体
+
+    Args:
+        field: 表单字段名
+        files: JPEG 文件内容列表
+
+    Returns:
+        (请求体, Content-Type)
+    """
+    boundary = uuid.uuid4().hex
+    parts = []
+    for i, content in enumerate(files):
+        parts.append(
+            f"--{boundary}\r\n"
+            f"Content-Disposition: form-data; name=\"{field}\"; filename=\"image_{i}.jpg\"\r\n"
+            f"Content-Type: image/jpeg\r\n\r\n".encode("utf-8")
+        )
+        parts.append(content)
+        parts.append(b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode("utf-8"))
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class LoadStats:
+    """线程安全的请求结果收集"""
+
+    def __init__(self):
+        self.latencies_ms: List[float] = []
+        self.statuses: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.images = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms: float, status: str, images: int = 0, error: Optional[str] = None):
+        """记录一个请求的结果"""
+        with self._lock:
+            self.statuses[status] += 1
+            if error is None:
+                self.latencies_ms.append(latency_ms)
+                self.images += images
+            else:
+                self.errors[error] += 1
+
+    def summary(self, wall_seconds: float) -> Dict:
+        """汇总吞吐量和延迟分位数"""
+        with self._lock:
+            latencies = sorted(self.latencies_ms)
+            succeeded = len(latencies)
+            stats = {
+                "requests": sum(self.statuses.values()),
+                "succeeded": succeeded,
+                "failed": sum(self.errors.values()),
+                "statuses": dict(self.statuses),
+                "errors": dict(self.errors.most_common(10)),
+                "duration_s": round(wall_seconds, 2),
+                "requests_per_second": round(succeeded / wall_seconds, 2) if wall_seconds > 0 else 0,
+                "images_per_second": round(self.images / wall_seconds, 2) if wall_seconds > 0 else 0
+            }
+        if latencies:
+            stats.update({
+                "mean_ms": round(statistics.mean(latencies), 2),
+                "p50_ms": round(percentile(latencies, 0.50), 2),
+                "p90_ms": round(percentile(latencies, 0.90), 2),
+                "p95_ms": round(percentile(latencies, 0.95), 2),
+                "p99_ms": round(percentile(latencies, 0.99), 2),
+                "max_ms": round(latencies[-1], 2)
+            })
+        return stats
+
+
+class LoadGenerator:
+    """
+    闭环负载生成器
+
+    每个虚拟用户在独立线程中循环发送请求，预热期内的请求不计入统计
+    """
+
+    def __init__(
+        self,
+        url: str,
+        payloads: List[bytes],
+        concurrency: int = 16,
+        duration: float = 30.0,
+        warmup: float = 3.0,
+        batch_images: int = 8,
+        query: Optional[Dict[str, str]] = None,
+        ws_mode: str = "json",
+        timeout: float = 60.0,
+        unique: bool = True
+    ):
+        """
+        初始化负载生成器
+
+        Args:
+            url: 服务地址，如 http://127.0.0.1:8000
+            payloads: JPEG 图片内容列表，各虚拟用户轮流使用
+            concurrency: 并发的虚拟用户数
+            duration: 计入统计的压测时长（秒）
+            warmup: 预热时长（秒）
+            batch_images: batch 端点每个请求携带的图片数
+            query: 附加到 HTTP 请求的查询参数，如 {"format": "columnar"}
+            ws_mode: WebSocket 返回模式
+            timeout: 单个请求的超时时间（秒）
+            unique: 是否在每张图片的 JPEG 结束标记后追加请求序号，使 /detect 的结果缓存不会命中
+        """
+        self.url = urlsplit(url.rstrip("/"))
+        self.payloads = payloads
+        self.concurrency = max(1, int(concurrency))
+        self.duration = duration
+        self.warmup = warmup
+        self.batch_images = max(1, int(batch_images))
+        self.query = dict(query or {})
+        self.ws_mode = ws_mode
+        self.timeout = timeout
+        self.unique = unique
+        self._sequence = itertools.count()
+
+    def _files(self, index: int, count: int) -> List[bytes]:
+        """取出一个请求的图片，unique 时追加序号（解码器忽略 JPEG 结束标记之后的数据）"""
+        files = [self.payloads[(index + j) % len(self.payloads)] for j in range(count)]
+        if self.unique:
+            files = [content + next(self._sequence).to_bytes(8, "little") for content in files]
+        return files
+
+    def _connection(self) -> http.client.HTTPConnection:
+        """创建 HTTP 长连接（自签名证书不校验）"""
+        if self.url.scheme == "https":
+            return http.client.HTTPSConnection(
+                self.url.netloc, timeout=self.timeout, context=ssl._create_unverified_context()
+            )
+        return http.client.HTTPConnection(self.url.netloc, timeout=self.timeout)
+
+    def _path(self, path: str) -> str:
+        """拼接路径和查询参数"""
+        return f"{self.url.path}{path}?{urlencode(self.query)}" if self.query else f"{self.url.path}{path}"
+
+    def _http_worker(self, index: int, path: str, field: str, images: int,
+                     stats: LoadStats, measure_from: float, deadline: float):
+        """HTTP 虚拟用户：复用长连接循环发送请求"""
+        conn = self._connection()
+        request_path = self._path(path)
+        sent = 0
+        try:
+            while time.perf_counter() < deadline:
+                body, content_type = encode_multipart(field, self._files(index + sent, images))
+                sent += 1
+                started = time.perf_counter()
+                try:
+                    conn.request("POST", request_path, body=body, headers={"Content-Type": content_type})
+                    response = conn.getresponse()
+                    response.read()
+                    status, error = str(response.status), None
+                    if response.status >= 400:
+                        error = f"HTTP {response.status}"
+                except (OSError, http.client.HTTPException) as e:
+                    status, error = "connection_error", type(e).__name__
+                    conn.close()
+                    conn = self._connection()
+                if started >= measure_from:
+                    stats.record((time.perf_counter() - started) * 1000, status, images, error)
+        finally:
+            conn.close()
+
+    def _ws_worker(self, connect: Callable, index: int, stats: LoadStats, measure_from: float, deadline: float):
+        """WebSocket 虚拟用户：发送一帧后等待该帧的结果（跳过 hello / stats 消息）"""
+        scheme = "wss" if self.url.scheme == "https" else "ws"
+        ws_url = f"{scheme}://{self.url.netloc}{self.url.path}/ws/detect?{urlencode({'mode': self.ws_mode, **self.query})}"
+        options = {"ssl": ssl._create_unverified_context()} if scheme == "wss" else {}
+        sent = 0
+        try:
+            with connect(ws_url, open_timeout=self.timeout, max_size=None, **options) as ws:
+                while time.perf_counter() < deadline:
+                    payload = self._files(index + sent, 1)[0]
+                    sent += 1
+                    started = time.perf_counter()
+                    error = None
+                    ws.send(payload)
+                    while True:
+                        message = ws.recv(timeout=self.timeout)
+                        if isinstance(message, bytes):
+                            break
+                        data = json.loads(message)
+                        if data.get("type") in ("hello", "stats"):
+                            continue
+                        if data.get("success") is False:
+                            error = str(data.get("error", "error"))[:80]
+                        break
+                    if started >= measure_from:
+                        stats.record((time.perf_counter() - started) * 1000, "ok" if error is None else "error",
+                                     1, error)
+        except Exception as e:
+            # 连接断开后该虚拟用户退出，其余虚拟用户继续压测
+            stats.record(0, "connection_error", error=type(e).__name__)
+
+    def run(self, endpoint: str) -> Dict:
+        """
+        对一个端点压测
+
+        Args:
+            endpoint: detect、batch 或 ws
+
+        Returns:
+            吞吐量和延迟统计
+        """
+        if endpoint == "ws":
+            try:
+                from websockets.sync.client import connect
+            except ImportError:
+                raise RuntimeError("WebSocket 压测需要 websockets >= 12（uvicorn[standard] 已包含）")
+
+        stats = LoadStats()
+        started = time.perf_counter()
+        measure_from = started + self.warmup
+        deadline = measure_from + self.duration
+
+        targets: Dict[str, Callable[[int], None]] = {
+            "detect": lambda i: self._http_worker(
+                i, "/api/v1/detect", "file", 1, stats, measure_from, deadline),
+            "batch": lambda i: self._http_worker(
+                i, "/api/v1/batch/detect", "image_files", self.batch_images, stats, measure_from, deadline),
+            "ws": lambda i: self._ws_worker(connect, i, stats, measure_from, deadline)
+        }
+
+        workers = [
+            threading.Thread(target=targets[endpoint], args=(i,), name=f"loadgen-{endpoint}-{i}", daemon=True)
+            for i in range(self.concurrency)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        wall_seconds = max(time.perf_counter() - measure_from, 0.0)
+        return {"concurrency": self.concurrency, **stats.summary(wall_seconds)}
+
+
+def main():
+    """命令行入口：以固定并发压测服务端点"""
+    parser = argparse.ArgumentParser(description="以固定并发压测 /api/v1/detect、/api/v1/batch/detect 和 /ws/detect")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="服务地址")
+    parser.add_argument("--endpoints", default="detect", help="逗号分隔的端点列表：detect、batch、ws")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发的虚拟用户数")
+    parser.add_argument("--duration", type=float, default=30.0, help="每个端点计入统计的压测时长（秒）")
+    parser.add_argument("--warmup", type=float, default=3.0, help="预热时长（秒）")
+    parser.add_argument("--images", type=int, default=8, help="合成图片数量，各请求轮流使用")
+    parser.add_argument("--width", type=int, default=640, help="图片宽度")
+    parser.add_argument("--height", type=int, default=480, help="图片高度")
+    parser.add_argument("--objects", type=int, default=10, help="每张图片中的物体数量")
+    parser.add_argument("--quality", type=int, default=85, help="JPEG 质量")
+    parser.add_argument("--batch-images", type=int, default=8, help="batch 端点每个请求携带的图片数")
+    parser.add_argument("--query", action="append", default=[], help="附加查询参数 key=value，可重复，如 format=columnar")
+    parser.add_argument("--ws-mode", default="json", choices=WS_MODES, help="WebSocket 返回模式")
+    parser.add_argument("--timeout", type=float, default=60.0, help="单个请求的超时时间（秒）")
+    parser.add_argument("--allow-cache-hits", action="store_true", help="重复发送相同的图片内容（允许命中 /detect 的结果缓存）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--output", default=None, help="把报告写入 JSON 文件")
+    args = parser.parse_args()
+
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    unknown = [e for e in endpoints if e not in ENDPOINTS]
+    if unknown:
+        parser.error(f"未知端点：{unknown}，可选：{list(ENDPOINTS)}")
+    query = {}
+    for item in args.query:
+        key, sep, value = item.partition("=")
+        if not sep:
+            parser.error(f"查询参数格式应为 key=value：{item}")
+        query[key] = value
+
+    payloads = [
+        cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, args.quality])[1].tobytes()
+        for image in generate_images(args.images, args.width, args.height, args.objects, seed=args.seed)
+    ]
+    generator = LoadGenerator(
+        args.url,
+        payloads,
+        concurrency=args.concurrency,
+        duration=args.duration,
+        warmup=args.warmup,
+        batch_images=args.batch_images,
+        query=query,
+        ws_mode=args.ws_mode,
+        timeout=args.timeout,
+        unique=not args.allow_cache_hits
+    )
+
+    report = {
+        "url": args.url,
+        "config": {
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "resolution": [args.width, args.height],
+            "payload_kb": round(statistics.mean(len(p) for p in payloads) / 1024, 1),
+            "batch_images": args.batch_images,
+            "query": query,
+            "ws_mode": args.ws_mode,
+            "unique_payloads": not args.allow_cache_hits
+        },
+        "endpoints": {}
+    }
+    for endpoint in endpoints:
+        print(f"压测端点：{endpoint}（并发 {args.concurrency}，{args.duration}s）")
+        report["endpoints"][endpoint] = generator.run(endpoint)
+        print(f"{endpoint}: {report['endpoints'][endpoint]}")
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,461 @@
+"""
+基准测试运行模块
+
+在合成数据上测量检测器和批处理器各执行路径的吞吐量、延迟分位数和内存峰值：
+- detect_objects：逐张检测，延迟按单张图像统计
+- batch_predict_optimized：固定批大小批量推理，延迟按批统计
+- process_batch / process_batch_with_chunks（串行、并行）：每次处理整组图像，延迟按调用统计
+- process_video_file_track：跟踪处理合成视频，延迟按整段视频统计
+
+默认强制使用 CPU 并离线运行；本地没有权重文件时按同名 .yaml 构建随机初始化的模型，
+计算量与正式权重一致，但检测数量没有参考意义。
+
+compare 模式把本次结果与保存的基线逐项对比，吞吐量下降、延迟或内存上升超过容差时记为回归。
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+import psutil
+
+from app.benchmarks.synthetic import generate_images, generate_video
+
+SCENARIOS = (
+    "detect_objects",
+    "batch_predict_optimized",
+    "process_batch",
+    "process_batch_with_chunks_serial",
+    "process_batch_with_chunks_parallel",
+    "process_video_file_track"
+)
+
+# 对比时检查的指标：(指标名, 越大越好)
+COMPARE_METRICS = (
+    ("images_per_second", True),
+    ("p50_ms", False),
+    ("p95_ms", False),
+    ("peak_rss_mb", False)
+)
+
+
+class RssSampler:
+    """后台线程按固定间隔采样进程（含子进程）的常驻内存，记录峰值"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _rss(self) -> int:
+        """当前进程及其子进程（进程池执行模式）的常驻内存总和"""
+        total = self.process.memory_info().rss
+        for child in self.process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    def _loop(self):
+        """采样循环"""
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._rss())
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """开始采样"""
+        self.peak = self._rss()
+        self._thread = threading.Thread(target=self._loop, name="rss-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> int:
+        """停止采样并返回峰值（字节）"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.peak = max(self.peak, self._rss())
+        return self.peak
+
+
+@contextmanager
+def sample_rss() -> Iterator[RssSampler]:
+    """在代码块执行期间采样内存峰值"""
+    sampler = RssSampler()
+    sampler.start()
+    try:
+        yield sampler
+    finally:
+        sampler.stop()
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """已排序序列的分位数（最近秩）"""
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def summarize(latencies_ms: List[float], images: int, wall_seconds: float, peak_rss: int,
+              baseline_rss: int, unit: str) -> Dict:
+    """
+    汇总一个场景的测量结果
+
+    Args:
+        latencies_ms: 每次计时调用的延迟（毫秒）
+        images: 计时期间处理的图像（帧）总数
+        wall_seconds: 计时期间的总耗时
+        peak_rss: 内存峰值（字节）
+        baseline_rss: 场景开始前的内存（字节）
+        unit: 单次延迟对应的处理单位：image / batch / call / video
+
+    Returns:
+        吞吐量、延迟分位数和内存统计
+    """
+    latencies = sorted(latencies_ms)
+    return {
+        "latency_unit": unit,
+        "iterations": len(latencies),
+        "images": images,
+        "images_per_second": round(images / wall_seconds, 2) if wall_seconds > 0 else 0,
+        "mean_ms": round(statistics.mean(latencies), 2),
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "peak_rss_mb": round(peak_rss / 1024 / 1024, 1),
+        "rss_growth_mb": round((peak_rss - baseline_rss) / 1024 / 1024, 1)
+    }
+
+
+def measure(fn: Callable[[], int], iterations: int, warmup: int, unit: str) -> Dict:
+    """
+    预热后重复调用函数并汇总
+
+    Args:
+        fn: 被测函数，返回本次处理的图像（帧）数量
+        iterations: 计时调用次数
+        warmup: 预热调用次数（不计时）
+        unit: 单次延迟对应的处理单位
+
+    Returns:
+        场景统计
+    """
+    for _ in range(warmup):
+        fn()
+
+    baseline_rss = psutil.Process().memory_info().rss
+    latencies = []
+    images = 0
+    with sample_rss() as sampler:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            call_started = time.perf_counter()
+            images += fn()
+            latencies.append((time.perf_counter() - call_started) * 1000)
+        wall_seconds = time.perf_counter() - started
+    return summarize(latencies, images, wall_seconds, sampler.peak, baseline_rss, unit)
+
+
+def _resolve_weights(weights: str) -> str:
+    """本地找不到 .pt 权重时改用同名 .yaml 构建模型，避免联网下载"""
+    project_dir = Path(__file__).parent.parent.parent
+    if Path(weights).exists() or (project_dir / weights).exists():
+        return weights
+    if weights.endswith(".pt"):
+        print(f"本地没有权重文件 {weights}，使用随机初始化的模型（检测数量没有参考意义）")
+        return weights[:-3] + ".yaml"
+    return weights
+
+
+def _environment(detector) -> Dict:
+    """记录运行环境，对比结果时用于判断两次测量是否可比"""
+    import torch
+    import ultralytics
+
+    return {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "processor": platform.processor() or platform.machine(),
+        "physical_cores": psutil.cpu_count(logical=False),
+        "logical_cores": psutil.cpu_count(),
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+        "ultralytics": ultralytics.__version__,
+        "model": detector.model_name,
+        "backend": detector.backend,
+        "device": detector.device
+    }
+
+
+def run_benchmarks(
+    weights: str,
+    scenarios: Optional[List[str]] = None,
+    num_images: int = 16,
+    width: int = 1280,
+    height: int = 720,
+    objects_per_image: int = 10,
+    batch_size: int = 8,
+    iterations: int = 5,
+    warmup: int = 1,
+    video_frames: int = 60,
+    conf: float = 0.25,
+    annotate: bool = False,
+    encode_video: bool = True,
+    execution_mode: str = "thread",
+    seed: int = 0
+) -> Dict:
+    """
+    运行基准测试
+
+    Args:
+        weights: 权重文件，本地不存在时使用同名 .yaml 构建随机初始化的模型
+        scenarios: 要运行的场景，为 None 时运行全部
+        num_images: 合成图像数量
+        width: 图像和视频宽度
+        height: 图像和视频高度
+        objects_per_image: 每张图像（每帧）中的物体数量
+        batch_size: 批量推理和批处理器的批大小
+        iterations: 每个场景的计时调用次数
+        warmup: 每个场景的预热调用次数
+        video_frames: 合成视频帧数
+        conf: 置信度阈值
+        annotate: 是否生成标注图像
+        encode_video: 视频场景是否写出标注视频（包含标注和编码开销）
+        execution_mode: 批处理器执行模式，thread 或 process
+        seed: 随机种子
+
+    Returns:
+        报告字典：运行环境、测试配置和各场景统计
+    """
+    from app.models.detector import ObjectsDetector
+    from app.utils.batch_processor import BatchConfig, BatchProcessor
+
+    scenarios = list(scenarios or SCENARIOS)
+    weights = _resolve_weights(weights)
+    detector = ObjectsDetector(Path(weights).stem, weights_path=weights)
+    detector.load_model()
+
+    images = generate_images(num_images, width, height, objects_per_image, seed=seed)
+    config = {
+        "weights": weights,
+        "num_images": num_images,
+        "resolution": [width, height],
+        "objects_per_image": objects_per_image,
+        "batch_size": batch_size,
+        "iterations": iterations,
+        "warmup": warmup,
+        "video_frames": video_frames,
+        "conf": conf,
+        "annotate": annotate,
+        "encode_video": encode_video,
+        "execution_mode": execution_mode,
+        "seed": seed
+    }
+    report = {"environment": _environment(detector), "config": config, "scenarios": {}}
+    options = {"conf_threshold": conf, "return_annotated": annotate}
+    processor = BatchProcessor(detector, BatchConfig(
+        batch_size=batch_size,
+        gpu_batch_size=batch_size,
+        chunk_size=batch_size,
+        execution_mode=execution_mode
+    ))
+
+    frames = itertools.cycle(images)
+
+    def inputs(batch: List) -> List:
+        """开启标注时每次调用使用输入的副本：标注原地绘制，复用同一组图像会把检测框叠加到之后的输入上"""
+        return [image.copy() for image in batch] if annotate else batch
+
+    def detect_one() -> int:
+        detector.detect_objects(inputs([next(frames)])[0], **options)
+        return 1
+
+    def batch_predict() -> int:
+        return len(detector.batch_predict_optimized(inputs(images[:batch_size]), **options))
+
+    workdir = tempfile.mkdtemp(prefix="yolo_bench_")
+    runners: Dict[str, Callable[[], Dict]] = {
+        # 逐张计时，延迟分位数按单张图像统计
+        "detect_objects": lambda: measure(detect_one, iterations * num_images, warmup * num_images, "image"),
+        "batch_predict_optimized": lambda: measure(batch_predict, iterations, warmup, "batch"),
+        "process_batch": lambda: measure(
+            lambda: len(processor.process_batch(inputs(images), **options)), iterations, warmup, "call"),
+        "process_batch_with_chunks_serial": lambda: measure(
+            lambda: len(processor.process_batch_with_chunks(inputs(images), use_parallel=False, **options)),
+            iterations, warmup, "call"),
+        "process_batch_with_chunks_parallel": lambda: measure(
+            lambda: len(processor.process_batch_with_chunks(inputs(images), use_parallel=True, **options)),
+            iterations, warmup, "call"),
+        "process_video_file_track": lambda: _measure_video(
+            detector, workdir, video_frames, width, height, objects_per_image,
+            batch_size, conf, encode_video, iterations, warmup, seed)
+    }
+
+    try:
+        for name in scenarios:
+            print(f"运行场景：{name}")
+            stats = runners[name]()
+            report["scenarios"][name] = stats
+            print(f"{name}: {stats}")
+    finally:
+        processor.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return report
+
+
+def _measure_video(detector, workdir: str, frames: int, width: int, height: int, objects_per_frame: int,
+                   batch_size: int, conf: float, encode_video: bool, iterations: int, warmup: int,
+                   seed: int) -> Dict:
+    """跟踪处理合成视频，每次调用处理整段视频"""
+    video_path, _ = generate_video(
+        os.path.join(workdir, "input.mp4"), frames, width, height,
+        objects_per_frame=objects_per_frame, seed=seed
+    )
+    output_path = os.path.join(workdir, "output.mp4") if encode_video else None
+
+    def track() -> int:
+        result = detector.process_video_file_track(
+            video_path, output_path, batch_size=batch_size, conf=conf
+        )
+        return result.get("processed_frames", frames)
+
+    return measure(track, iterations, warmup, "video")
+
+
+def compare_reports(current: Dict, baseline: Dict, tolerance: float = 0.1,
+                    rss_tolerance: Optional[float] = None) -> Dict:
+    """
+    把本次结果与基线逐项对比
+
+    Args:
+        current: 本次报告
+        baseline: 基线报告
+        tolerance: 吞吐量和延迟的相对容差，如 0.1 表示变差超过 10% 记为回归
+        rss_tolerance: 内存峰值的相对容差，为 None 时与 tolerance 相同
+
+    Returns:
+        对比结果：各场景各指标的基线值、本次值和变化比例，回归列表，以及配置差异
+    """
+    rss_tolerance = tolerance if rss_tolerance is None else rss_tolerance
+    comparison = {"tolerance": tolerance, "rss_tolerance": rss_tolerance, "scenarios": {}, "regressions": []}
+
+    config_diff = {
+        key: {"baseline": baseline.get("config", {}).get(key), "current": value}
+        for key, value in current.get("config", {}).items()
+        if baseline.get("config", {}).get(key) != value
+    }
+    if config_diff:
+        # 配置不同时结果不可直接比较，仍然给出对比但提示调用方
+        comparison["config_diff"] = config_diff
+
+    for name, stats in current.get("scenarios", {}).items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            continue
+        metrics = {}
+        for metric, higher_is_better in COMPARE_METRICS:
+            if not base.get(metric) or stats.get(metric) is None:
+                continue
+            change = (stats[metric] - base[metric]) / base[metric]
+            limit = rss_tolerance if metric == "peak_rss_mb" else tolerance
+            regressed = (-change if higher_is_better else change) > limit
+            metrics[metric] = {
+                "baseline": base[metric],
+                "current": stats[metric],
+                "change": round(change, 3),
+                "regressed": regressed
+            }
+            if regressed:
+                comparison["regressions"].append(f"{name}.{metric}")
+        comparison["scenarios"][name] = metrics
+
+    return comparison
+
+
+def main():
+    """命令行入口：运行基准测试，可选与基线对比"""
+    parser = argparse.ArgumentParser(description="在合成数据上测量检测器和批处理器的吞吐量、延迟和内存峰值")
+    parser.add_argument("--weights", default=f"{os.getenv('YOLO_MODEL', 'yolov8n')}.pt",
+                        help="权重文件，本地不存在时使用同名 .yaml 构建随机初始化的模型")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="逗号分隔的场景列表")
+    parser.add_argument("--images", type=int, default=16, help="合成图像数量")
+    parser.add_argument("--width", type=int, default=1280, help="图像和视频宽度")
+    parser.add_argument("--height", type=int, default=720, help="图像和视频高度")
+    parser.add_argument("--objects", type=int, default=10, help="每张图像（每帧）中的物体数量")
+    parser.add_argument("--batch-size", type=int, default=8, help="批大小")
+    parser.add_argument("--iterations", type=int, default=5, help="每个场景的计时调用次数")
+    parser.add_argument("--warmup", type=int, default=1, help="每个场景的预热调用次数")
+    parser.add_argument("--video-frames", type=int, default=60, help="合成视频帧数")
+    parser.add_argument("--conf", type=float, default=0.25, help="置信度阈值")
+    parser.add_argument("--annotate", action="store_true", help="生成标注图像")
+    parser.add_argument("--no-video-output", action="store_true", help="视频场景不写出标注视频")
+    parser.add_argument("--execution-mode", default="thread", choices=("thread", "process"), help="批处理器执行模式")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--allow-gpu", action="store_true", help="允许使用 GPU（默认强制 CPU）")
+    parser.add_argument("--output", default=None, help="把报告写入 JSON 文件")
+    parser.add_argument("--compare", default=None, help="基线报告 JSON 文件，与之对比并在回归时以非零状态退出")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="吞吐量和延迟的相对容差")
+    parser.add_argument("--rss-tolerance", type=float, default=None, help="内存峰值的相对容差，默认与 --tolerance 相同")
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知场景：{unknown}，可选：{list(SCENARIOS)}")
+
+    # 必须在导入 torch 之前设置；离线运行时不检查更新、不下载资源
+    if not args.allow_gpu:
+        os.environ["CUDA_VISIBLE_DEVICES"] = ""
+    os.environ.setdefault("YOLO_OFFLINE", "true")
+
+    report = run_benchmarks(
+        args.weights,
+        scenarios=scenarios,
+        num_images=args.images,
+        width=args.width,
+        height=args.height,
+        objects_per_image=args.objects,
+        batch_size=args.batch_size,
+        iterations=args.iterations,
+        warmup=args.warmup,
+        video_frames=args.video_frames,
+        conf=args.conf,
+        annotate=args.annotate,
+        encode_video=not args.no_video_output,
+        execution_mode=args.execution_mode,
+        seed=args.seed
+    )
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        report["comparison"] = compare_reports(report, baseline, args.tolerance, args.rss_tolerance)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+    print(output)
+
+    if args.compare:
+        comparison = report["comparison"]
+        if comparison.get("config_diff"):
+            print(f"警告：与基线的测试配置不同：{list(comparison['config_diff'])}")
+        if comparison["regressions"]:
+            print(f"发现性能回归：{comparison['regressions']}")
+            sys.exit(1)
+        print("未发现性能回归")
+
+
+if __name__ == "__main__":
+    main()
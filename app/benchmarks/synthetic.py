@@ -0,0 +1,135 @@
+"""
+合成测试数据模块
+
+基准测试不依赖外部图片和网络，按固定随机种子生成可复现的测试数据：
+- 图像：渐变背景加噪声，叠加指定数量的矩形、椭圆和多边形“物体”
+- 视频：物体在画面中匀速移动并在边缘反弹，用 OpenCV 写出 mp4
+"""
+
+from pathlib import Path
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+# 物体尺寸相对短边的范围
+OBJECT_SCALE_RANGE = (0.05, 0.3)
+
+
+def _background(rng: np.random.Generator, width: int, height: int) -> np.ndarray:
+    """生成渐变加噪声的背景"""
+    top = rng.integers(0, 256, size=3).astype(np.float32)
+    bottom = rng.integers(0, 256, size=3).astype(np.float32)
+    ramp = np.linspace(0.0, 1.0, height, dtype=np.float32)[:, None, None]
+    image = top * (1 - ramp) + bottom * ramp
+    image = np.broadcast_to(image, (height, width, 3)) + rng.normal(0, 12, size=(height, width, 3))
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def _random_objects(rng: np.random.Generator, width: int, height: int, count: int) -> List[dict]:
+    """生成物体的形状、颜色、位置、尺寸和速度"""
+    short_side = min(width, height)
+    objects = []
+    for _ in range(count):
+        size = int(short_side * rng.uniform(*OBJECT_SCALE_RANGE))
+        objects.append({
+            "shape": rng.choice(("rectangle", "ellipse", "polygon")),
+            "color": tuple(int(c) for c in rng.integers(0, 256, size=3)),
+            "center": np.array([rng.uniform(0, width), rng.uniform(0, height)]),
+            "size": (size, int(size * rng.uniform(0.5, 2.0))),
+            "velocity": rng.uniform(-0.02, 0.02, size=2) * short_side,
+            "angle": float(rng.uniform(0, 180))
+        })
+    return objects
+
+
+def _draw_object(image: np.ndarray, obj: dict):
+    """在图像上绘制一个物体"""
+    cx, cy = (int(v) for v in obj["center"])
+    w, h = obj["size"]
+    if obj["shape"] == "rectangle":
+        cv2.rectangle(image, (cx - w // 2, cy - h // 2), (cx + w // 2, cy + h // 2), obj["color"], -1)
+    elif obj["shape"] == "ellipse":
+        cv2.ellipse(image, (cx, cy), (max(1, w // 2), max(1, h // 2)), obj["angle"], 0, 360, obj["color"], -1)
+    else:
+        box = cv2.boxPoints(((cx, cy), (w, h), obj["angle"])).astype(np.int32)
+        cv2.fillPoly(image, [box], obj["color"])
+
+
+def generate_images(
+    count: int,
+    width: int = 1280,
+    height: int = 720,
+    objects_per_image: int = 10,
+    seed: int = 0
+) -> List[np.ndarray]:
+    """
+    生成合成测试图像
+
+    Args:
+        count: 图像数量
+        width: 图像宽度
+        height: 图像高度
+        objects_per_image: 每张图像中的物体数量（物体密度）
+        seed: 随机种子，相同参数生成的图像完全一致
+
+    Returns:
+        BGR 图像列表
+    """
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        image = _background(rng, width, height)
+        for obj in _random_objects(rng, width, height, objects_per_image):
+            _draw_object(image, obj)
+        images.append(image)
+    return images
+
+
+def generate_video(
+    path: str,
+    frames: int = 120,
+    width: int = 1280,
+    height: int = 720,
+    fps: float = 30.0,
+    objects_per_frame: int = 10,
+    seed: int = 0
+) -> Tuple[str, int]:
+    """
+    生成合成测试视频
+
+    Args:
+        path: 输出视频路径（.mp4）
+        frames: 帧数
+        width: 视频宽度
+        height: 视频高度
+        fps: 帧率
+        objects_per_frame: 画面中的物体数量
+        seed: 随机种子
+
+    Returns:
+        (视频路径, 实际写入的帧数)
+    """
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    background = _background(rng, width, height)
+    objects = _random_objects(rng, width, height, objects_per_frame)
+    bounds = np.array([width, height], dtype=np.float64)
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"无法创建视频文件：{path}")
+    try:
+        for _ in range(frames):
+            frame = background.copy()
+            for obj in objects:
+                _draw_object(frame, obj)
+                obj["center"] += obj["velocity"]
+                # 碰到边缘反弹
+                outside = (obj["center"] < 0) | (obj["center"] > bounds)
+                obj["velocity"][outside] *= -1
+                obj["center"] = np.clip(obj["center"], 0, bounds)
+            writer.write(frame)
+    finally:
+        writer.release()
+    return path, frames
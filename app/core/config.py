@@ -11,7 +11,75 @@ BATCH_PROCESSING = {
     "max_workers": 10,
     "chunk_size": 5,
     "memory_threshold": 80,  # 内存使用阈值百分比
-    "frame_interval_default": 1  # 视频帧处理间隔
+    "frame_interval_default": 1,  # 视频帧处理间隔
+    "enable_shape_bucketing": True,  # 按宽高比分桶，每桶使用匹配的推理尺寸
+    "imgsz": 640,  # 推理尺寸的长边
+    "execution_mode": "thread",  # thread：共享同一模型；process：按块分发到进程池，每个进程独占一个模型
+    "process_workers": None,  # 进程池工作进程数，默认为物理核心数
+    "threads_per_worker": 1,  # 每个工作进程的推理线程数（torch / OpenMP / OpenCV）
+    "adaptive_batching": False,  # 根据实测的每批延迟和吞吐量在线调整批大小
+    "target_latency_ms": None,  # 每批延迟目标，为 None 时追求最大吞吐量
+    "min_batch_size": 1,
+    "max_adaptive_batch_size": 32  # 自适应批大小上限（仍受可用内存限制）
+}
+
+# 推理执行器配置（所有模型推理都在专用线程中执行）
+INFERENCE_EXECUTOR = {
+    "max_workers": 1  # 推理线程数，共享同一模型时保持为 1
+}
+
+# 微批处理相关配置（合并并发的 /detect 请求）
+MICRO_BATCHING = {
+    "enabled": True,
+    "max_wait_ms": 10,  # 收集请求的最长等待时间
+    "max_batch_size": 16  # 单次合并的最大请求数
+}
+
+# 单张检测结果缓存（按上传内容哈希，合并相同的并发请求）
+RESULT_CACHE = {
+    "enabled": True,
+    "max_entries": 512,
+    "ttl_seconds": 30,  # 缓存有效期
+    "max_memory_mb": 128  # 估算内存上限，超出时淘汰最久未使用的结果
+}
+
+# 异步任务配置（视频/批量检测的后台任务）
+JOBS = {
+    "max_workers": 2,  # 同时运行的任务数（同一模型的视频任务共用一个跟踪器，会排队依次执行）
+    "max_pending_jobs": 20,  # 排队任务上限，超出时拒绝提交
+    "max_retained_jobs": 100  # 保留的任务数，超出时清理最早完成的任务及其输出文件
+}
+
+# 单请求分析配置（profile=true 或 X-Profile: 1 时在分析器下执行请求）
+PROFILING = {
+    "enabled": True,
+    "sample_rate": 0.0,  # 未显式请求时随机分析的请求比例，例如 0.001
+    "output_dir": None,  # 分析结果目录，默认为系统临时目录下的 yolo_profiles
+    "max_profiles": 50  # 保留的分析结果数，超出时删除最早的
+}
+
+# 标注图像绘制样式（检测框和预渲染的标签图块，直接绘制在输入图像上）
+ANNOTATION_STYLE = {
+    "line_width": None,  # 检测框线宽，为 None 时按图像尺寸自动计算
+    "font_scale": 0.5,
+    "font_thickness": 1,
+    "show_labels": True,
+    "show_conf": True,
+    "show_track_ids": True  # 视频跟踪时在标签前显示跟踪 ID
+}
+
+# WebSocket 实时检测配置
+WEBSOCKET_CONFIG = {
+    "stats_interval": 10  # 每处理多少帧向前端发送一次帧统计
+}
+
+# 多模型注册表配置（请求通过 model 参数选择模型）
+MODEL_REGISTRY = {
+    "max_models": 3,  # 同时保留的模型数（含默认模型）
+    "memory_budget_mb": 2048,  # 按需加载的模型的估算内存预算，超出时卸载最久未使用的模型
+    "allowed_models": ["yolov8n", "yolov8s", "yolov8m"],  # 允许请求的官方模型
+    "custom_models": {},  # 自定义权重：{"名称": "权重文件路径"}
+    "loader_threads": 2  # 模型加载线程数，下载、导出和加载不占用推理线程
 }
 
 # 模型相关配置
@@ -1,44 +1,175 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from app.api.routes import router
-from app.models.detector import detector
+from fastapi.responses import FileResponse, Response
+from app.api.routes import router, inference_executor, shutdown_micro_batchers
+from app.models.detector import detector, COCO_CLASSES
+from app.utils.inference_executor import run_blocking, shutdown_inference_executor
+from app.utils.job_manager import shutdown_job_manager
+from app.utils.process_pool import shutdown_process_pools
+from app.models.registry import shutdown_model_registry
+from app.utils.metrics import get_metrics, CONTENT_TYPE, STAGE_DECODE, STAGE_ENCODE
+from app.utils.frame_pipeline import LatestFrameSlot
+from app.utils.detection_protocol import (
+    MODE_IMAGE, MODE_BINARY, SUPPORTED_MODES,
+    encode_detections_json, encode_detections_binary
+)
+from app.core.config import WEBSOCKET_CONFIG
+import asyncio
 import os
+import time
 import cv2
 import numpy as np
 
 # 创建应用
 app = FastAPI()
 
-# 启动时加载模型
+# 启动时加载并预热模型
 @app.on_event("startup")
 async def startup_event():
     detector.load_model()
+    detector.warmup()
+
+# 关闭时释放推理线程
+@app.on_event("shutdown")
+async def shutdown_event():
+    # 先取消后台任务，再关闭它们依赖的推理执行器
+    await shutdown_micro_batchers()
+    shutdown_job_manager()
+    shutdown_model_registry()
+    shutdown_process_pools()
+    shutdown_inference_executor()
 
 # 注册路由
 app.include_router(router, prefix="/api/v1")
 
+metrics = get_metrics()
+
+
+# 记录每个 HTTP 请求的耗时和状态，端点按路由模板归类（避免 /jobs/{job_id} 产生大量标签）
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    metrics.requests_in_flight.inc(method=request.method)
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.requests_in_flight.dec(method=request.method)
+        route = request.scope.get("route")
+        endpoint = getattr(route, "path", "unmatched")
+        metrics.request_seconds.observe(
+            time.perf_counter() - started, endpoint=endpoint, method=request.method, status=status
+        )
+        metrics.requests_total.inc(endpoint=endpoint, method=request.method, status=status)
+
+
+# Prometheus 指标
+@app.get("/metrics")
+async def prometheus_metrics():
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
+
+
+def _decode_frame(data: bytes):
+    """解码前端发送的二进制图片"""
+    with metrics.time_stage(STAGE_DECODE, "/ws/detect", detector.model_name):
+        return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+
+def _encode_frame(image) -> bytes:
+    """将标注后的图片编码为 JPEG 二进制"""
+    with metrics.time_stage(STAGE_ENCODE, "/ws/detect", detector.model_name):
+        _, buffer = cv2.imencode('.jpg', image)
+        return bytes(buffer)
+
+
 # WebSocket 实时视频检测
 @app.websocket("/ws/detect")
 async def websocket_detect(websocket: WebSocket):
     await websocket.accept()
     print("WebSocket 连接已建立")
 
+    # 协商返回模式：image 返回标注后的 JPEG，json/binary 只返回检测框由前端绘制
+    mode = websocket.query_params.get("mode", MODE_IMAGE)
+    if mode not in SUPPORTED_MODES:
+        await websocket.send_json({
+            "success": False,
+            "error": f"Unsupported mode: {mode}, expected one of {list(SUPPORTED_MODES)}"
+        })
+        await websocket.close(code=1008)
+        return
+
+    classes = websocket.query_params.get("classes")
+    class_list = [c.strip() for c in classes.split(',') if c.strip()] if classes else None
+    try:
+        conf_threshold = float(websocket.query_params.get("conf", 0.5))
+    except ValueError:
+        conf_threshold = 0.5
+
+    if mode != MODE_IMAGE:
+        await websocket.send_json({
+            "type": "hello",
+            "mode": mode,
+            "class_names": COCO_CLASSES
+        })
+
+    # 最新帧优先：接收任务只保留最新一帧，推理任务总是处理最新的帧
+    slot = LatestFrameSlot()
+    stats_interval = WEBSOCKET_CONFIG["stats_interval"]
+
+    async def receive_frames():
+        # 其他异常（如客户端发送文本消息）向上抛出，由处理循环结束后统一报告
+        try:
+            while True:
+                # 接收前端发送的二进制图片
+                data = await websocket.receive_bytes()
+                slot.put(data)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            slot.close()
+
+    receiver = asyncio.create_task(receive_frames())
+
     try:
         while True:
-            # 接收前端发送的二进制图片
-            data = await websocket.receive_bytes()
+            item = await slot.get()
+            if item is None:
+                break
+            data, received_at, seq = item
 
             try:
-                # 直接解码二进制图片
-                frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+                # 解码、推理和编码都不在事件循环中执行
+                frame = await run_blocking(_decode_frame, data)
 
                 if frame is not None:
                     # 检测
-                    result = detector.detect_video_frame(frame)
-                    if result.get("annotated_image") is not None:
-                        _, buffer = cv2.imencode('.jpg', result["annotated_image"])
-                        await websocket.send_bytes(bytes(buffer))
+                    if mode == MODE_IMAGE:
+                        result = await inference_executor.submit(
+                            detector.detect_video_frame, frame,
+                            classes=class_list, conf_threshold=conf_threshold
+                        )
+                        metrics.observe_result(result, "/ws/detect", detector.model_name)
+                        if result.get("annotated_image") is not None:
+                            buffer = await run_blocking(_encode_frame, result["annotated_image"])
+                            await websocket.send_bytes(buffer)
+                    else:
+                        # 只返回检测框，跳过服务端的绘制和 JPEG 编码
+                        result = await inference_executor.submit(
+                            detector.detect_objects, frame,
+                            return_annotated=False, classes=class_list, conf_threshold=conf_threshold
+                        )
+                        metrics.observe_result(result, "/ws/detect", detector.model_name)
+                        if mode == MODE_BINARY:
+                            await websocket.send_bytes(encode_detections_binary(result, seq))
+                        else:
+                            await websocket.send_json(encode_detections_json(result, seq))
+                    slot.mark_processed(received_at)
+
+                    # 定期向前端报告处理和丢弃的帧数
+                    if slot.processed % stats_interval == 0:
+                        await websocket.send_json({"type": "stats", **slot.get_stats()})
 
                 else:
                     await websocket.send_json({
@@ -46,14 +177,29 @@ async def websocket_detect(websocket: WebSocket):
                         "error": "Image decode failed"
                     })
 
+            except WebSocketDisconnect:
+                raise
             except Exception as e:
+                if receiver.done():
+                    break
                 await websocket.send_json({
                     "success": False,
                     "error": str(e)
                 })
 
     except WebSocketDisconnect:
-        print("WebSocket 连接已断开")
+        pass
+    finally:
+        receiver.cancel()
+        await asyncio.wait([receiver])
+        if not receiver.cancelled() and receiver.exception() is not None:
+            error = receiver.exception()
+            print(f"WebSocket 接收帧失败：{error!r}")
+            try:
+                await websocket.close(code=1011)
+            except Exception:
+                pass
+        print(f"WebSocket 连接已断开，帧统计：{slot.get_stats()}")
 
 # 静态文件服务
 static_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static")
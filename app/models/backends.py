@@ -0,0 +1,222 @@
+"""
+推理后端模块
+
+在 CPU 节点上把 PyTorch 权重导出为 ONNX Runtime 或 OpenVINO 模型：
+- 通过环境变量 YOLO_BACKEND 选择后端：pytorch（默认）、onnx、openvino、openvino_int8（见 quantization 模块），
+  mock 为不加载权重的确定性模拟后端（见 mock_backend 模块），用于在没有模型和 GPU 时调优服务层
+- 每份权重只导出一次，导出产物按权重文件哈希缓存，权重变化后自动重新导出
+- 导出模型仍通过 ultralytics YOLO 加载，predict / track 的输出格式与 PyTorch 路径一致
+- 提供基准测试模式，对比各后端与 PyTorch 的延迟和检测结果
+
+基准测试：
+    python -m app.models.backends --weights yolov8n.pt --backends pytorch,onnx,openvino --runs 50
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import statistics
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+SUPPORTED_BACKENDS = ("pytorch", "onnx", "openvino", "openvino_int8", "mock")
+
+# 推理后端和导出缓存目录，可通过环境变量覆盖
+DEFAULT_BACKEND = os.getenv('YOLO_BACKEND', 'pytorch').lower()
+EXPORT_CACHE_DIR = os.getenv('YOLO_EXPORT_DIR', str(Path(__file__).parent.parent.parent / '.model_cache'))
+
+
+def weights_hash(weights_path: str) -> str:
+    """计算权重文件的 BLAKE2b 哈希（前 16 位十六进制）"""
+    digest = hashlib.blake2b(digest_size=8)
+    with open(weights_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def export_model(
+    weights_path: str,
+    backend: str,
+    cache_dir: str = EXPORT_CACHE_DIR,
+    imgsz: int = 640
+) -> str:
+    """
+    把 PyTorch 权重导出为指定后端的模型，已导出过的权重直接返回缓存的产物
+
+    导出时启用动态输入尺寸，批量推理和按宽高比分桶的矩形推理尺寸都可以使用同一份产物
+
+    Args:
+        weights_path: .pt 权重文件路径
+        backend: 后端名称，onnx 或 openvino
+        cache_dir: 导出产物缓存目录
+        imgsz: 导出时的参考推理尺寸
+
+    Returns:
+        导出模型的路径（ONNX 文件或 OpenVINO 模型目录）
+    """
+    if backend not in ("onnx", "openvino"):
+        raise ValueError(f"Unsupported export backend: {backend}")
+
+    weights = Path(weights_path)
+    target_dir = Path(cache_dir) / f"{weights.stem}-{weights_hash(str(weights))}"
+    target = target_dir / (f"{weights.stem}.onnx" if backend == "onnx" else f"{weights.stem}_openvino_model")
+    if target.exists():
+        print(f"使用已缓存的 {backend} 模型：{target}")
+        return str(target)
+
+    print(f"导出 {backend} 模型：{weights} → {target}")
+    started = time.time()
+    exported = YOLO(str(weights)).export(format=backend, imgsz=imgsz, dynamic=True, half=False, verbose=False)
+
+    target_dir.mkdir(parents=True, exist_ok=True)
+    shutil.move(str(exported), str(target))
+    print(f"导出完成，耗时 {time.time() - started:.1f}s")
+    return str(target)
+
+
+def load_backend_model(weights_path: str, backend: str, cache_dir: str = EXPORT_CACHE_DIR) -> YOLO:
+    """
+    加载指定后端的模型
+
+    Args:
+        weights_path: .pt 权重文件路径（mock 后端不使用）
+        backend: 后端名称
+        cache_dir: 导出产物缓存目录
+
+    Returns:
+        ultralytics YOLO 模型（mock 后端为接口兼容、使用 COCO 类别名称的 MockYOLO）
+    """
+    if backend == "pytorch":
+        return YOLO(weights_path)
+    if backend == "mock":
+        # 延迟导入：detector 模块导入了本模块
+        from app.models.detector import COCO_CLASSES
+        from app.models.mock_backend import MockYOLO
+        return MockYOLO(names=COCO_CLASSES)
+    if backend == "openvino_int8":
+        from app.models.quantization import export_int8_model
+        return YOLO(export_int8_model(weights_path, cache_dir=cache_dir), task="detect")
+    return YOLO(export_model(weights_path, backend, cache_dir), task="detect")
+
+
+def _load_images(image_dir: Optional[str], count: int, imgsz: int) -> List[np.ndarray]:
+    """读取基准测试图片，未指定目录时生成随机图像"""
+    if image_dir:
+        paths = sorted(
+            p for p in Path(image_dir).iterdir()
+            if p.suffix.lower() in (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+        )[:count]
+        images = [image for image in (cv2.imread(str(p)) for p in paths) if image is not None]
+        if images:
+            return images
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, (imgsz, imgsz, 3), dtype=np.uint8) for _ in range(count)]
+
+
+def benchmark_backends(
+    weights_path: str,
+    backends: List[str],
+    image_dir: Optional[str] = None,
+    runs: int = 20,
+    batch_size: int = 1,
+    imgsz: int = 640,
+    warmup: int = 3
+) -> Dict:
+    """
+    对比各后端的推理延迟和检测结果
+
+    Args:
+        weights_path: .pt 权重文件路径
+        backends: 要测试的后端列表，第一个作为基准（通常为 pytorch）
+        image_dir: 测试图片目录，为 None 时使用随机图像
+        runs: 计时的推理次数
+        batch_size: 每次推理的图片数
+        imgsz: 推理尺寸
+        warmup: 预热次数
+
+    Returns:
+        各后端的延迟统计、相对基准的加速比和检测数量差异
+    """
+    images = _load_images(image_dir, max(batch_size, 8), imgsz)
+    batches = [
+        [images[(i * batch_size + j) % len(images)] for j in range(batch_size)]
+        for i in range(runs)
+    ]
+
+    report = {"weights": weights_path, "runs": runs, "batch_size": batch_size, "backends": {}}
+    baseline = None
+    for backend in backends:
+        model = load_backend_model(weights_path, backend)
+        for _ in range(warmup):
+            model.predict(batches[0], imgsz=imgsz, device="cpu", verbose=False)
+
+        latencies = []
+        detections = []
+        for batch in batches:
+            started = time.perf_counter()
+            results = model.predict(batch, imgsz=imgsz, device="cpu", verbose=False)
+            latencies.append((time.perf_counter() - started) * 1000)
+            detections.append(sum(len(result.boxes) for result in results))
+
+        latencies.sort()
+        stats = {
+            "mean_ms": round(statistics.mean(latencies), 2),
+            "p50_ms": round(latencies[len(latencies) // 2], 2),
+            "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+            "images_per_second": round(batch_size * 1000 / statistics.mean(latencies), 2),
+            "detections": sum(detections)
+        }
+        if baseline is None:
+            baseline = (stats, detections)
+        else:
+            stats["speedup"] = round(baseline[0]["mean_ms"] / stats["mean_ms"], 2)
+            stats["detection_count_mismatches"] = sum(
+                1 for a, b in zip(baseline[1], detections) if a != b
+            )
+        report["backends"][backend] = stats
+        print(f"{backend}: {stats}")
+
+    return report
+
+
+def main():
+    """命令行入口：对比各后端的推理性能"""
+    parser = argparse.ArgumentParser(description="对比 PyTorch / ONNX Runtime / OpenVINO 推理后端")
+    parser.add_argument("--weights", default=f"{os.getenv('YOLO_MODEL', 'yolov8n')}.pt", help="PyTorch 权重文件")
+    parser.add_argument("--backends", default="pytorch,onnx,openvino", help="逗号分隔的后端列表，第一个作为基准")
+    parser.add_argument("--images", default=None, help="测试图片目录，不指定时使用随机图像")
+    parser.add_argument("--runs", type=int, default=20, help="计时的推理次数")
+    parser.add_argument("--batch-size", type=int, default=1, help="每次推理的图片数")
+    parser.add_argument("--imgsz", type=int, default=640, help="推理尺寸")
+    parser.add_argument("--output", default=None, help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    backends = [b.strip().lower() for b in args.backends.split(",") if b.strip()]
+    unknown = [b for b in backends if b not in SUPPORTED_BACKENDS]
+    if unknown:
+        parser.error(f"未知后端：{unknown}，可选：{list(SUPPORTED_BACKENDS)}")
+
+    report = benchmark_backends(
+        args.weights,
+        backends,
+        image_dir=args.images,
+        runs=args.runs,
+        batch_size=args.batch_size,
+        imgsz=args.imgsz
+    )
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
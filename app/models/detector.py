@@ -2,13 +2,19 @@ import cv2
 import numpy as np
 import torch
 from ultralytics import YOLO
-from typing import List, Dict, Optional, Union
+from typing import Callable, List, Dict, Iterator, Optional, Tuple, Union
 import time
 from pathlib import Path
 import os
 import imageio
 import psutil
 import gc
+import threading
+
+from app.utils.video_pipeline import VideoPipeline
+from app.utils.frame_ring import FrameRingBuffer
+from app.utils.box_renderer import get_box_renderer
+from app.models.backends import DEFAULT_BACKEND, SUPPORTED_BACKENDS, load_backend_model
 
 # 默认模型，可通过环境变量覆盖
 DEFAULT_MODEL = os.getenv('YOLO_MODEL', 'yolov8n')
@@ -74,11 +80,24 @@ class MemoryManager:
 class ObjectsDetector:
     """通用物体检测器，支持 COCO 数据集的 80 个类别"""
 
-    def __init__(self):
+    def __init__(self, model_name: Optional[str] = None, weights_path: Optional[str] = None):
+        """
+        :param model_name: 模型名称，默认使用 YOLO_MODEL 环境变量指定的模型
+        :param weights_path: 自定义权重文件路径，默认在项目目录中查找 {model_name}.pt
+        """
+        self.requested_model = model_name
+        self.weights_path = weights_path
         self.model = None
+        self.model_name = None
+        self.backend = None
         self.device = None
         self.model_loaded = False
         self.memory_manager = MemoryManager()
+        # 视频跟踪使用独立的模型实例，跟踪器状态和回调不影响 predict；
+        # 跟踪器只有一份，同一时间只能跟踪一个视频，调用方需在整个视频处理期间持有 track_lock
+        self.track_lock = threading.Lock()
+        self._track_model = None
+        self._source_weights = None
 
     def _fourcc_to_str(self, fourcc):
         """将 fourcc 编码转换为字符串"""
@@ -87,13 +106,8 @@ class ObjectsDetector:
         except:
             return str(fourcc)
 
-    def load_model(self):
-        """加载 YOLO 模型"""
-        model_name = DEFAULT_MODEL
-        model_file = f"{model_name}.pt"
-
-        print(f"使用模型：{model_name}")
-
+    def _load_weights(self, model_file: str) -> Path:
+        """加载 ultralytics 权重：依次查找当前目录和项目目录，都不存在时下载"""
         model_path = Path(model_file)
 
         if model_path.exists():
@@ -115,14 +129,75 @@ class ObjectsDetector:
                     print(f"模型下载失败：{e}")
                     print(f"请手动下载模型文件放到项目根目录:")
                     print(f"   https://github.com/ultralytics/assets/releases/download/v8.4.0/{model_file}")
+                    print(f"或设置 YOLO_BACKEND=mock 使用不需要权重的模拟后端")
                     raise
+        return model_path
+
+    def load_model(self):
+        """加载 YOLO 模型"""
+        model_name = self.requested_model or DEFAULT_MODEL
+        model_file = self.weights_path or f"{model_name}.pt"
+
+        print(f"使用模型：{model_name}")
+
+        backend = DEFAULT_BACKEND
+        if backend not in SUPPORTED_BACKENDS:
+            print(f"警告：未知推理后端 '{backend}'，使用 pytorch")
+            backend = "pytorch"
+
+        if backend == "mock":
+            # 模拟后端不加载权重，也不会联网下载
+            self.model = load_backend_model(model_file, backend)
+            self.device = 'cpu'
+            print(f"模拟推理配置：{self.model.config}")
+        else:
+            model_path = self._load_weights(model_file)
+            self._source_weights = getattr(self.model, "ckpt_path", None) or str(model_path)
+
+            if backend != "pytorch":
+                # 导出为 CPU 推理运行时（按权重哈希缓存），输出格式与 PyTorch 路径一致
+                try:
+                    self.model = load_backend_model(self._source_weights, backend)
+                    self.device = 'cpu'
+                except Exception as e:
+                    print(f"{backend} 后端加载失败，回退到 pytorch：{e}")
+                    backend = "pytorch"
 
-        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        print(f"使用设备：{self.device}")
-        self.model.to(self.device)
+            if backend == "pytorch":
+                self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+                self.model.to(self.device)
+
+        print(f"推理后端：{backend}，使用设备：{self.device}")
+        self.backend = backend
+        self.model_name = model_name
         self.model_loaded = True
         print("模型加载完成")
 
+    def warmup(self, imgsz: int = 640):
+        """
+        用一张空白图像执行一次推理，提前完成 CUDA 上下文、推理运行时和内存分配的初始化，
+        避免第一个请求承担这部分延迟；预热失败只打印警告
+
+        Args:
+            imgsz: 空白图像的边长
+        """
+        if not self.model_loaded:
+            raise Exception("Model not loaded. Please load the model first.")
+
+        started = time.time()
+        try:
+            self.model.predict(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), device=self.device, verbose=False)
+            print(f"模型 {self.model_name} 预热完成：{(time.time() - started) * 1000:.0f}ms")
+        except Exception as e:
+            print(f"模型 {self.model_name} 预热失败：{e}")
+
+    @property
+    def model_id(self) -> str:
+        """模型标识（模型名称和推理后端），用于结果缓存等需要区分模型的场景"""
+        if not self.model_loaded:
+            return "unloaded"
+        return f"{self.model_name}:{self.backend}"
+
     def _parse_classes(self, classes: Optional[Union[List[int], List[str]]]) -> Optional[List[int]]:
         """
         解析类别参数，将类别名称转换为类别 ID
@@ -146,6 +221,162 @@ class ObjectsDetector:
 
         return class_ids if class_ids else None
 
+    def _empty_boxes(self) -> Dict[str, Optional[np.ndarray]]:
+        """空的检测框数据"""
+        return {
+            "xyxy": np.empty((0, 4), dtype=np.float32),
+            "conf": np.empty((0,), dtype=np.float32),
+            "cls": np.empty((0,), dtype=np.int64),
+            "track_ids": None
+        }
+
+    def _extract_boxes(self, result) -> Dict[str, Optional[np.ndarray]]:
+        """
+        将单张图像的检测框一次性转换为 NumPy 数组
+        :param result: ultralytics 的单张图像检测结果
+        :return: 包含 xyxy / conf / cls / track_ids 的字典，track_ids 仅在跟踪模式下存在
+        """
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return self._empty_boxes()
+
+        # boxes.data 的每一行为 [x1, y1, x2, y2, (track_id), conf, cls]，只做一次设备到主机的传输
+        data = boxes.data
+        data = data.cpu().numpy() if hasattr(data, 'cpu') else np.asarray(data)
+
+        return {
+            "xyxy": data[:, :4],
+            "conf": data[:, -2],
+            "cls": data[:, -1].astype(np.int64),
+            "track_ids": data[:, 4].astype(np.int64) if data.shape[1] == 7 else None
+        }
+
+    def _build_objects(self, boxes: Dict[str, Optional[np.ndarray]]) -> List[Dict]:
+        """
+        由 NumPy 检测框数据批量构建结果列表
+        :param boxes: _extract_boxes 返回的检测框数据
+        :return: 物体列表，格式与接口返回的 objects 一致
+        """
+        xyxy = boxes["xyxy"]
+        if len(xyxy) == 0:
+            return []
+
+        coords = xyxy.astype(np.int64).tolist()
+        sizes = (xyxy[:, 2:4] - xyxy[:, 0:2]).astype(np.int64).tolist()
+        confidences = np.round(boxes["conf"].astype(np.float64), 3).tolist()
+        class_ids = boxes["cls"].tolist()
+
+        objects = [
+            {
+                "bbox": {
+                    "x1": x1,
+                    "y1": y1,
+                    "x2": x2,
+                    "y2": y2,
+                    "width": width,
+                    "height": height
+                },
+                "confidence": confidence,
+                "class_id": class_id,
+                "class_name": COCO_CLASSES.get(class_id, f'unknown_{class_id}')
+            }
+            for (x1, y1, x2, y2), (width, height), confidence, class_id
+            in zip(coords, sizes, confidences, class_ids)
+        ]
+
+        if boxes["track_ids"] is not None:
+            for obj, track_id in zip(objects, boxes["track_ids"].tolist()):
+                obj["track_id"] = track_id
+
+        return objects
+
+    def _build_columns(self, boxes: Dict[str, Optional[np.ndarray]]) -> Dict:
+        """
+        由 NumPy 检测框数据构建列式结果（紧凑格式）
+        :param boxes: _extract_boxes 返回的检测框数据
+        :return: 包含扁平 boxes [x1, y1, x2, y2, ...]、scores、class_ids（及 track_ids）的字典
+        """
+        columns = {
+            "boxes": boxes["xyxy"].astype(np.int64).ravel().tolist(),
+            "scores": np.round(boxes["conf"].astype(np.float64), 3).tolist(),
+            "class_ids": boxes["cls"].tolist()
+        }
+        if boxes["track_ids"] is not None:
+            columns["track_ids"] = boxes["track_ids"].tolist()
+        return columns
+
+    def _format_detections(self, boxes: Dict[str, Optional[np.ndarray]], result_format: str) -> Dict:
+        """
+        按结果格式构建检测数据
+        :param boxes: _extract_boxes 返回的检测框数据
+        :param result_format: "objects" 或 "columnar"
+        :return: {"objects": [...]} 或列式数组字典
+        """
+        if result_format == "columnar":
+            return self._build_columns(boxes)
+        return {"objects": self._build_objects(boxes)}
+
+    def _result_speed(self, result, annotate_seconds: Optional[float] = None) -> Dict[str, float]:
+        """
+        单张图像的分阶段耗时（毫秒）
+
+        预处理、推理和后处理取自 ultralytics 的 result.speed（批量推理时为该批的平均值），
+        标注耗时为本服务绘制标注图像的时间
+        """
+        speed = {
+            stage: round(float(value), 2)
+            for stage, value in (getattr(result, "speed", None) or {}).items()
+            if value is not None
+        }
+        if annotate_seconds is not None:
+            speed["annotate"] = round(annotate_seconds * 1000, 2)
+        return speed
+
+    def _get_track_model(self):
+        """
+        获取视频跟踪专用的模型实例（首次使用时加载）
+
+        model.track 会在模型上注册跟踪回调，与 predict 共用同一个模型时图片检测也会经过跟踪器，
+        因此跟踪使用单独加载的模型；导出产物已按权重哈希缓存，不会重复导出。
+        模拟后端没有跟踪器状态，直接复用检测模型。
+        """
+        if self._track_model is None:
+            if self.backend == "mock" or not self._source_weights:
+                self._track_model = self.model
+            else:
+                track_model = load_backend_model(self._source_weights, self.backend)
+                if self.backend == "pytorch":
+                    track_model.to(self.device)
+                self._track_model = track_model
+        return self._track_model
+
+    @property
+    def has_track_model(self) -> bool:
+        """是否已为视频跟踪另外加载了一份模型实例"""
+        return self._track_model is not None and self._track_model is not self.model
+
+    def _reset_tracker(self):
+        """重置模型上持久化的跟踪器状态，避免上一个视频的轨迹串到下一个视频"""
+        predictor = getattr(self._get_track_model(), "predictor", None)
+        for tracker in getattr(predictor, "trackers", None) or []:
+            tracker.reset()
+
+    def _draw_boxes(self, image: np.ndarray, boxes: Dict[str, Optional[np.ndarray]], names=None) -> np.ndarray:
+        """
+        在图像上原地绘制检测框和标签（不拷贝图像，没有检测框时原样返回）
+        :param image: BGR 图像，由调用方独占（解码得到的图像或帧槽）
+        :param boxes: _extract_boxes 返回的检测框数据
+        :param names: 类别名称表，默认为 COCO 类别
+        :return: 绘制后的图像
+        """
+        return get_box_renderer().draw(
+            image, boxes["xyxy"], boxes["conf"], boxes["cls"], boxes["track_ids"], names or COCO_CLASSES
+        )
+
+    def _annotate_track_result(self, result) -> np.ndarray:
+        """绘制跟踪结果（含跟踪 ID），在视频流水线的标注/编码线程中调用，直接画在帧槽上"""
+        return self._draw_boxes(result.orig_img, self._extract_boxes(result), result.names)
+
     def detect_objects(
         self,
         image: np.ndarray,
@@ -156,7 +387,8 @@ class ObjectsDetector:
         """
         检测图像中的物体
         :param image: 输入图像 (BGR 格式)
-        :param return_annotated: 是否返回标注后的图像
+        :param return_annotated: 是否返回标注后的图像。标注直接绘制在输入图像上，不另行拷贝：
+                                 调用方需独占该图像，之后还要复用原图（如重复检测同一张图）时应传入副本
         :param classes: 要检测的类别列表，可以是类别 ID 或类别名称
                        如果为 None，则检测所有 80 个类别
                        例如：[0] 或 ['person'] 只检测人，['car', 'person'] 检测车和人
@@ -181,41 +413,23 @@ class ObjectsDetector:
         results = self.model.predict(image, **predict_kwargs)
         inference_time = time.time() - start_time
 
-        objects = []
         result = results[0]
+        boxes = self._extract_boxes(result)
+        objects = self._build_objects(boxes)
 
         annotated_image = None
+        annotate_seconds = None
         if return_annotated:
-            annotated_image = result.plot() if len(result.boxes) > 0 else image.copy()
-
-        if result.boxes is not None:
-            for box in result.boxes:
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                confidence = float(box.conf[0])
-                class_id = int(box.cls[0])
-                class_name = COCO_CLASSES.get(class_id, f'unknown_{class_id}')
-
-                objects.append(
-                    {
-                        "bbox": {
-                            "x1": int(x1),
-                            "y1": int(y1),
-                            "x2": int(x2),
-                            "y2": int(y2),
-                            "width": int(x2 - x1),
-                            "height": int(y2 - y1)
-                        },
-                        "confidence": round(confidence, 3),
-                        "class_id": class_id,
-                        "class_name": class_name
-                    }
-                )
+            annotate_started = time.perf_counter()
+            annotated_image = self._draw_boxes(image, boxes, result.names)
+            annotate_seconds = time.perf_counter() - annotate_started
 
         return {
             "success": True,
             "object_count": len(objects),
             "objects": objects,
             "inference_time_ms": round(inference_time * 1000, 2),
+            "speed": self._result_speed(result, annotate_seconds),
             "image_shape": {
                 "height": image.shape[0],
                 "width": image.shape[1]
@@ -256,14 +470,22 @@ class ObjectsDetector:
         images: List[np.ndarray],
         return_annotated: bool = False,
         classes: Optional[Union[List[int], List[str]]] = None,
-        conf_threshold: float = 0.5
+        conf_threshold: float = 0.5,
+        result_format: str = "objects",
+        return_raw: bool = False,
+        imgsz: Optional[Union[int, Tuple[int, int]]] = None
     ) -> List[Dict]:
         """
         使用优化的批量预测方法检测多张图像
         :param images: 图像列表
-        :param return_annotated: 是否返回标注后的图像
+        :param return_annotated: 是否返回标注后的图像。标注直接绘制在输入图像上，不另行拷贝：
+                                 调用方需独占这些图像，之后还要复用原图时应传入副本；
+                                 整批检测完成后才开始绘制，推理失败时输入图像不会被修改
         :param classes: 要检测的类别列表
         :param conf_threshold: 置信度阈值
+        :param result_format: 结果格式，"objects" 为逐个物体的字典，"columnar" 为列式数组
+        :param return_raw: 是否在 "raw_result" 中保留原始推理结果，供调用方之后按需用 render_annotation 渲染
+        :param imgsz: 推理尺寸，整数或 (高, 宽)，为 None 时使用模型默认尺寸
         :return: 检测结果列表
         """
         if not self.model_loaded:
@@ -283,55 +505,52 @@ class ObjectsDetector:
         }
         if class_ids is not None:
             predict_kwargs['classes'] = class_ids
+        if imgsz is not None:
+            predict_kwargs['imgsz'] = imgsz
 
         batch_results = self.model.predict(images, **predict_kwargs)
+        # 整批推理耗时按图像数平均，不包含之后逐张绘制标注的时间
+        inference_time_ms = round((time.time() - start_time) * 1000 / len(images), 2)
 
         results = []
+        batch_boxes = []
         for i, result in enumerate(batch_results):
-            objects = []
-            if result.boxes is not None:
-                for box in result.boxes:
-                    x1, y1, x2, y2 = box.xyxy[0].tolist()
-                    confidence = float(box.conf[0])
-                    class_id = int(box.cls[0])
-                    class_name = COCO_CLASSES.get(class_id, f'unknown_{class_id}')
-
-                    objects.append(
-                        {
-                            "bbox": {
-                                "x1": int(x1),
-                                "y1": int(y1),
-                                "x2": int(x2),
-                                "y2": int(y2),
-                                "width": int(x2 - x1),
-                                "height": int(y2 - y1)
-                            },
-                            "confidence": round(confidence, 3),
-                            "class_id": class_id,
-                            "class_name": class_name
-                        }
-                    )
-
-            annotated_image = None
-            if return_annotated:
-                annotated_image = result.plot() if len(result.boxes) > 0 else images[i].copy()
-
-            inference_time_ms = round((time.time() - start_time) * 1000 / len(images), 2)
+            boxes = self._extract_boxes(result)
+            batch_boxes.append(boxes)
+            detections = self._format_detections(boxes, result_format)
 
             results.append({
                 "success": True,
-                "object_count": len(objects),
-                "objects": objects,
+                "object_count": len(boxes["xyxy"]),
+                **detections,
                 "inference_time_ms": inference_time_ms,
+                "speed": self._result_speed(result, None),
                 "image_shape": {
                     "height": images[i].shape[0],
                     "width": images[i].shape[1]
                 },
-                "annotated_image": annotated_image
+                "annotated_image": None
             })
+            if return_raw:
+                results[-1]["raw_result"] = result
+
+        # 整批结果都转换完成后才开始绘制：推理或转换失败时输入图像保持原样，调用方可以直接逐张重试
+        if return_annotated:
+            for image, boxes, result, item in zip(images, batch_boxes, batch_results, results):
+                annotate_started = time.perf_counter()
+                item["annotated_image"] = self._draw_boxes(image, boxes, result.names)
+                item["speed"] = self._result_speed(result, time.perf_counter() - annotate_started)
 
         return results
 
+    def render_annotation(self, result) -> np.ndarray:
+        """
+        把保留的原始推理结果绘制为标注图像（BGR 格式）
+
+        不访问模型，可以在推理线程以外并行调用；直接画在推理时的输入图像上
+        """
+        return self._draw_boxes(result.orig_img, self._extract_boxes(result), result.names)
+
     def detect_video_frame(self, frame: np.ndarray, **kwargs) -> Dict:
         """
         检测视频单帧，返回带标注的图片和结果
@@ -622,7 +841,7 @@ class ObjectsDetector:
     #         "batch_processing_used": use_batch_processing
     #     }
 
-    def process_video_file_track(
+    def iter_video_track(
             self,
             video_path: str,
             output_path: str = None,
@@ -631,9 +850,23 @@ class ObjectsDetector:
             batch_size: int = 8,
             frame_interval: int = 1,
             conf: Optional[float] = 0.5,
-        ) -> Dict:
+            result_format: str = "objects",
+            stage_observer: Optional[Callable[[str, float], None]] = None,
+        ) -> Iterator[Dict]:
         """
-        处理视频文件（跟踪模式）
+        逐帧处理视频文件（跟踪模式），边处理边产出结果
+
+        每隔 frame_interval 帧解码并跟踪一帧，其余帧只 grab 不解码；
+        启用批处理时每次把 batch_size 个待处理帧一起送入 model.track，跟踪器按帧顺序更新。
+
+        跟踪器状态每个检测器只有一份，调用方必须在生成器的整个生命周期内持有 track_lock，
+        否则并发的视频会交错更新同一个跟踪器，轨迹 ID 互相串扰。
+        推理执行器线程上不要获取该锁（持锁的一方可能正在等待推理线程，会死锁）。
+
+        依次产出：
+            {"type": "meta", ...}     视频信息，处理开始前产出
+            {"type": "frame", ...}    每帧的检测结果，被跳过的帧 skipped 为 True
+            {"type": "summary", ...}  处理完成后的统计信息
 
         Args:
             video_path: 视频文件路径
@@ -642,27 +875,52 @@ class ObjectsDetector:
             use_batch_processing: 是否使用批处理优化
             batch_size: 批处理大小
             frame_interval: 帧处理间隔
-
-        Returns:
-            处理结果
+            conf: 置信度阈值
+            result_format: 结果格式，"objects" 为逐个物体的字典，"columnar" 为每帧的列式数组
+            stage_observer: 阶段耗时回调 (阶段名称, 单帧耗时秒数)，用于按阶段记录解码、跟踪、标注和编码指标
         """
+        frame_interval = max(1, int(frame_interval))
+        track_batch_size = max(1, int(batch_size)) if use_batch_processing else 1
+
+        # 使用opencv获取视频信息并解码
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise RuntimeError(f"无法打开视频文件：{video_path}")
+
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        original_fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
 
+        print(f"处理视频：{width}x{height} @ {fps}fps, 总帧数：{total_frames}")
+        print(f"原视频编码：{original_fourcc} ({self._fourcc_to_str(original_fourcc)})")
+        print(f"output_path: {output_path}")
+        print(f"批处理：{use_batch_processing}, batch_size: {track_batch_size}, frame_interval: {frame_interval}")
+
+        # 帧计数器
+        frame_count = 0
+        processed_count = 0
+        written_frame = 0
+        pipeline_stats = {}
+        # dict字典存出现过的类别和数量
+        class_counts = {}
+        # set集合存出现的id
+        seen_class_ids = set()
+
+        writer = None
+        frame_ring = None
         try:
-            # 使用opencv获取视频信息
-            cap = cv2.VideoCapture(video_path)
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            original_fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
-
-            print(f"处理视频：{width}x{height} @ {fps}fps, 总帧数：{total_frames}")
-            print(f"原视频编码：{original_fourcc} ({self._fourcc_to_str(original_fourcc)})")
-            print(f"output_path: {output_path}")
-            print(f"批处理：{use_batch_processing}, batch_size: {batch_size}, frame_interval: {frame_interval}")
+            yield {
+                "type": "meta",
+                "total_frames": total_frames,
+                "fps": fps,
+                "resolution": {"width": width, "height": height},
+                "frame_interval": frame_interval,
+                "batch_size": track_batch_size
+            }
 
             # 创建视频写入器
-            writer = None
             if output_path:
                 print(f"使用 imageio 创建视频写入器...")
                 try:
@@ -680,108 +938,106 @@ class ObjectsDetector:
 
             # classes转为id
             class_ids = self._parse_classes(classes)
-            
-            # 处理视频文件(流处理)
-            results = self.model.track(
-                source=video_path,  # 视频文件路径
-                persist=True,       # 是否保存跟踪结果
-                conf=conf,          # 置信度
-                classes=class_ids,  # 要检测的类别
-                stream=True,         # 是否流处理
+
+            track_kwargs = {
+                'persist': True,    # 跨批次保持跟踪器状态
+                'conf': conf,       # 置信度
+                'classes': class_ids,  # 要检测的类别
+                'device': self.device,
+                'verbose': False
+            }
+
+            # 每个视频从全新的跟踪器状态开始
+            track_model = self._get_track_model()
+            self._reset_tracker()
+
+            # 解码 → 推理 → 标注/编码 三阶段流水线，解码和编码在后台线程中与推理重叠执行
+            # 跳过的帧在输出视频中沿用最近一帧的标注画面，保持时长不变
+            # 帧直接解码到预分配的环形缓冲区槽位中：一批在推理、一批在解码，其余在等待标注
+            if width > 0 and height > 0:
+                frame_ring = FrameRingBuffer(track_batch_size * 2 + 2, (height, width, 3))
+            pipeline = VideoPipeline(
+                cap,
+                frame_interval=frame_interval,
+                writer=writer,
+                width=width,
+                height=height,
+                annotate_fn=self._annotate_track_result,
+                queue_size=track_batch_size * frame_interval * 2,
+                frame_ring=frame_ring,
+                stage_observer=stage_observer
             )
-    
-            # 结果帧列表
-            frame_results = []
-
-            # 帧计数器
-            frame_count = 0
-            # dict字典存出现过的类别和数量
-            class_counts = {}
-
-            # set集合存出现的id
-            class_ids = set()
-            
-            for result in results:
-
-                objects = []
-                
-                # 根据id判断当前的物品是不是重复的
-                for box in result.boxes:
-
-                    # 获取框信息
-                    x1, y1, x2, y2 = box.xyxy[0].tolist()
-                    confidence = float(box.conf[0])
-                    class_id = int(box.cls[0])
-                    class_name = COCO_CLASSES.get(class_id, f'unknown_{class_id}')
-
-                    # 添加id
-                    if class_id not in class_ids:
-                        class_counts[class_id] = class_counts.get(class_id, 0) + 1
-                        class_ids.add(class_id)
-
-                    objects.append(
-                        {
-                            "bbox": {
-                                "x1": int(x1),
-                                "y1": int(y1),
-                                "x2": int(x2),
-                                "y2": int(y2),
-                                "width": int(x2 - x1),
-                                "height": int(y2 - y1)
-                            },
-                            "confidence": round(confidence, 3),
-                            "class_id": class_id,
-                            "class_name": class_name
-                        }
-                    )
-            
-                # 获取图像
-                written_frame = 0
-                if writer:
-                    frame_result = result.plot(
-                        conf=True,      # 显示置信度
-                        labels=True,    # 显示标签
-                        boxes=True,     # 显示框
-                        probs=True,     # 显示概率
-                        line_width=2,   # 线宽
-                        font_size=12,   # 字体大小
-                    )
-                    try:
-                        if frame_result is not None:
-                            if frame_result.shape[1] != width or frame_result.shape[0] != height:
-                                frame_result = cv2.resize(frame_result, (width, height))
-
-                            rgb_frame = cv2.cvtColor(frame_result, cv2.COLOR_BGR2RGB)
-                            writer.append_data(rgb_frame)
-                            written_frame += 1
-
-                            if written_frame % 30 == 0:
-                                print(f"已写入 {written_frame} 帧, 当前帧尺寸: {rgb_frame.shape}")
-                        
-                    except Exception as e:
-                        print(f"写入帧 {frame_count} 失败：{e}")
-                        import traceback
-                        traceback.print_exc()
-                frame_results.append({
-                    "frame": frame_count,
-                    "timestamp": round(frame_count / fps, 2),
-                    "object_count": len(objects),
-                    "objects": objects
-                })
-                
-                # 帧计数器更新
-                frame_count += 1
+            pipeline.start()
+
+            try:
+                for pending in pipeline.iter_batches(track_batch_size):
+                    batch_frames = [frame for _, frame in pending if frame is not None]
+
+                    inference_started = time.time()
+                    results = track_model.track(batch_frames, **track_kwargs) if batch_frames else []
+                    result_iter = iter(results)
+
+                    frame_items = []
+                    for frame_index, frame in pending:
+                        frame_count = frame_index + 1
+
+                        if frame is None:
+                            frame_items.append((frame_index, None, {
+                                "type": "frame",
+                                "frame": frame_index,
+                                "timestamp": round(frame_index / fps, 2),
+                                "skipped": True,
+                                "object_count": 0,
+                                **self._format_detections(self._empty_boxes(), result_format)
+                            }))
+                            continue
+
+                        result = next(result_iter)
+
+                        # 一次性转换检测框（含跟踪 ID）
+                        boxes = self._extract_boxes(result)
+                        detections = self._format_detections(boxes, result_format)
+
+                        # 根据id判断当前的物品是不是重复的
+                        for class_id in np.unique(boxes["cls"]).tolist():
+                            # 添加id
+                            if class_id not in seen_class_ids:
+                                class_counts[class_id] = class_counts.get(class_id, 0) + 1
+                                seen_class_ids.add(class_id)
+
+                        processed_count += 1
+                        frame_items.append((frame_index, result, {
+                            "type": "frame",
+                            "frame": frame_index,
+                            "timestamp": round(frame_index / fps, 2),
+                            "skipped": False,
+                            "object_count": len(boxes["xyxy"]),
+                            **detections
+                        }))
+                    pipeline.record_inference(time.time() - inference_started, len(batch_frames))
+
+                    for frame_index, result, frame_item in frame_items:
+                        # 交给标注/编码线程
+                        pipeline.submit_annotation(frame_index, result)
+                        yield frame_item
+            finally:
+                pipeline.close()
+                written_frame = pipeline.frames_written
+                pipeline_stats = pipeline.get_stats()
+                print(f"流水线统计：{pipeline_stats}")
 
         finally:
             cap.release()
-            if writer: 
+            if frame_ring is not None:
+                frame_ring.close()
+            if writer:
                 writer.close()
                 print("视频写入器已关闭")
-            
+
         if output_path:
             if os.path.exists(output_path):
                 file_size = os.path.getsize(output_path) / (1024 * 1024)
-                print(f"视频处理完成：共处理 {frame_count} 帧，成功写入 {written_frame} 帧")
+                print(f"视频处理完成：共读取 {frame_count} 帧，跟踪 {processed_count} 帧，成功写入 {written_frame} 帧")
                 print(f"输出文件：{output_path}")
                 print(f"文件大小：{file_size:.2f} MB")
 
@@ -795,18 +1051,106 @@ class ObjectsDetector:
             else:
                 print(f"错误：输出文件不存在!")
         else:
-            print(f"视频分析完成：共处理 {frame_count} 帧")
+            print(f"视频分析完成：共读取 {frame_count} 帧，跟踪 {processed_count} 帧")
 
-        return {
+        yield {
+            "type": "summary",
             "total_frames": total_frames,
-            "processed_frames": frame_count,
+            "read_frames": frame_count,
+            "processed_frames": processed_count,
+            "skipped_frames": frame_count - processed_count,
             "fps": fps,
             "duration": round(frame_count / fps, 2) if fps > 0 else 0,
             "resolution": {"width": width, "height": height},
+            "batch_processing_used": use_batch_processing and track_batch_size > 1,
+            "class_counts": class_counts,
+            "pipeline": pipeline_stats
+        }
+
+    def process_video_file_track(
+            self,
+            video_path: str,
+            output_path: str = None,
+            classes: Optional[Union[List[int], List[str]]] = None,
+            use_batch_processing: bool = True,
+            batch_size: int = 8,
+            frame_interval: int = 1,
+            conf: Optional[float] = 0.5,
+            result_format: str = "objects",
+        ) -> Dict:
+        """
+        处理视频文件（跟踪模式）
+
+        在调用线程中直接处理，整个过程持有 track_lock；不要在推理执行器线程上调用
+
+        Args:
+            video_path: 视频文件路径
+            output_path: 输出文件路径
+            classes: 要检测的类别
+            use_batch_processing: 是否使用批处理优化
+            batch_size: 批处理大小
+            frame_interval: 帧处理间隔
+            conf: 置信度阈值
+            result_format: 结果格式，"objects" 为逐个物体的字典，"columnar" 为每帧的列式数组
+
+        Returns:
+            处理结果
+        """
+        with self.track_lock:
+            return self.collect_video_track(self.iter_video_track(
+                video_path,
+                output_path,
+                classes=classes,
+                use_batch_processing=use_batch_processing,
+                batch_size=batch_size,
+                frame_interval=frame_interval,
+                conf=conf,
+                result_format=result_format
+            ))
+
+    def collect_video_track(
+            self,
+            items: Iterator[Dict],
+            progress_callback: Optional[Callable[[int, int], None]] = None
+        ) -> Dict:
+        """
+        汇总 iter_video_track 产出的逐帧结果
+
+        Args:
+            items: iter_video_track 产出的结果（可以经由推理执行器逐项推进）
+            progress_callback: 进度回调函数，参数为 (已读取帧数, 总帧数)
+
+        Returns:
+            处理结果
+        """
+        frame_results = []
+        summary = {}
+        total_frames = 0
+
+        for item in items:
+            item_type = item.pop("type")
+            if item_type == "meta":
+                total_frames = item["total_frames"]
+            elif item_type == "frame":
+                frame_results.append(item)
+                if progress_callback:
+                    progress_callback(item["frame"] + 1, total_frames)
+            elif item_type == "summary":
+                summary = item
+
+        return {
+            "total_frames": summary["total_frames"],
+            "read_frames": summary["read_frames"],
+            "processed_frames": summary["processed_frames"],
+            "skipped_frames": summary["skipped_frames"],
+            "fps": summary["fps"],
+            "duration": summary["duration"],
+            "resolution": summary["resolution"],
             "frames_with_detection": len(frame_results),
             "frames": frame_results,
-            "batch_processing_used": use_batch_processing,
-            "class_counts": class_counts
+            "batch_processing_used": summary["batch_processing_used"],
+            "class_counts": summary["class_counts"],
+            "pipeline": summary["pipeline"]
         }
 
     def _process_video_frame_batch(
@@ -847,33 +1191,12 @@ class ObjectsDetector:
 
         results = []
         for i, result in enumerate(batch_results):
-            objects = []
-            if result.boxes is not None:
-                for box in result.boxes:
-                    x1, y1, x2, y2 = box.xyxy[0].tolist()
-                    confidence = float(box.conf[0])
-                    class_id = int(box.cls[0])
-                    class_name = COCO_CLASSES.get(class_id, f'unknown_{class_id}')
-
-                    objects.append(
-                        {
-                            "bbox": {
-                                "x1": int(x1),
-                                "y1": int(y1),
-                                "x2": int(x2),
-                                "y2": int(y2),
-                                "width": int(x2 - x1),
-                                "height": int(y2 - y1)
-                            },
-                            "confidence": round(confidence, 3),
-                            "class_id": class_id,
-                            "class_name": class_name
-                        }
-                    )
+            boxes = self._extract_boxes(result)
+            objects = self._build_objects(boxes)
 
             annotated_image = None
             if return_annotated:
-                annotated_image = result.plot() if len(result.boxes) > 0 else frames[i].copy()
+                annotated_image = self._draw_boxes(frames[i], boxes, result.names)
 
             results.append({
                 "success": True,
@@ -0,0 +1,237 @@
+"""
+模拟推理后端模块
+
+YOLO_BACKEND=mock 时 ObjectsDetector 使用确定性的假模型，不加载权重、不联网、不需要 GPU：
+- predict / track 的调用方式和返回结构与 ultralytics 一致（boxes.data、speed、orig_img、plot），
+  检测器、批处理器、视频流水线和各接口的代码路径不需要任何改动
+- 相同图像内容和随机种子总是得到相同的检测框，便于复现和对比
+- 推理耗时由两部分组成：sleep 等待（释放 GIL，模拟在 GPU / 原生线程中执行的模型计算）
+  和 CPU 空转（持有 GIL，模拟 Python 侧的预处理和后处理开销），用于在没有模型时调优服务层
+
+环境变量：
+- YOLO_MOCK_LATENCY_MS：每次调用的固定延迟（毫秒），默认 0
+- YOLO_MOCK_PER_IMAGE_MS：每张图像的延迟（毫秒），默认 5
+- YOLO_MOCK_CPU_BURN_MS：每张图像持有 GIL 空转的时间（毫秒），默认 0
+- YOLO_MOCK_BOXES：每张图像生成的检测框数，默认 5
+- YOLO_MOCK_SEED：随机种子，默认 0
+"""
+
+import os
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Union
+
+import cv2
+import numpy as np
+
+NUM_CLASSES = 80
+
+# 生成的置信度范围：默认阈值 0.5 下全部保留，提高阈值会过滤掉一部分
+CONFIDENCE_RANGE = (0.5, 0.99)
+
+# 检测框尺寸相对图像边长的范围
+BOX_SCALE_RANGE = (0.05, 0.3)
+
+
+@dataclass
+class MockBackendConfig:
+    """模拟推理后端配置"""
+    latency_ms: float = 0.0  # 每次调用的固定延迟
+    per_image_ms: float = 5.0  # 每张图像的延迟
+    cpu_burn_ms: float = 0.0  # 每张图像持有 GIL 空转的时间
+    boxes: int = 5  # 每张图像生成的检测框数
+    seed: int = 0
+
+    @classmethod
+    def from_env(cls) -> "MockBackendConfig":
+        """从环境变量读取配置"""
+        return cls(
+            latency_ms=float(os.getenv("YOLO_MOCK_LATENCY_MS", 0)),
+            per_image_ms=float(os.getenv("YOLO_MOCK_PER_IMAGE_MS", 5)),
+            cpu_burn_ms=float(os.getenv("YOLO_MOCK_CPU_BURN_MS", 0)),
+            boxes=int(os.getenv("YOLO_MOCK_BOXES", 5)),
+            seed=int(os.getenv("YOLO_MOCK_SEED", 0))
+        )
+
+
+class MockBoxes:
+    """模拟 ultralytics Boxes：data 的每一行为 [x1, y1, x2, y2, (track_id), conf, cls]"""
+
+    def __init__(self, data: np.ndarray):
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @property
+    def is_track(self) -> bool:
+        return self.data.shape[1] == 7
+
+    @property
+    def xyxy(self) -> np.ndarray:
+        return self.data[:, :4]
+
+    @property
+    def conf(self) -> np.ndarray:
+        return self.data[:, -2]
+
+    @property
+    def cls(self) -> np.ndarray:
+        return self.data[:, -1]
+
+    @property
+    def id(self) -> Optional[np.ndarray]:
+        return self.data[:, 4] if self.is_track else None
+
+
+class MockResult:
+    """模拟 ultralytics Results"""
+
+    def __init__(self, orig_img: np.ndarray, boxes: MockBoxes, names: Dict[int, str], speed: Dict[str, float]):
+        self.orig_img = orig_img
+        self.orig_shape = orig_img.shape[:2]
+        self.boxes = boxes
+        self.names = names
+        self.speed = speed
+
+    def plot(self, conf: bool = True, labels: bool = True, boxes: bool = True, line_width: Optional[int] = None,
+             **kwargs) -> np.ndarray:
+        """在图像副本上绘制检测框和标签（与 ultralytics 一样返回新图像）"""
+        image = self.orig_img.copy()
+        if not boxes:
+            return image
+        thickness = line_width or max(round(sum(image.shape[:2]) / 2 * 0.003), 2)
+        for row in self.boxes.data:
+            x1, y1, x2, y2 = (int(v) for v in row[:4])
+            class_id = int(row[-1])
+            color = _class_color(class_id)
+            cv2.rectangle(image, (x1, y1), (x2, y2), color, thickness)
+            if labels:
+                text = self.names.get(class_id, str(class_id))
+                if conf:
+                    text = f"{text} {row[-2]:.2f}"
+                cv2.putText(image, text, (x1, max(y1 - 4, 12)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1, cv2.LINE_AA)
+        return image
+
+
+def _class_color(class_id: int) -> tuple:
+    """类别对应的固定颜色（BGR）"""
+    rng = np.random.default_rng(class_id)
+    return tuple(int(c) for c in rng.integers(64, 256, size=3))
+
+
+def _burn_cpu(seconds: float):
+    """持有 GIL 空转指定时间"""
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class MockYOLO:
+    """
+    模拟 ultralytics YOLO 模型
+
+    只实现检测器用到的接口：predict、track、to、names、predictor
+    """
+
+    def __init__(self, config: Optional[MockBackendConfig] = None, names: Optional[Dict[int, str]] = None):
+        """
+        初始化模拟模型
+
+        Args:
+            config: 模拟推理后端配置，默认从环境变量读取
+            names: 类别名称表，默认为 class_0 … class_79
+        """
+        self.config = config or MockBackendConfig.from_env()
+        self.names = dict(names) if names else {i: f"class_{i}" for i in range(NUM_CLASSES)}
+        self.predictor = None
+        self.ckpt_path = None
+
+    def to(self, device) -> "MockYOLO":
+        """与 YOLO.to 兼容，模拟模型始终在 CPU 上"""
+        return self
+
+    def _generate_boxes(self, image: np.ndarray) -> np.ndarray:
+        """按图像内容和随机种子确定性地生成检测框 [x1, y1, x2, y2, conf, cls]"""
+        # 只对降采样后的像素求校验和，成本与图像尺寸基本无关
+        checksum = zlib.crc32(np.ascontiguousarray(image[::16, ::16]).tobytes())
+        rng = np.random.default_rng([self.config.seed, checksum])
+        height, width = image.shape[:2]
+        count = max(0, self.config.boxes)
+
+        sizes = rng.uniform(*BOX_SCALE_RANGE, size=(count, 2)) * (width, height)
+        x1 = rng.uniform(0, 1, size=count) * (width - sizes[:, 0])
+        y1 = rng.uniform(0, 1, size=count) * (height - sizes[:, 1])
+        data = np.empty((count, 6), dtype=np.float32)
+        data[:, 0] = x1
+        data[:, 1] = y1
+        data[:, 2] = x1 + sizes[:, 0]
+        data[:, 3] = y1 + sizes[:, 1]
+        data[:, 4] = rng.uniform(*CONFIDENCE_RANGE, size=count)
+        data[:, 5] = rng.integers(0, len(self.names), size=count)
+        return data
+
+    def predict(
+        self,
+        source: Union[np.ndarray, Sequence[np.ndarray]],
+        conf: float = 0.25,
+        classes: Optional[List[int]] = None,
+        **kwargs
+    ) -> List[MockResult]:
+        """
+        模拟批量推理
+
+        Args:
+            source: 单张图像或图像列表（BGR）
+            conf: 置信度阈值
+            classes: 只保留的类别 ID
+            **kwargs: device、verbose、imgsz 等参数，接受但不使用
+
+        Returns:
+            每张图像一个 MockResult
+        """
+        return self._run(source, conf, classes, track=False)
+
+    def track(
+        self,
+        source: Union[np.ndarray, Sequence[np.ndarray]],
+        conf: float = 0.25,
+        classes: Optional[List[int]] = None,
+        **kwargs
+    ) -> List[MockResult]:
+        """模拟跟踪：与 predict 相同，检测框按顺序分配固定的跟踪 ID"""
+        return self._run(source, conf, classes, track=True)
+
+    def _run(self, source, conf: Optional[float], classes: Optional[List[int]], track: bool) -> List[MockResult]:
+        """生成检测框并模拟推理耗时"""
+        images = [source] if isinstance(source, np.ndarray) else list(source)
+        if not images:
+            return []
+
+        started = time.perf_counter()
+        sleep_ms = self.config.latency_ms + self.config.per_image_ms * len(images)
+        if sleep_ms > 0:
+            time.sleep(sleep_ms / 1000)
+        if self.config.cpu_burn_ms > 0:
+            _burn_cpu(self.config.cpu_burn_ms * len(images) / 1000)
+        inference_ms = (time.perf_counter() - started) * 1000 / len(images)
+
+        results = []
+        for image in images:
+            postprocess_started = time.perf_counter()
+            data = self._generate_boxes(image)
+            keep = data[:, 4] >= (conf or 0.0)
+            if classes is not None:
+                keep &= np.isin(data[:, 5].astype(np.int64), classes)
+            data = data[keep]
+            if track:
+                ids = np.arange(1, len(data) + 1, dtype=np.float32)[:, None]
+                data = np.hstack([data[:, :4], ids, data[:, 4:]])
+            speed = {
+                "preprocess": 0.0,
+                "inference": inference_ms,
+                "postprocess": (time.perf_counter() - postprocess_started) * 1000
+            }
+            results.append(MockResult(image, MockBoxes(data), self.names, speed))
+        return results
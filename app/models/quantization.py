@@ -0,0 +1,270 @@
+"""
+INT8 量化模块
+
+用本地样本图片对模型做训练后 INT8 量化（OpenVINO + NNCF），并生成与 FP32 模型的对比报告：
+- 通过 YOLO_BACKEND=openvino_int8 按部署选择，校准图片目录由 YOLO_CALIBRATION_DIR 指定
+- 量化产物按权重哈希和校准集指纹缓存，权重或校准图片变化后自动重新量化
+- 报告包含检测一致性（按类别和 IoU 匹配检测框）和延迟对比
+
+生成对比报告：
+    python -m app.models.quantization --weights yolov8n.pt --calibration-dir ./samples --output int8_report.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+from app.models.backends import EXPORT_CACHE_DIR, load_backend_model, weights_hash
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+# 校准图片目录，可通过环境变量覆盖
+CALIBRATION_DIR = os.getenv('YOLO_CALIBRATION_DIR')
+
+
+def list_images(image_dir: str) -> List[Path]:
+    """列出目录中的图片文件"""
+    return sorted(p for p in Path(image_dir).iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+
+
+def calibration_fingerprint(image_dir: str) -> str:
+    """根据校准图片的文件名、大小和修改时间生成指纹"""
+    digest = hashlib.blake2b(digest_size=6)
+    for path in list_images(image_dir):
+        stat = path.stat()
+        digest.update(f"{path.name}:{stat.st_size}:{int(stat.st_mtime)}".encode())
+    return digest.hexdigest()
+
+
+def export_int8_model(
+    weights_path: str,
+    calibration_dir: Optional[str] = None,
+    cache_dir: str = EXPORT_CACHE_DIR,
+    imgsz: int = 640
+) -> str:
+    """
+    用校准图片把 PyTorch 权重量化为 INT8 OpenVINO 模型，已量化过的直接返回缓存的产物
+
+    Args:
+        weights_path: .pt 权重文件路径
+        calibration_dir: 校准图片目录，为 None 时使用 YOLO_CALIBRATION_DIR
+        cache_dir: 导出产物缓存目录
+        imgsz: 推理尺寸
+
+    Returns:
+        INT8 OpenVINO 模型目录
+    """
+    calibration_dir = calibration_dir or CALIBRATION_DIR
+    if not calibration_dir or not list_images(calibration_dir):
+        raise ValueError("INT8 quantization requires a calibration image directory (YOLO_CALIBRATION_DIR)")
+
+    weights = Path(weights_path)
+    target_dir = Path(cache_dir) / f"{weights.stem}-{weights_hash(str(weights))}"
+    target = target_dir / f"{weights.stem}_int8_{calibration_fingerprint(calibration_dir)}_openvino_model"
+    if target.exists():
+        print(f"使用已缓存的 INT8 模型：{target}")
+        return str(target)
+
+    model = YOLO(str(weights))
+    calibration_path = Path(calibration_dir).absolute()
+    print(f"INT8 量化：{weights}，校准图片 {len(list_images(calibration_dir))} 张")
+    started = time.time()
+
+    # ultralytics 通过数据集配置读取校准图片，这里只需要图片，不需要标注
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_yaml = Path(temp_dir) / "calibration.yaml"
+        data_yaml.write_text(json.dumps({
+            "path": str(calibration_path),
+            "train": str(calibration_path),
+            "val": str(calibration_path),
+            "names": model.names
+        }), encoding="utf-8")
+        exported = model.export(
+            format="openvino", int8=True, data=str(data_yaml),
+            imgsz=imgsz, dynamic=True, verbose=False
+        )
+
+    target_dir.mkdir(parents=True, exist_ok=True)
+    shutil.move(str(exported), str(target))
+    print(f"INT8 量化完成，耗时 {time.time() - started:.1f}s")
+    return str(target)
+
+
+def _box_iou(box: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    """计算一个框与一组框的 IoU（xyxy 格式）"""
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-9)
+
+
+def match_detections(reference: np.ndarray, candidate: np.ndarray, iou_threshold: float = 0.5) -> List[float]:
+    """
+    按类别贪心匹配两组检测结果
+
+    Args:
+        reference: 基准检测 [N, 6]，列为 x1, y1, x2, y2, conf, cls
+        candidate: 待比较检测 [M, 6]
+        iou_threshold: 匹配的最小 IoU
+
+    Returns:
+        每个匹配对的 IoU
+    """
+    ious = []
+    used = np.zeros(len(candidate), dtype=bool)
+    for det in reference[np.argsort(-reference[:, 4])] if len(reference) else []:
+        mask = (~used) & (candidate[:, 5] == det[5]) if len(candidate) else np.zeros(0, dtype=bool)
+        if not mask.any():
+            continue
+        indices = np.flatnonzero(mask)
+        overlaps = _box_iou(det[:4], candidate[indices, :4])
+        best = int(np.argmax(overlaps))
+        if overlaps[best] >= iou_threshold:
+            used[indices[best]] = True
+            ious.append(float(overlaps[best]))
+    return ious
+
+
+def _run_model(model: YOLO, images: List[np.ndarray], imgsz: int, conf: float):
+    """逐张推理，返回每张图片的检测数组和延迟"""
+    detections = []
+    latencies = []
+    for image in images:
+        started = time.perf_counter()
+        result = model.predict(image, imgsz=imgsz, conf=conf, device="cpu", verbose=False)[0]
+        latencies.append((time.perf_counter() - started) * 1000)
+        detections.append(result.boxes.data.cpu().numpy()[:, [0, 1, 2, 3, -2, -1]])
+    return detections, latencies
+
+
+def _latency_stats(latencies: List[float]) -> Dict:
+    """延迟统计"""
+    ordered = sorted(latencies)
+    return {
+        "mean_ms": round(statistics.mean(ordered), 2),
+        "p50_ms": round(ordered[len(ordered) // 2], 2),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2)
+    }
+
+
+def build_report(
+    weights_path: str,
+    calibration_dir: str,
+    eval_dir: Optional[str] = None,
+    reference_backend: str = "pytorch",
+    imgsz: int = 640,
+    conf: float = 0.25,
+    iou_threshold: float = 0.5,
+    warmup: int = 2
+) -> Dict:
+    """
+    对比 INT8 模型与 FP32 模型的检测一致性和延迟
+
+    Args:
+        weights_path: .pt 权重文件路径
+        calibration_dir: 校准图片目录
+        eval_dir: 评估图片目录，为 None 时使用校准图片
+        reference_backend: FP32 基准后端（pytorch / onnx / openvino）
+        imgsz: 推理尺寸
+        conf: 置信度阈值
+        iou_threshold: 判定两个检测框一致的最小 IoU
+        warmup: 预热次数
+
+    Returns:
+        对比报告
+    """
+    eval_paths = list_images(eval_dir or calibration_dir)
+    images = [image for image in (cv2.imread(str(p)) for p in eval_paths) if image is not None]
+    if not images:
+        raise ValueError("No evaluation images found")
+
+    reference = load_backend_model(weights_path, reference_backend)
+    quantized = YOLO(export_int8_model(weights_path, calibration_dir, imgsz=imgsz), task="detect")
+    for model in (reference, quantized):
+        for _ in range(warmup):
+            model.predict(images[0], imgsz=imgsz, conf=conf, device="cpu", verbose=False)
+
+    reference_dets, reference_latency = _run_model(reference, images, imgsz, conf)
+    quantized_dets, quantized_latency = _run_model(quantized, images, imgsz, conf)
+
+    matched_ious = []
+    reference_total = 0
+    quantized_total = 0
+    exact_count_images = 0
+    for ref, cand in zip(reference_dets, quantized_dets):
+        matched_ious.extend(match_detections(ref, cand, iou_threshold))
+        reference_total += len(ref)
+        quantized_total += len(cand)
+        exact_count_images += int(len(ref) == len(cand))
+
+    matched = len(matched_ious)
+    reference_stats = _latency_stats(reference_latency)
+    quantized_stats = _latency_stats(quantized_latency)
+    return {
+        "weights": weights_path,
+        "reference_backend": reference_backend,
+        "images": len(images),
+        "iou_threshold": iou_threshold,
+        "agreement": {
+            "reference_detections": reference_total,
+            "int8_detections": quantized_total,
+            "matched": matched,
+            "recall_vs_reference": round(matched / reference_total, 4) if reference_total else 1.0,
+            "precision_vs_reference": round(matched / quantized_total, 4) if quantized_total else 1.0,
+            "mean_matched_iou": round(statistics.mean(matched_ious), 4) if matched_ious else None,
+            "same_count_images": exact_count_images
+        },
+        "latency": {
+            "reference": reference_stats,
+            "int8": quantized_stats,
+            "speedup": round(reference_stats["mean_ms"] / quantized_stats["mean_ms"], 2)
+        }
+    }
+
+
+def main():
+    """命令行入口：量化模型并生成与 FP32 模型的对比报告"""
+    parser = argparse.ArgumentParser(description="INT8 量化并对比 FP32 模型的检测一致性和延迟")
+    parser.add_argument("--weights", default=f"{os.getenv('YOLO_MODEL', 'yolov8n')}.pt", help="PyTorch 权重文件")
+    parser.add_argument("--calibration-dir", default=CALIBRATION_DIR, help="校准图片目录")
+    parser.add_argument("--eval-dir", default=None, help="评估图片目录，不指定时使用校准图片")
+    parser.add_argument("--reference", default="pytorch", help="FP32 基准后端：pytorch / onnx / openvino")
+    parser.add_argument("--imgsz", type=int, default=640, help="推理尺寸")
+    parser.add_argument("--conf", type=float, default=0.25, help="置信度阈值")
+    parser.add_argument("--output", default=None, help="把报告写入 JSON 文件")
+    args = parser.parse_args()
+
+    if not args.calibration_dir:
+        parser.error("需要指定 --calibration-dir 或环境变量 YOLO_CALIBRATION_DIR")
+
+    report = build_report(
+        args.weights,
+        args.calibration_dir,
+        eval_dir=args.eval_dir,
+        reference_backend=args.reference,
+        imgsz=args.imgsz,
+        conf=args.conf
+    )
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
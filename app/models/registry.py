@@ -0,0 +1,296 @@
+"""
+模型注册表模块
+
+在同一进程中按名称提供多个模型（如 yolov8n / yolov8s / yolov8m 或自定义权重）：
+- 首次使用时才加载模型，加载后立即预热；加载在专用的加载线程中进行，同一模型的并发请求共用一次加载
+- 已加载的模型按 LRU 保留，超出数量或内存预算时卸载最久未使用的模型
+- 默认模型（全局 detector）始终保留，不会被卸载
+"""
+
+import gc
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import psutil
+import torch
+
+from app.models.detector import ObjectsDetector
+
+# 合法的模型名称：字母、数字、下划线、点和连字符，不允许路径
+MODEL_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+class UnknownModelError(ValueError):
+    """请求的模型不在允许列表中"""
+
+
+@dataclass
+class ModelRegistryConfig:
+    """模型注册表配置"""
+    max_models: int = 3  # 同时保留的模型数（含默认模型）
+    memory_budget_mb: float = 2048.0  # 按需加载的（非默认）模型的估算内存预算
+    allowed_models: List[str] = field(default_factory=lambda: ["yolov8n", "yolov8s", "yolov8m"])
+    custom_models: Dict[str, str] = field(default_factory=dict)  # 名称 → 自定义权重路径
+    loader_threads: int = 2  # 模型加载线程数（下载、导出和加载不占用推理线程）
+
+
+@dataclass
+class _LoadedModel:
+    """已加载的模型"""
+    detector: ObjectsDetector
+    memory_mb: float
+    loaded_at: float
+    load_time_ms: float
+    last_used_at: float
+    requests: int = 0
+
+
+def _footprint_mb(loaded: _LoadedModel) -> float:
+    """模型的估算内存：视频跟踪另外加载了一份模型实例时按两份计算"""
+    return loaded.memory_mb * (2 if loaded.detector.has_track_model else 1)
+
+
+def estimate_model_memory_mb(detector: ObjectsDetector, rss_delta_mb: float) -> float:
+    """估算模型占用的内存：PyTorch 模型按参数和缓冲区大小计算，其他后端使用加载前后的 RSS 增量"""
+    module = getattr(detector.model, "model", None)
+    if isinstance(module, torch.nn.Module):
+        tensors = list(module.parameters()) + list(module.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors) / (1024 * 1024)
+    return max(rss_delta_mb, 0.0)
+
+
+class ModelRegistry:
+    """
+    模型注册表
+
+    lookup 只查询已加载的模型，不会阻塞；未加载的模型通过 load_async 在加载线程中加载，
+    get 会在调用线程中同步加载，不要在事件循环或推理线程中调用
+    """
+
+    def __init__(self, default_detector: ObjectsDetector, config: Optional[ModelRegistryConfig] = None):
+        """
+        初始化模型注册表
+
+        Args:
+            default_detector: 默认模型的检测器（全局 detector）
+            config: 模型注册表配置
+        """
+        self.default_detector = default_detector
+        self.config = config or ModelRegistryConfig()
+        self._models: "OrderedDict[str, _LoadedModel]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._eviction_listeners: List[Callable[[str], None]] = []
+        self._loader: Optional[ThreadPoolExecutor] = None
+        self._loading: Dict[str, Future] = {}
+        self._stats = {"loads": 0, "evictions": 0, "hits": 0}
+
+    def add_eviction_listener(self, listener: Callable[[str], None]):
+        """注册模型被卸载时的回调，参数为模型名称（用于释放按模型缓存的调度器等）"""
+        self._eviction_listeners.append(listener)
+
+    def is_default(self, name: Optional[str]) -> bool:
+        """判断是否为默认模型"""
+        return not name or name == self.default_detector.model_name
+
+    def available_models(self) -> List[str]:
+        """允许请求的模型名称"""
+        names = list(self.config.allowed_models) + list(self.config.custom_models)
+        if self.default_detector.model_name:
+            names.insert(0, self.default_detector.model_name)
+        return list(dict.fromkeys(names))
+
+    def validate(self, name: str):
+        """校验模型名称，不合法或不在允许列表中时抛出 UnknownModelError"""
+        if not MODEL_NAME_PATTERN.match(name) or name not in self.available_models():
+            raise UnknownModelError(
+                f"Unknown model: {name}, expected one of {self.available_models()}"
+            )
+
+    def lookup(self, name: Optional[str] = None) -> Optional[ObjectsDetector]:
+        """
+        获取已加载模型的检测器（更新 LRU 顺序），未加载时返回 None，不会触发加载
+
+        Args:
+            name: 模型名称，为空时返回默认模型
+
+        Returns:
+            检测器实例，模型未加载时为 None
+        """
+        if self.is_default(name):
+            return self.default_detector
+
+        with self._lock:
+            loaded = self._models.get(name)
+            if loaded is None:
+                return None
+            self._models.move_to_end(name)
+            loaded.last_used_at = time.time()
+            loaded.requests += 1
+            self._stats["hits"] += 1
+            return loaded.detector
+
+    def get(self, name: Optional[str] = None,
+            warmup: Optional[Callable[[ObjectsDetector], None]] = None) -> ObjectsDetector:
+        """
+        获取模型对应的检测器，未加载时在调用线程中加载
+
+        Args:
+            name: 模型名称，为空时返回默认模型
+            warmup: 预热函数，默认直接调用 detector.warmup()
+
+        Returns:
+            检测器实例
+        """
+        if not self.is_default(name):
+            self.validate(name)
+        detector = self.lookup(name)
+        if detector is not None:
+            return detector
+
+        # 加载时不持有注册表锁，已加载模型的查询不需要等待
+        loaded = self._load(name, warmup)
+        with self._lock:
+            existing = self._models.get(name)
+            if existing is not None:
+                # 其他线程已经加载了同一个模型，保留先加载的实例
+                return existing.detector
+            self._models[name] = loaded
+            self._evict_over_budget()
+            return loaded.detector
+
+    def load_async(self, name: str, warmup: Optional[Callable[[ObjectsDetector], None]] = None) -> Future:
+        """
+        在加载线程中加载模型，同一模型正在加载时返回同一个 Future
+
+        Args:
+            name: 模型名称
+            warmup: 预热函数（在加载线程中调用）
+
+        Returns:
+            结果为检测器实例的 Future
+        """
+        self.validate(name)
+        with self._lock:
+            future = self._loading.get(name)
+            if future is None:
+                if self._loader is None:
+                    self._loader = ThreadPoolExecutor(
+                        max_workers=max(1, self.config.loader_threads),
+                        thread_name_prefix="model-loader"
+                    )
+                future = self._loader.submit(self.get, name, warmup)
+                self._loading[name] = future
+                future.add_done_callback(lambda _: self._finish_loading(name))
+            return future
+
+    def _finish_loading(self, name: str):
+        """加载结束（成功或失败）后移除进行中的记录，失败的模型下次请求时重新加载"""
+        with self._lock:
+            self._loading.pop(name, None)
+
+    def _load(self, name: str, warmup: Optional[Callable[[ObjectsDetector], None]] = None) -> _LoadedModel:
+        """加载并预热模型，估算内存占用"""
+        process = psutil.Process()
+        rss_before = process.memory_info().rss / (1024 * 1024)
+        started = time.time()
+
+        detector = ObjectsDetector(name, weights_path=self.config.custom_models.get(name))
+        detector.load_model()
+        # 与启动时的默认模型一样先预热，第一个请求不承担初始化延迟（内存估算也包含推理时的分配）
+        if warmup is not None:
+            warmup(detector)
+        else:
+            detector.warmup()
+
+        load_time_ms = (time.time() - started) * 1000
+        rss_delta = process.memory_info().rss / (1024 * 1024) - rss_before
+        memory_mb = estimate_model_memory_mb(detector, rss_delta)
+        with self._lock:
+            self._stats["loads"] += 1
+        print(f"模型 {name} 加载完成：{load_time_ms:.0f}ms，约 {memory_mb:.1f}MB")
+
+        now = time.time()
+        return _LoadedModel(
+            detector=detector,
+            memory_mb=memory_mb,
+            loaded_at=now,
+            load_time_ms=load_time_ms,
+            last_used_at=now,
+            requests=1
+        )
+
+    def _memory_used_mb(self) -> float:
+        """已加载的非默认模型的估算内存"""
+        return sum(_footprint_mb(loaded) for loaded in self._models.values())
+
+    def _evict_over_budget(self):
+        """超出模型数量或内存预算时卸载最久未使用的模型（至少保留刚加载的模型）"""
+        max_extra_models = max(self.config.max_models - 1, 1)
+        while len(self._models) > 1 and (
+            len(self._models) > max_extra_models
+            or self._memory_used_mb() > self.config.memory_budget_mb
+        ):
+            name, loaded = self._models.popitem(last=False)
+            self._stats["evictions"] += 1
+            print(f"卸载模型 {name}（约 {_footprint_mb(loaded):.1f}MB）")
+            for listener in self._eviction_listeners:
+                listener(name)
+            del loaded
+            gc.collect()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+
+    def get_stats(self) -> Dict:
+        """获取注册表统计信息"""
+        with self._lock:
+            loaded = {
+                name: {
+                    "backend": item.detector.backend,
+                    "memory_mb": round(_footprint_mb(item), 1),
+                    "track_model_loaded": item.detector.has_track_model,
+                    "load_time_ms": round(item.load_time_ms, 1),
+                    "requests": item.requests,
+                    "idle_seconds": round(time.time() - item.last_used_at, 1)
+                }
+                for name, item in self._models.items()
+            }
+            return {
+                "default_model": self.default_detector.model_name,
+                "available_models": self.available_models(),
+                "loaded_models": loaded,
+                "max_models": self.config.max_models,
+                "memory_budget_mb": self.config.memory_budget_mb,
+                "memory_used_mb": round(self._memory_used_mb(), 1),
+                "loading": list(self._loading),
+                **self._stats
+            }
+
+    def shutdown(self):
+        """关闭模型加载线程"""
+        with self._lock:
+            loader, self._loader = self._loader, None
+        if loader:
+            loader.shutdown(wait=False, cancel_futures=True)
+
+
+# 全局模型注册表实例（延迟初始化）
+_model_registry: Optional[ModelRegistry] = None
+
+
+def get_model_registry(default_detector: ObjectsDetector, config: Optional[ModelRegistryConfig] = None) -> ModelRegistry:
+    """获取或创建全局模型注册表实例"""
+    global _model_registry
+    if _model_registry is None:
+        _model_registry = ModelRegistry(default_detector, config)
+    return _model_registry
+
+
+def shutdown_model_registry():
+    """关闭全局模型注册表的加载线程"""
+    if _model_registry:
+        _model_registry.shutdown()
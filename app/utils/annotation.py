@@ -0,0 +1,69 @@
+"""
+标注图像编码模块
+
+按客户端选择的格式、质量和最大边长把标注图像编码为 data URL：
+- 支持 JPEG / PNG / WebP
+- 先按最大边长缩小再编码，减少编码时间和响应体积
+"""
+
+import base64
+from dataclasses import dataclass
+from typing import Optional
+
+import cv2
+import numpy as np
+
+# 图像格式 → (文件扩展名, MIME 类型)
+ANNOTATION_FORMATS = {
+    "jpeg": (".jpg", "image/jpeg"),
+    "png": (".png", "image/png"),
+    "webp": (".webp", "image/webp"),
+}
+
+
+@dataclass
+class AnnotationOptions:
+    """标注图像编码选项"""
+    image_format: str = "jpeg"
+    quality: int = 85  # JPEG / WebP 质量 (1-100)，PNG 忽略
+    max_dim: Optional[int] = None  # 最大边长，为 None 时保持原尺寸
+
+
+def resize_to_max_dim(image: np.ndarray, max_dim: Optional[int]) -> np.ndarray:
+    """按比例缩小图像，使最长边不超过 max_dim"""
+    if not max_dim:
+        return image
+    height, width = image.shape[:2]
+    scale = max_dim / max(height, width)
+    if scale >= 1:
+        return image
+    size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+def encode_annotated_image(image: np.ndarray, options: Optional[AnnotationOptions] = None) -> str:
+    """
+    把标注图像编码为 data URL
+
+    Args:
+        image: BGR 图像
+        options: 编码选项
+
+    Returns:
+        data URL 字符串
+    """
+    options = options or AnnotationOptions()
+    extension, mime_type = ANNOTATION_FORMATS[options.image_format]
+
+    params = []
+    if options.image_format == "jpeg":
+        params = [cv2.IMWRITE_JPEG_QUALITY, int(options.quality)]
+    elif options.image_format == "webp":
+        params = [cv2.IMWRITE_WEBP_QUALITY, int(options.quality)]
+
+    ok, buffer = cv2.imencode(extension, resize_to_max_dim(image, options.max_dim), params)
+    if not ok:
+        raise ValueError(f"Failed to encode annotated image as {options.image_format}")
+
+    encoded = base64.b64encode(buffer).decode('utf-8')
+    return f"data:{mime_type};base64,{encoded}"
@@ -7,6 +7,9 @@
 - 分块处理策略
 - 自适应系统资源管理
 - 错误处理和恢复
+- 按宽高比分桶，每桶使用匹配的推理尺寸，减少 letterbox 填充
+- 进程池模式：各块分发到多个工作进程并行推理（见 process_pool 模块）
+- 自适应批大小：根据实测的每批延迟和吞吐量在线调整批大小
 """
 
 import cv2
@@ -14,8 +17,11 @@ import numpy as np
 import torch
 import psutil
 import gc
+import math
 import time
-from typing import List, Dict, Optional, Union, Callable, Any
+import threading
+from collections import deque
+from typing import List, Dict, Optional, Union, Callable, Any, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from pathlib import Path
@@ -31,6 +37,21 @@ class BatchConfig:
     chunk_size: int = 5
     enable_gpu_batch: bool = True
     gpu_batch_size: int = 8
+    enable_shape_bucketing: bool = True
+    imgsz: int = 640  # 推理尺寸的长边
+    bucket_step: float = 0.125  # 宽高比分桶的步长（短边 / 长边）
+    stride: int = 32  # 模型步长，推理尺寸按步长取整
+    execution_mode: str = "thread"  # thread：共享当前模型；process：分发到进程池，每个进程独占一个模型
+    process_workers: Optional[int] = None  # 工作进程数，默认为物理核心数
+    threads_per_worker: int = 1  # 每个工作进程的推理线程数
+    adaptive_batching: bool = False  # 根据实测延迟和吞吐量在线调整批大小（batch_size 为初始值）
+    target_latency_ms: Optional[float] = None  # 每批延迟目标，为 None 时追求最大吞吐量
+    min_batch_size: int = 1
+    max_adaptive_batch_size: int = 32
+
+
+# 形状桶：(推理尺寸 (高, 宽)，原始下标列表)，不分桶时推理尺寸为 None
+ShapeBucket = Tuple[Optional[Tuple[int, int]], List[int]]
 
 
 @dataclass
@@ -112,6 +133,170 @@ class MemoryManager:
             torch.cuda.synchronize()
 
 
+class AdaptiveBatchController:
+    """
+    自适应批大小控制器
+
+    按批大小分别记录每批延迟的指数滑动平均，在线调整下一批的大小：
+    - 设置了延迟目标时按 AIMD 调整：超出目标时按比例缩小，低于目标 80% 时逐步增大
+    - 未设置延迟目标时爬山搜索吞吐量（张/秒）最高的批大小，吞吐量下降时反向
+    最终批大小不超过 MemoryManager 根据可用内存给出的上限，由调用方在使用时取较小值
+    """
+
+    def __init__(
+        self,
+        initial_batch_size: int,
+        min_batch_size: int = 1,
+        max_batch_size: int = 32,
+        target_latency_ms: Optional[float] = None,
+        smoothing: float = 0.3,
+        probe_batches: int = 3
+    ):
+        """
+        初始化控制器
+
+        Args:
+            initial_batch_size: 初始批大小
+            min_batch_size: 最小批大小
+            max_batch_size: 最大批大小
+            target_latency_ms: 每批延迟目标，为 None 时追求最大吞吐量
+            smoothing: 延迟滑动平均的权重
+            probe_batches: 每个批大小至少观测的批数，之后才做下一次调整
+        """
+        self.min_batch_size = max(1, int(min_batch_size))
+        self.max_batch_size = max(self.min_batch_size, int(max_batch_size))
+        self.target_latency_ms = target_latency_ms
+        self.smoothing = smoothing
+        self.probe_batches = max(1, int(probe_batches))
+
+        self._batch_size = min(max(int(initial_batch_size), self.min_batch_size), self.max_batch_size)
+        self._latency_ms: Dict[int, float] = {}  # 批大小 → 每批延迟滑动平均
+        self._observations = 0  # 当前批大小下的观测次数
+        self._direction = 1  # 吞吐量爬山的搜索方向
+        self._decisions = deque(maxlen=20)
+        self._lock = threading.Lock()
+        self._stats = {"batches": 0, "images": 0, "adjustments": 0, "memory_limited": 0}
+
+    @property
+    def batch_size(self) -> int:
+        """当前建议的批大小"""
+        return self._batch_size
+
+    def next_batch_size(self, memory_limit: int) -> int:
+        """
+        下一批的大小
+
+        Args:
+            memory_limit: 内存允许的最大批大小
+
+        Returns:
+            不超过内存上限的批大小
+        """
+        with self._lock:
+            if memory_limit < self._batch_size:
+                self._stats["memory_limited"] += 1
+            return max(1, min(self._batch_size, memory_limit))
+
+    def _throughput(self, batch_size: int) -> float:
+        """批大小对应的吞吐量（张/秒）"""
+        latency = self._latency_ms.get(batch_size)
+        return batch_size * 1000 / latency if latency else 0.0
+
+    def record(self, batch_size: int, seconds: float):
+        """
+        记录一批的实测延迟并调整批大小
+
+        Args:
+            batch_size: 该批的实际图像数
+            seconds: 该批的推理耗时
+        """
+        if batch_size <= 0:
+            return
+        latency_ms = seconds * 1000
+        with self._lock:
+            previous = self._latency_ms.get(batch_size)
+            self._latency_ms[batch_size] = (
+                latency_ms if previous is None
+                else previous + self.smoothing * (latency_ms - previous)
+            )
+            self._stats["batches"] += 1
+            self._stats["images"] += batch_size
+
+            # 只根据当前批大小的完整批次做决策（桶尾的不完整批次只更新统计）
+            if batch_size != self._batch_size:
+                return
+            self._observations += 1
+            if self._observations < self.probe_batches:
+                return
+
+            if self.target_latency_ms is not None:
+                self._adjust_for_latency()
+            else:
+                self._adjust_for_throughput()
+
+    def _adjust_for_latency(self):
+        """延迟目标模式：超出目标时按比例缩小，明显低于目标时加一"""
+        current = self._batch_size
+        latency = self._latency_ms[current]
+        if latency > self.target_latency_ms:
+            target = max(self.min_batch_size, min(current - 1, int(current * self.target_latency_ms / latency)))
+            self._set_batch_size(target, f"latency {latency:.1f}ms > target {self.target_latency_ms}ms")
+        elif latency < self.target_latency_ms * 0.8 and current < self.max_batch_size:
+            self._set_batch_size(current + 1, f"latency {latency:.1f}ms < 80% of target")
+
+    def _adjust_for_throughput(self):
+        """吞吐量模式：沿当前方向试探相邻批大小，吞吐量不如已知更优的邻居时反向"""
+        current = self._batch_size
+        throughput = self._throughput(current)
+        behind = current - self._direction
+        if behind in self._latency_ms and self._throughput(behind) > throughput:
+            self._direction = -self._direction
+            self._set_batch_size(behind, f"throughput {throughput:.1f}/s below {behind} ({self._throughput(behind):.1f}/s)")
+            return
+
+        target = current + self._direction
+        if not self.min_batch_size <= target <= self.max_batch_size:
+            self._direction = -self._direction
+            target = current + self._direction
+        if self.min_batch_size <= target <= self.max_batch_size:
+            self._set_batch_size(target, f"probing, throughput {throughput:.1f}/s")
+
+    def _set_batch_size(self, batch_size: int, reason: str):
+        """切换批大小并记录决策"""
+        previous = self._batch_size
+        self._observations = 0
+        if batch_size == previous:
+            return
+        self._batch_size = batch_size
+        self._stats["adjustments"] += 1
+        self._decisions.append({
+            "time": round(time.time(), 3),
+            "from": previous,
+            "to": batch_size,
+            "reason": reason,
+            "latency_ms": round(self._latency_ms[previous], 2)
+        })
+
+    def get_stats(self) -> Dict:
+        """获取控制器状态和最近的决策"""
+        with self._lock:
+            return {
+                "batch_size": self._batch_size,
+                "mode": "latency" if self.target_latency_ms is not None else "throughput",
+                "target_latency_ms": self.target_latency_ms,
+                "min_batch_size": self.min_batch_size,
+                "max_batch_size": self.max_batch_size,
+                **self._stats,
+                "latency_ms_by_batch_size": {
+                    size: round(latency, 2) for size, latency in sorted(self._latency_ms.items())
+                },
+                "images_per_second_by_batch_size": {
+                    size: round(self._throughput(size), 2) for size in sorted(self._latency_ms)
+                },
+                "recent_decisions": list(self._decisions)
+            }
+
+
 class BatchProcessor:
     """
     批处理器
@@ -130,6 +315,14 @@ class BatchProcessor:
         self.detector = detector
         self.config = config or BatchConfig()
         self.memory_manager = MemoryManager(self.config.memory_threshold)
+        self.batch_controller: Optional[AdaptiveBatchController] = None
+        if self.config.adaptive_batching:
+            self.batch_controller = AdaptiveBatchController(
+                self.config.batch_size,
+                min_batch_size=self.config.min_batch_size,
+                max_batch_size=self.config.max_adaptive_batch_size,
+                target_latency_ms=self.config.target_latency_ms
+            )
         self._executor = None
 
     def _get_executor(self) -> ThreadPoolExecutor:
@@ -144,12 +337,142 @@ class BatchProcessor:
             self._executor.shutdown(wait=True)
             self._executor = None
 
+    @property
+    def uses_process_pool(self) -> bool:
+        """是否把推理分发到进程池（此时不访问当前进程中的模型，无需在推理线程中调用）"""
+        return self.config.execution_mode == "process"
+
+    def _get_process_pool(self):
+        """获取当前模型对应的进程池"""
+        from app.utils.process_pool import ProcessPoolConfig, get_process_pool
+        return get_process_pool(
+            self.detector.model_name,
+            self.detector.weights_path,
+            ProcessPoolConfig(
+                num_workers=self.config.process_workers,
+                threads_per_worker=self.config.threads_per_worker
+            )
+        )
+
+    @staticmethod
+    def _error_result(image: np.ndarray, error: Exception) -> Dict:
+        """处理失败时的空结果"""
+        return {
+            "success": False,
+            "error": str(error),
+            "object_count": 0,
+            "objects": [],
+            "image_shape": {
+                "height": image.shape[0],
+                "width": image.shape[1]
+            }
+        }
+
+    def shape_buckets(self, images: List[np.ndarray]) -> List[ShapeBucket]:
+        """
+        按宽高比把图像分桶
+
+        同一批次中尺寸不同的图像会被 letterbox 到统一的正方形输入，竖拍照片和横向宽画面混在一起时
+        大量计算浪费在填充上。按方向和短边/长边比例（向上取整到 bucket_step）分桶后，
+        每个桶使用刚好能容纳桶内图像的矩形推理尺寸
+
+        Args:
+            images: 图像列表
+
+        Returns:
+            [(推理尺寸 (高, 宽), 原始下标列表), ...]，按桶内第一张图像的到达顺序排列
+        """
+        if not self.config.enable_shape_bucketing:
+            return [(None, list(range(len(images))))]
+
+        base = self.config.imgsz
+        step = self.config.bucket_step
+        stride = self.config.stride
+
+        buckets: Dict[Tuple[int, int], List[int]] = {}
+        for i, image in enumerate(images):
+            height, width = image.shape[:2]
+            ratio = min(height, width) / max(height, width)
+            bucket_ratio = min(1.0, math.ceil(ratio / step) * step)
+            short_side = int(math.ceil(base * bucket_ratio / stride) * stride)
+            imgsz = (short_side, base) if width >= height else (base, short_side)
+            buckets.setdefault(imgsz, []).append(i)
+
+        return list(buckets.items())
+
+    def predict_bucketed(
+        self,
+        images: List[np.ndarray],
+        classes: Optional[Union[List[int], List[str]]] = None,
+        conf_threshold: float = 0.5,
+        return_annotated: bool = False,
+        **predict_options
+    ) -> List[Dict]:
+        """
+        分桶后逐桶批量推理，并按输入顺序返回结果
+
+        Args:
+            images: 图像列表
+            classes: 要检测的类别
+            conf_threshold: 置信度阈值
+            return_annotated: 是否返回标注图像
+            **predict_options: 传给 batch_predict_optimized 的其他参数（如 result_format）
+
+        Returns:
+            与输入顺序一致的检测结果列表
+        """
+        results: List[Optional[Dict]] = [None] * len(images)
+        buckets = self.shape_buckets(images)
+        chunks = buckets
+        if self.batch_controller is not None:
+            # 自适应模式：桶内按控制器的批大小继续分块，并记录每块的延迟
+            memory_limit = self.memory_manager.calculate_safe_batch_size(
+                [image.shape for image in images],
+                self.config.max_adaptive_batch_size
+            )
+            chunks = self._iter_adaptive_chunks(buckets, memory_limit)
+
+        for imgsz, indices in chunks:
+            started = time.time()
+            bucket_results = self.detector.batch_predict_optimized(
+                [images[i] for i in indices],
+                return_annotated=return_annotated,
+                classes=classes,
+                conf_threshold=conf_threshold,
+                imgsz=imgsz,
+                **predict_options
+            )
+            if self.batch_controller is not None:
+                self.batch_controller.record(len(indices), time.time() - started)
+            for i, result in zip(indices, bucket_results):
+                results[i] = result
+        return results
+
+    def _iter_adaptive_chunks(self, buckets: List[ShapeBucket], memory_limit: int):
+        """
+        按控制器当前的批大小逐块切分各个桶
+
+        Args:
+            buckets: 形状桶
+            memory_limit: 内存允许的最大批大小
+
+        Yields:
+            (推理尺寸, 原始下标列表)
+        """
+        for imgsz, indices in buckets:
+            start = 0
+            while start < len(indices):
+                size = self.batch_controller.next_batch_size(memory_limit)
+                yield imgsz, indices[start:start + size]
+                start += size
+
     def _process_chunk(
         self,
         images: List[np.ndarray],
         classes: Optional[List[int]] = None,
         conf_threshold: float = 0.5,
-        return_annotated: bool = False
+        return_annotated: bool = False,
+        imgsz: Optional[Tuple[int, int]] = None
     ) -> List[Dict]:
         """
         处理图像块
@@ -159,6 +482,7 @@ class BatchProcessor:
             classes: 要检测的类别
             conf_threshold: 置信度阈值
             return_annotated: 是否返回标注图像
+            imgsz: 推理尺寸 (高, 宽)，为 None 时使用模型默认尺寸
 
         Returns:
             检测结果列表
@@ -169,7 +493,8 @@ class BatchProcessor:
                 images,
                 return_annotated=return_annotated,
                 classes=classes,
-                conf_threshold=conf_threshold
+                conf_threshold=conf_threshold,
+                imgsz=imgsz
             )
         else:
             # 逐张处理
@@ -221,64 +546,105 @@ class BatchProcessor:
             self.config.batch_size
         )
 
-        print(f"批处理：共 {total_images} 张图像，批处理大小：{safe_batch_size}")
-
-        all_results = []
+        # 按宽高比分桶，每个桶内再按批处理大小分块，结果按原始下标放回
+        buckets = self.shape_buckets(images)
+        controller = self.batch_controller if not self.uses_process_pool else None
+        if controller is not None:
+            # 自适应模式：每块的大小在上一块的延迟记录之后才决定
+            memory_limit = self.memory_manager.calculate_safe_batch_size(
+                image_shapes,
+                self.config.max_adaptive_batch_size
+            )
+            chunks = self._iter_adaptive_chunks(buckets, memory_limit)
+            print(f"批处理：共 {total_images} 张图像，自适应批大小：{controller.batch_size}（内存上限 {memory_limit}），形状桶：{len(buckets)}")
+        else:
+            chunks = [
+                (imgsz, indices[i:i + safe_batch_size])
+                for imgsz, indices in buckets
+                for i in range(0, len(indices), safe_batch_size)
+            ]
+            print(f"批处理：共 {total_images} 张图像，批处理大小：{safe_batch_size}，形状桶：{len(buckets)}")
+
+        all_results: List[Optional[Dict]] = [None] * total_images
         processed_count = 0
         failed_count = 0
 
-        # 分块处理
-        for i in range(0, total_images, safe_batch_size):
-            chunk = images[i:i + safe_batch_size]
-
-            try:
-                # 检查内存状态
-                if not self.memory_manager.is_memory_available():
-                    print("内存使用过高，等待清理...")
-                    self.memory_manager.cleanup_memory()
-                    time.sleep(0.5)
-
-                # 处理当前块
-                chunk_results = self._process_chunk(
-                    chunk,
+        # 进程池模式：所有块一次性分发到工作进程，下面按顺序等待结果
+        pool_futures = None
+        if self.uses_process_pool:
+            pool = self._get_process_pool()
+            pool_futures = [
+                pool.submit(
+                    [images[i] for i in chunk_indices],
                     classes=class_ids,
                     conf_threshold=conf_threshold,
-                    return_annotated=return_annotated
+                    return_annotated=return_annotated,
+                    imgsz=imgsz
                 )
+                for imgsz, chunk_indices in chunks
+            ]
+
+        # 标注原地绘制在输入图像上。整批推理在全部检测完成后才绘制，失败时输入仍是原图；
+        # 逐张推理每张检测完就绘制，块中途失败时前面的图像已被修改，需要保留原图副本供逐张重试
+        keep_originals = return_annotated and pool_futures is None and not self.config.enable_gpu_batch
 
-                all_results.extend(chunk_results)
+        # 分块处理
+        for chunk_index, (imgsz, chunk_indices) in enumerate(chunks):
+            chunk = [images[i] for i in chunk_indices]
+            originals = [image.copy() for image in chunk] if keep_originals else chunk
+
+            try:
+                if pool_futures is not None:
+                    chunk_results = pool_futures[chunk_index].result()
+                else:
+                    # 检查内存状态
+                    if not self.memory_manager.is_memory_available():
+                        print("内存使用过高，等待清理...")
+                        self.memory_manager.cleanup_memory()
+                        time.sleep(0.5)
+
+                    # 处理当前块
+                    chunk_started = time.time()
+                    chunk_results = self._process_chunk(
+                        chunk,
+                        classes=class_ids,
+                        conf_threshold=conf_threshold,
+                        return_annotated=return_annotated,
+                        imgsz=imgsz
+                    )
+                    if controller is not None:
+                        controller.record(len(chunk), time.time() - chunk_started)
+
+                for index, result in zip(chunk_indices, chunk_results):
+                    all_results[index] = result
                 processed_count += len(chunk)
 
             except Exception as e:
-                print(f"处理块 {i // safe_batch_size} 失败：{e}")
+                print(f"处理块 {chunk_index} 失败：{e}")
                 traceback.print_exc()
                 failed_count += len(chunk)
 
-                # 为失败的块逐张处理
-                for image in chunk:
-                    try:
-                        result = self.detector.detect_objects(
-                            image,
-                            return_annotated=return_annotated,
-                            classes=classes,
-                            conf_threshold=conf_threshold
-                        )
-                        all_results.append(result)
-                        processed_count += 1
-                        failed_count -= 1
-                    except Exception as inner_e:
-                        print(f"逐张处理也失败：{inner_e}")
-                        # 返回空结果
-                        all_results.append({
-                            "success": False,
-                            "error": str(inner_e),
-                            "object_count": 0,
-                            "objects": [],
-                            "image_shape": {
-                                "height": image.shape[0],
-                                "width": image.shape[1]
-                            }
-                        })
+                if pool_futures is not None:
+                    # 进程池模式下当前进程不访问模型，失败的块直接返回空结果
+                    for index, image in zip(chunk_indices, chunk):
+                        all_results[index] = self._error_result(image, e)
+                else:
+                    # 为失败的块逐张处理（使用未绘制标注的原图）
+                    for index, image in zip(chunk_indices, originals):
+                        try:
+                            result = self.detector.detect_objects(
+                                image,
+                                return_annotated=return_annotated,
+                                classes=classes,
+                                conf_threshold=conf_threshold
+                            )
+                            all_results[index] = result
+                            processed_count += 1
+                            failed_count -= 1
+                        except Exception as inner_e:
+                            print(f"逐张处理也失败：{inner_e}")
+                            # 返回空结果
+                            all_results[index] = self._error_result(image, inner_e)
 
             # 更新进度
             if progress_callback:
@@ -367,7 +733,12 @@ class BatchProcessor:
         return_annotated: bool = False,
         chunk_size: int = 5
     ) -> List[Dict]:
-        """并行处理多个图像块"""
+        """
+        并行处理多个图像块
+
+        进程池模式下每块交给一个工作进程，图像经共享内存传递；
+        否则在线程池中执行（共享同一模型，主要用于重叠预处理和后处理）
+        """
 
         # 将图像分块
         chunks = [
@@ -375,6 +746,27 @@ class BatchProcessor:
             for i in range(0, len(images), chunk_size)
         ]
 
+        if self.uses_process_pool:
+            pool = self._get_process_pool()
+            class_ids = self.detector._parse_classes(classes)
+            pool_futures = [
+                pool.submit(
+                    chunk,
+                    classes=class_ids,
+                    conf_threshold=conf_threshold,
+                    return_annotated=return_annotated
+                )
+                for chunk in chunks
+            ]
+            all_results = []
+            for idx, (chunk, future) in enumerate(zip(chunks, pool_futures)):
+                try:
+                    all_results.extend(future.result())
+                except Exception as e:
+                    print(f"处理块 {idx} 失败：{e}")
+                    all_results.extend(self._error_result(image, e) for image in chunk)
+            return all_results
+
         executor = self._get_executor()
         futures = {
             executor.submit(
@@ -465,8 +857,12 @@ class BatchProcessor:
             "config": {
                 "batch_size": self.config.batch_size,
                 "max_workers": self.config.max_workers,
-                "memory_threshold": self.config.memory_threshold
-            }
+                "memory_threshold": self.config.memory_threshold,
+                "execution_mode": self.config.execution_mode,
+                "adaptive_batching": self.config.adaptive_batching
+            },
+            **({"adaptive_batch": self.batch_controller.get_stats()} if self.batch_controller else {}),
+            **({"process_pool": self._get_process_pool().get_stats()} if self.uses_process_pool else {})
         }
 
 
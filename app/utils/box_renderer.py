@@ -0,0 +1,192 @@
+"""
+检测框绘制模块
+
+替代 ultralytics 的 result.plot()，只绘制检测框和标签：
+- 直接在传入的图像上原地绘制，不再为每张图像拷贝一份完整画面；没有检测框时原样返回
+- 标签文字预先渲染为小图块（类别名、置信度、跟踪 ID 分别缓存），绘制时只做切片拷贝，
+  不再逐帧走字体渲染
+- 线宽、字号、调色板和显示内容可通过 RenderStyle 配置
+"""
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# 与 ultralytics 一致的默认调色板（RGB 十六进制），按类别 ID 取模选色
+DEFAULT_PALETTE = (
+    "FF3838", "FF9D97", "FF701F", "FFB21D", "CFD231", "48F90A", "92CC17", "3DDB86", "1A9334", "00D4BB",
+    "2C99A8", "00C2FF", "344593", "6473FF", "0018EC", "8438FF", "520085", "CB38FF", "FF95C8", "FF37C7"
+)
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+Color = Tuple[int, int, int]
+
+
+@dataclass
+class RenderStyle:
+    """检测框绘制样式"""
+    line_width: Optional[int] = None  # 检测框线宽，为 None 时按图像尺寸自动计算
+    font_scale: float = 0.5
+    font_thickness: int = 1
+    padding: int = 3  # 标签文字四周的留白
+    show_labels: bool = True
+    show_conf: bool = True
+    show_track_ids: bool = True
+    palette: Tuple[str, ...] = field(default_factory=lambda: DEFAULT_PALETTE)
+    text_color: Optional[Color] = None  # 标签文字颜色（BGR），为 None 时按底色亮度选择黑或白
+
+
+def _hex_to_bgr(value: str) -> Color:
+    """RGB 十六进制颜色转换为 BGR 元组"""
+    value = value.lstrip("#")
+    return int(value[4:6], 16), int(value[2:4], 16), int(value[0:2], 16)
+
+
+@lru_cache(maxsize=4096)
+def _label_sprite(text: str, background: Color, foreground: Color, font_scale: float,
+                  thickness: int, padding: int) -> np.ndarray:
+    """
+    预渲染标签文字图块（带底色），按参数缓存
+
+    同一样式下所有图块高度相同，可以横向拼接
+    """
+    (width, _), _ = cv2.getTextSize(text, FONT, font_scale, thickness)
+    (_, text_height), baseline = cv2.getTextSize("Ag", FONT, font_scale, thickness)
+    sprite = np.empty((text_height + baseline + 2 * padding, width + 2 * padding, 3), dtype=np.uint8)
+    sprite[...] = background
+    cv2.putText(sprite, text, (padding, padding + text_height), FONT, font_scale, foreground, thickness, cv2.LINE_AA)
+    sprite.flags.writeable = False
+    return sprite
+
+
+class BoxRenderer:
+    """
+    检测框绘制器
+
+    无状态（图块缓存为进程级），可以在多个线程中同时使用
+    """
+
+    def __init__(self, style: Optional[RenderStyle] = None):
+        """
+        初始化检测框绘制器
+
+        Args:
+            style: 绘制样式
+        """
+        self.style = style or RenderStyle()
+        self._colors = [_hex_to_bgr(value) for value in self.style.palette] or [(0, 255, 0)]
+
+    def color(self, class_id: int) -> Color:
+        """类别对应的颜色（BGR）"""
+        return self._colors[class_id % len(self._colors)]
+
+    def _text_color(self, background: Color) -> Color:
+        """标签文字颜色"""
+        if self.style.text_color is not None:
+            return tuple(self.style.text_color)
+        b, g, r = background
+        return (0, 0, 0) if 0.299 * r + 0.587 * g + 0.114 * b > 150 else (255, 255, 255)
+
+    def _sprites(self, parts: List[str], color: Color) -> List[np.ndarray]:
+        """标签各部分的预渲染图块"""
+        style = self.style
+        foreground = self._text_color(color)
+        return [
+            _label_sprite(part, color, foreground, style.font_scale, style.font_thickness, style.padding)
+            for part in parts
+        ]
+
+    @staticmethod
+    def _blit(image: np.ndarray, sprites: List[np.ndarray], x: int, y: int):
+        """把图块从 (x, y) 开始横向拷贝到图像上，超出图像的部分裁掉"""
+        height, width = image.shape[:2]
+        for sprite in sprites:
+            w = min(sprite.shape[1], width - x)
+            h = min(sprite.shape[0], height - y)
+            if w <= 0 or h <= 0:
+                return
+            image[y:y + h, x:x + w] = sprite[:h, :w]
+            x += w
+
+    def draw(
+        self,
+        image: np.ndarray,
+        xyxy: np.ndarray,
+        conf: np.ndarray,
+        cls: np.ndarray,
+        track_ids: Optional[np.ndarray] = None,
+        names: Optional[Dict[int, str]] = None
+    ) -> np.ndarray:
+        """
+        在图像上原地绘制检测框和标签
+
+        Args:
+            image: BGR 图像，会被直接修改（只读数组会先拷贝）
+            xyxy: 检测框坐标 (N, 4)
+            conf: 置信度 (N,)
+            cls: 类别 ID (N,)
+            track_ids: 跟踪 ID (N,)，非跟踪模式为 None
+            names: 类别名称表，为 None 时显示类别 ID
+
+        Returns:
+            绘制后的图像（通常就是传入的 image）
+        """
+        if len(xyxy) == 0:
+            return image
+        if not image.flags.writeable:
+            image = image.copy()
+
+        style = self.style
+        height, width = image.shape[:2]
+        thickness = style.line_width or max(round((height + width) / 2 * 0.003), 2)
+
+        coords = np.asarray(xyxy).round().astype(np.int64)
+        np.clip(coords[:, 0::2], 0, width - 1, out=coords[:, 0::2])
+        np.clip(coords[:, 1::2], 0, height - 1, out=coords[:, 1::2])
+        class_ids = np.asarray(cls).astype(np.int64).tolist()
+        confidences = np.asarray(conf).tolist()
+        ids = np.asarray(track_ids).astype(np.int64).tolist() if track_ids is not None and style.show_track_ids else None
+
+        for i, (x1, y1, x2, y2) in enumerate(coords.tolist()):
+            class_id = class_ids[i]
+            color = self.color(class_id)
+            cv2.rectangle(image, (x1, y1), (x2, y2), color, thickness)
+            if not style.show_labels:
+                continue
+
+            parts = []
+            if ids is not None:
+                parts.append(f"id:{ids[i]} ")
+            parts.append(names.get(class_id, str(class_id)) if names else str(class_id))
+            if style.show_conf:
+                parts[-1] += " "
+                parts.append(f"{confidences[i]:.2f}")
+            sprites = self._sprites(parts, color)
+
+            # 标签放在框的上方，上方空间不够时放在框内
+            label_height = sprites[0].shape[0]
+            top = y1 - label_height if y1 >= label_height else y1
+            self._blit(image, sprites, x1, top)
+
+        return image
+
+    def get_stats(self) -> Dict:
+        """获取标签图块缓存统计"""
+        info = _label_sprite.cache_info()
+        return {"sprites_cached": info.currsize, "sprite_hits": info.hits, "sprite_misses": info.misses}
+
+
+# 全局检测框绘制器实例（延迟初始化）
+_box_renderer: Optional[BoxRenderer] = None
+
+
+def get_box_renderer(style: Optional[RenderStyle] = None) -> BoxRenderer:
+    """获取或创建全局检测框绘制器实例"""
+    global _box_renderer
+    if _box_renderer is None:
+        _box_renderer = BoxRenderer(style)
+    return _box_renderer
@@ -0,0 +1,98 @@
+"""
+WebSocket 检测结果协议模块
+
+实时检测支持三种返回模式，在建立连接时通过 mode 参数协商：
+- image:  服务端绘制标注并返回 JPEG 二进制（默认，兼容旧客户端）
+- json:   只返回检测框的紧凑 JSON，由浏览器绘制叠加层
+- binary: 只返回检测框的紧凑二进制数据，由浏览器绘制叠加层
+
+二进制格式（小端序）：
+    头部 20 字节: magic(4s)='YDET' version(B) reserved(B) count(H) seq(I) width(H) height(H) inference_ms(f)
+    每个检测框 10 字节: x1(H) y1(H) x2(H) y2(H) class_id(B) score(B, 置信度 * 255)
+"""
+
+import struct
+from typing import Dict, List
+
+MODE_IMAGE = "image"
+MODE_JSON = "json"
+MODE_BINARY = "binary"
+SUPPORTED_MODES = (MODE_IMAGE, MODE_JSON, MODE_BINARY)
+
+BINARY_MAGIC = b"YDET"
+BINARY_VERSION = 1
+HEADER_STRUCT = struct.Struct("<4sBBHIHHf")
+BOX_STRUCT = struct.Struct("<HHHHBB")
+
+
+def _clip_u16(value: int) -> int:
+    """将坐标裁剪到 uint16 范围"""
+    return max(0, min(int(value), 0xFFFF))
+
+
+def encode_detections_json(result: Dict, seq: int) -> Dict:
+    """
+    将检测结果编码为紧凑 JSON 负载
+
+    Args:
+        result: detect_objects 返回的检测结果
+        seq: 帧序号
+
+    Returns:
+        可直接 send_json 的字典，boxes 为扁平的 [x1, y1, x2, y2, ...] 列表
+    """
+    boxes: List[int] = []
+    class_ids: List[int] = []
+    scores: List[float] = []
+    for obj in result.get("objects", []):
+        bbox = obj["bbox"]
+        boxes.extend((bbox["x1"], bbox["y1"], bbox["x2"], bbox["y2"]))
+        class_ids.append(obj["class_id"])
+        scores.append(obj["confidence"])
+
+    return {
+        "type": "detections",
+        "seq": seq,
+        "width": result["image_shape"]["width"],
+        "height": result["image_shape"]["height"],
+        "inference_time_ms": result.get("inference_time_ms", 0),
+        "boxes": boxes,
+        "class_ids": class_ids,
+        "scores": scores
+    }
+
+
+def encode_detections_binary(result: Dict, seq: int) -> bytes:
+    """
+    将检测结果编码为紧凑二进制负载
+
+    Args:
+        result: detect_objects 返回的检测结果
+        seq: 帧序号
+
+    Returns:
+        二进制负载，格式见模块说明
+    """
+    objects = result.get("objects", [])
+    count = min(len(objects), 0xFFFF)
+    parts = [HEADER_STRUCT.pack(
+        BINARY_MAGIC,
+        BINARY_VERSION,
+        0,
+        count,
+        seq & 0xFFFFFFFF,
+        _clip_u16(result["image_shape"]["width"]),
+        _clip_u16(result["image_shape"]["height"]),
+        float(result.get("inference_time_ms", 0))
+    )]
+    for obj in objects[:count]:
+        bbox = obj["bbox"]
+        parts.append(BOX_STRUCT.pack(
+            _clip_u16(bbox["x1"]),
+            _clip_u16(bbox["y1"]),
+            _clip_u16(bbox["x2"]),
+            _clip_u16(bbox["y2"]),
+            obj["class_id"] & 0xFF,
+            max(0, min(int(round(obj["confidence"] * 255)), 255))
+        ))
+    return b"".join(parts)
@@ -0,0 +1,84 @@
+"""
+实时帧流水线模块
+
+为 WebSocket 实时检测提供"最新帧优先"的背压控制：
+- 接收端只保留最新一帧未解码的数据，旧帧直接丢弃
+- 推理端总是处理最新到达的帧，端到端延迟不会随积压无限增长
+- 统计接收、处理和丢弃的帧数
+"""
+
+import asyncio
+import time
+from typing import Dict, Optional, Tuple
+
+
+class LatestFrameSlot:
+    """
+    单槽帧缓冲区
+
+    新帧到达时覆盖尚未被取走的旧帧，保证推理端拿到的永远是最新一帧
+    """
+
+    def __init__(self):
+        self._data: Optional[bytes] = None
+        self._received_at: float = 0.0
+        self._seq: int = 0
+        self._event = asyncio.Event()
+        self._closed = False
+        self.received = 0
+        self.dropped = 0
+        self.processed = 0
+        self._total_wait_ms = 0.0
+        self._total_latency_ms = 0.0
+
+    def put(self, data: bytes):
+        """放入新帧，若旧帧还未被处理则将其丢弃"""
+        if self._data is not None:
+            self.dropped += 1
+        self._data = data
+        self._received_at = time.time()
+        self.received += 1
+        self._seq = self.received
+        self._event.set()
+
+    async def get(self) -> Optional[Tuple[bytes, float, int]]:
+        """
+        取出最新一帧
+
+        Returns:
+            (帧数据, 接收时间, 帧序号)，缓冲区关闭且没有剩余帧时返回 None
+        """
+        while self._data is None:
+            if self._closed:
+                return None
+            self._event.clear()
+            await self._event.wait()
+
+        data, received_at, seq = self._data, self._received_at, self._seq
+        self._data = None
+        self._total_wait_ms += (time.time() - received_at) * 1000
+        return data, received_at, seq
+
+    def mark_processed(self, received_at: float):
+        """记录一帧处理完成及其端到端延迟"""
+        self.processed += 1
+        self._total_latency_ms += (time.time() - received_at) * 1000
+
+    def close(self):
+        """关闭缓冲区，唤醒等待中的推理端"""
+        self._closed = True
+        self._event.set()
+
+    def get_stats(self) -> Dict:
+        """获取帧统计信息"""
+        taken = self.received - self.dropped - (1 if self._data is not None else 0)
+        return {
+            "received": self.received,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "avg_slot_wait_ms": round(self._total_wait_ms / taken, 2) if taken > 0 else 0,
+            "avg_latency_ms": (
+                round(self._total_latency_ms / self.processed, 2)
+                if self.processed > 0 else 0
+            )
+        }
@@ -0,0 +1,105 @@
+"""
+帧环形缓冲区模块
+
+预先分配固定数量、固定尺寸的帧槽，解码直接写入槽内，推理和标注原地读取：
+- 热路径上不再为每一帧分配新的 NumPy 数组
+- 槽位全部被占用时 acquire 阻塞，天然形成背压
+- 缓冲区在进程内的普通内存中分配，不占用 /dev/shm（跨进程传图由进程池的共享内存负责）
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+class FrameRingBuffer:
+    """
+    固定尺寸的帧槽环形缓冲区
+
+    槽位按 acquire → 写入 → 读取 → release 的顺序循环使用，同一槽位在 release 之前不会被复用
+    """
+
+    def __init__(
+        self,
+        num_slots: int,
+        frame_shape: Tuple[int, ...],
+        dtype=np.uint8
+    ):
+        """
+        初始化帧环形缓冲区
+
+        Args:
+            num_slots: 槽位数量
+            frame_shape: 单帧形状，如 (高, 宽, 3)
+            dtype: 像素类型
+        """
+        self.num_slots = max(1, int(num_slots))
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = np.dtype(dtype)
+        self.frame_nbytes = int(np.prod(self.frame_shape)) * self.dtype.itemsize
+
+        self._frames = np.empty((self.num_slots,) + self.frame_shape, dtype=self.dtype)
+
+        self._free = deque(range(self.num_slots))
+        self._cond = threading.Condition()
+        self._closed = False
+        self._stats = {"acquired": 0, "released": 0, "waits": 0, "peak_in_use": 0}
+        self._wait_time = 0.0
+
+    def slot(self, index: int) -> np.ndarray:
+        """获取槽位的数组视图（不拷贝）"""
+        return self._frames[index]
+
+    def acquire(self, stop_event: Optional[threading.Event] = None, timeout: float = 0.1) -> Optional[int]:
+        """
+        申请一个空闲槽位，没有空闲槽位时阻塞
+
+        Args:
+            stop_event: 停止事件，设置后放弃等待
+            timeout: 每次等待的超时时间，用于检查停止事件
+
+        Returns:
+            槽位下标，缓冲区关闭或收到停止事件时返回 None
+        """
+        with self._cond:
+            if not self._free:
+                self._stats["waits"] += 1
+                started = time.time()
+                while not self._free:
+                    if self._closed or (stop_event is not None and stop_event.is_set()):
+                        self._wait_time += time.time() - started
+                        return None
+                    self._cond.wait(timeout)
+                self._wait_time += time.time() - started
+
+            index = self._free.popleft()
+            self._stats["acquired"] += 1
+            self._stats["peak_in_use"] = max(self._stats["peak_in_use"], self.num_slots - len(self._free))
+            return index
+
+    def release(self, index: int):
+        """归还槽位"""
+        with self._cond:
+            self._free.append(index)
+            self._stats["released"] += 1
+            self._cond.notify()
+
+    def get_stats(self) -> Dict:
+        """获取槽位使用统计"""
+        with self._cond:
+            return {
+                "slots": self.num_slots,
+                "frame_shape": list(self.frame_shape),
+                "in_use": self.num_slots - len(self._free),
+                **self._stats,
+                "wait_ms": round(self._wait_time * 1000, 2)
+            }
+
+    def close(self):
+        """关闭缓冲区，唤醒所有等待槽位的线程（槽位内存随仍在引用它的视图一起回收）"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
@@ -0,0 +1,128 @@
+"""
+并行图像解码模块
+
+批量检测时直接在内存中解码上传的字节数据：
+- 不再写临时文件再用 cv2.imread 读回，批量检测的热路径上没有磁盘 I/O
+- cv2.imdecode 会释放 GIL，在线程池中可以多核并行解码
+- 按块解码并预取下一块，解码与上一块的推理重叠执行
+- 同一线程池也用于按需渲染和编码标注图像
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+def decode_image(contents: bytes) -> Optional[np.ndarray]:
+    """从字节数据解码图像，无法解码时返回 None"""
+    nparr = np.frombuffer(contents, np.uint8)
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+
+class ParallelImageDecoder:
+    """
+    并行图像解码器
+
+    线程池大小由 max_workers 决定，用作上下文管理器时退出后关闭线程池
+    """
+
+    def __init__(self, max_workers: int = 4, decode_observer: Optional[Callable[[float], None]] = None):
+        """
+        初始化并行解码器
+
+        Args:
+            max_workers: 解码线程数
+            decode_observer: 每张图像解码完成后以耗时（秒）调用的回调，用于记录指标
+        """
+        self.max_workers = max(1, int(max_workers))
+        self.decode_observer = decode_observer
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="decode"
+        )
+
+    def _decode(self, blob: bytes) -> Optional[np.ndarray]:
+        """在解码线程中解码一张图像并记录耗时"""
+        if self.decode_observer is None:
+            return decode_image(blob)
+        started = time.perf_counter()
+        try:
+            return decode_image(blob)
+        finally:
+            self.decode_observer(time.perf_counter() - started)
+
+    async def decode_all(self, blobs: List[bytes]) -> List[Optional[np.ndarray]]:
+        """
+        并行解码一组图像
+
+        Args:
+            blobs: 图像字节数据列表
+
+        Returns:
+            与输入顺序一致的图像列表，无法解码的位置为 None
+        """
+        loop = asyncio.get_running_loop()
+        return list(await asyncio.gather(*[
+            loop.run_in_executor(self._executor, self._decode, blob) for blob in blobs
+        ]))
+
+    async def iter_chunks(
+        self,
+        blobs: List[bytes],
+        chunk_size: int
+    ) -> AsyncIterator[Tuple[int, List[Optional[np.ndarray]]]]:
+        """
+        按块解码图像，产出当前块时下一块已经开始解码
+
+        调用方在处理（推理）当前块期间，线程池继续解码下一块；最多同时持有两块解码后的图像
+
+        Args:
+            blobs: 图像字节数据列表
+            chunk_size: 每块的图像数量
+
+        Yields:
+            (块起始下标, 与输入顺序一致的图像列表，无法解码的位置为 None)
+        """
+        chunk_size = max(1, int(chunk_size))
+        starts = list(range(0, len(blobs), chunk_size))
+        pending = None
+        try:
+            for i, start in enumerate(starts):
+                if pending is None:
+                    pending = asyncio.ensure_future(self.decode_all(blobs[start:start + chunk_size]))
+                images = await pending
+
+                # 预取下一块
+                pending = None
+                if i + 1 < len(starts):
+                    next_start = starts[i + 1]
+                    pending = asyncio.ensure_future(self.decode_all(blobs[next_start:next_start + chunk_size]))
+
+                yield start, images
+        finally:
+            if pending is not None and not pending.done():
+                pending.cancel()
+
+    def submit(self, fn: Callable, *args) -> "asyncio.Future":
+        """
+        在解码线程池中执行其他图像处理任务（如标注渲染和编码），立即开始执行
+
+        Returns:
+            可 await 的 Future
+        """
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._executor, fn, *args)
+
+    def shutdown(self):
+        """关闭解码线程池"""
+        self._executor.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
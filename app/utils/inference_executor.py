@@ -0,0 +1,230 @@
+"""
+推理执行器模块
+
+为所有模型推理提供专用的工作线程，保证 asyncio 事件循环只负责 I/O：
+- 异步提交接口，路由和 WebSocket 通过 await 等待结果
+- 推理线程数量可配置（默认 1，同时避免多个线程并发访问同一个模型）
+- 统计排队深度、等待时间和执行时间
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+
+
+@dataclass
+class InferenceExecutorConfig:
+    """推理执行器配置"""
+    max_workers: int = 1
+    thread_name_prefix: str = "inference"
+
+
+class InferenceExecutor:
+    """
+    推理执行器
+
+    把阻塞的 model.predict / model.track 调用放到专用线程中执行
+    """
+
+    def __init__(self, config: Optional[InferenceExecutorConfig] = None):
+        """
+        初始化推理执行器
+
+        Args:
+            config: 推理执行器配置
+        """
+        self.config = config or InferenceExecutorConfig()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "queue_depth": 0,
+            "in_flight": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+            "total_run_ms": 0.0,
+        }
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """获取或创建线程池执行器（shutdown 之后再次提交时重新创建）"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.config.max_workers,
+                    thread_name_prefix=self.config.thread_name_prefix
+                )
+            return self._executor
+
+    def _run(self, fn: Callable, enqueued_at: float, *args, **kwargs) -> Any:
+        """在推理线程中执行任务并记录统计"""
+        started_at = time.time()
+        wait_ms = (started_at - enqueued_at) * 1000
+        with self._lock:
+            self._stats["queue_depth"] -= 1
+            self._stats["in_flight"] += 1
+            self._stats["total_wait_ms"] += wait_ms
+            self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], wait_ms)
+
+        succeeded = False
+        try:
+            result = fn(*args, **kwargs)
+            succeeded = True
+            return result
+        finally:
+            run_ms = (time.time() - started_at) * 1000
+            with self._lock:
+                self._stats["in_flight"] -= 1
+                self._stats["total_run_ms"] += run_ms
+                self._stats["completed" if succeeded else "failed"] += 1
+
+    async def submit(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        异步提交推理任务
+
+        Args:
+            fn: 要执行的阻塞函数
+            *args, **kwargs: 传给 fn 的参数
+
+        Returns:
+            fn 的返回值
+        """
+        return await asyncio.wrap_future(self._submit(fn, *args, **kwargs))
+
+    def call(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        从事件循环以外的线程（如后台任务线程）同步提交推理任务并等待结果
+
+        Args:
+            fn: 要执行的阻塞函数
+            *args, **kwargs: 传给 fn 的参数
+
+        Returns:
+            fn 的返回值
+        """
+        return self._submit(fn, *args, **kwargs).result()
+
+    def _submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """提交任务到推理线程并记录统计"""
+        with self._lock:
+            self._stats["submitted"] += 1
+            self._stats["queue_depth"] += 1
+        return self._get_executor().submit(self._run, fn, time.time(), *args, **kwargs)
+
+    async def iterate(self, iterator: Iterator) -> AsyncIterator:
+        """
+        在推理线程中逐项推进阻塞的迭代器（如逐帧产出结果的生成器）
+
+        每次只推进一项，两项之间推理线程可以处理其他请求
+
+        Args:
+            iterator: 阻塞的迭代器
+
+        Yields:
+            迭代器产出的每一项
+        """
+        sentinel = object()
+        pending: Optional[Future] = None
+        try:
+            while True:
+                pending = self._submit(next, iterator, sentinel)
+                item = await asyncio.wrap_future(pending)
+                if item is sentinel:
+                    break
+                yield item
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                # 等仍在执行的 next 结束后再关闭（否则多个推理线程时会并发进入生成器），
+                # 并等待关闭完成，调用方随后释放跟踪锁等资源时生成器已经清理完毕；
+                # 被取消时用 shield 保证这两步仍然执行完
+                if pending is not None and not pending.done():
+                    try:
+                        await asyncio.shield(asyncio.wrap_future(pending))
+                    except Exception:
+                        pass
+                await asyncio.shield(asyncio.wrap_future(self._submit(close)))
+
+    def iterate_blocking(self, iterator: Iterator) -> Iterator:
+        """
+        iterate 的同步版本，供事件循环以外的线程使用
+
+        Args:
+            iterator: 阻塞的迭代器
+
+        Yields:
+            迭代器产出的每一项
+        """
+        sentinel = object()
+        try:
+            while True:
+                item = self.call(next, iterator, sentinel)
+                if item is sentinel:
+                    break
+                yield item
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                self.call(close)
+
+    def get_stats(self) -> Dict:
+        """获取执行器统计信息"""
+        with self._lock:
+            stats = dict(self._stats)
+
+        finished = stats["completed"] + stats["failed"]
+        started = finished + stats["in_flight"]
+        return {
+            "max_workers": self.config.max_workers,
+            "submitted": stats["submitted"],
+            "completed": stats["completed"],
+            "failed": stats["failed"],
+            "queue_depth": stats["queue_depth"],
+            "in_flight": stats["in_flight"],
+            "avg_wait_ms": round(stats["total_wait_ms"] / started, 2) if started > 0 else 0,
+            "max_wait_ms": round(stats["max_wait_ms"], 2),
+            "avg_run_ms": round(stats["total_run_ms"] / finished, 2) if finished > 0 else 0
+        }
+
+    def shutdown(self):
+        """关闭推理执行器"""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=True)
+
+
+async def run_blocking(fn: Callable, *args, **kwargs) -> Any:
+    """
+    在默认线程池中执行非推理的阻塞操作（如图像编解码、文件读写）
+
+    OpenCV 的编解码会释放 GIL，放到线程池中不会阻塞事件循环，也不会占用推理线程
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, partial(fn, *args, **kwargs))
+
+
+# 全局推理执行器实例（延迟初始化）
+_inference_executor: Optional[InferenceExecutor] = None
+
+
+def get_inference_executor(config: Optional[InferenceExecutorConfig] = None) -> InferenceExecutor:
+    """获取或创建全局推理执行器实例"""
+    global _inference_executor
+    if _inference_executor is None:
+        _inference_executor = InferenceExecutor(config)
+    return _inference_executor
+
+
+def shutdown_inference_executor():
+    """关闭全局推理执行器"""
+    global _inference_executor
+    if _inference_executor:
+        _inference_executor.shutdown()
+        _inference_executor = None
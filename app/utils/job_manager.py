@@ -0,0 +1,305 @@
+"""
+异步任务管理模块
+
+为耗时的视频/批量检测提供后台任务：
+- 提交后立即返回任务 ID，避免长时间占用 HTTP 连接和代理超时
+- 有界工作线程池和排队上限
+- 基于 ProcessingProgress 的进度百分比和剩余时间估计
+- 支持取消、结果获取和已完成任务的自动清理
+"""
+
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from app.utils.batch_processor import ProcessingProgress
+
+# 任务状态
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+FINISHED_STATUSES = (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED)
+
+
+class JobCancelled(Exception):
+    """任务被取消"""
+
+
+class JobQueueFull(Exception):
+    """排队中的任务数已达上限"""
+
+
+@dataclass
+class JobConfig:
+    """任务管理配置"""
+    max_workers: int = 2
+    max_pending_jobs: int = 20
+    max_retained_jobs: int = 100
+
+
+@dataclass
+class Job:
+    """后台任务"""
+    job_id: str
+    kind: str
+    status: str = JOB_QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    progress: Optional[ProcessingProgress] = None
+    result: Any = None
+    error: Optional[str] = None
+    output_path: Optional[str] = None
+    cleanup_paths: List[str] = field(default_factory=list)
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+    future: Optional[Future] = None
+
+    def check_cancelled(self):
+        """任务函数在处理过程中调用，已请求取消时抛出 JobCancelled"""
+        if self.cancel_event.is_set():
+            raise JobCancelled(f"Job {self.job_id} cancelled")
+
+    def update_progress(self, total: int, processed: int, failed: int = 0):
+        """
+        根据已处理数量更新进度并估计剩余时间
+
+        Args:
+            total: 总数量（未知时为 0）
+            processed: 已处理数量
+            failed: 失败数量
+        """
+        elapsed = time.time() - (self.started_at or self.created_at)
+        avg_time = elapsed / processed if processed > 0 else 0
+        remaining = max(total - processed, 0)
+        self.progress = ProcessingProgress(
+            total=total,
+            processed=processed,
+            failed=failed,
+            progress_percent=(processed / total) * 100 if total > 0 else 0,
+            elapsed_time=elapsed,
+            estimated_remaining=avg_time * remaining
+        )
+        self.check_cancelled()
+
+    def set_progress(self, progress: ProcessingProgress):
+        """直接设置进度，可作为 BatchProcessor 的 progress_callback"""
+        self.progress = progress
+        self.check_cancelled()
+
+    def to_dict(self) -> Dict:
+        """转换为状态字典"""
+        progress = None
+        if self.progress is not None:
+            progress = asdict(self.progress)
+            progress["progress_percent"] = round(progress["progress_percent"], 2)
+            progress["elapsed_time"] = round(progress["elapsed_time"], 2)
+            progress["estimated_remaining"] = round(progress["estimated_remaining"], 2)
+
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": progress,
+            "eta_seconds": progress["estimated_remaining"] if progress else None,
+            "error": self.error,
+            "has_result": self.status == JOB_COMPLETED,
+            "has_video": self.output_path is not None and self.status == JOB_COMPLETED
+        }
+
+
+class JobManager:
+    """
+    后台任务管理器
+
+    任务函数接收 Job 实例，通过 job.update_progress / job.set_progress 报告进度，返回值作为任务结果
+    """
+
+    def __init__(self, config: Optional[JobConfig] = None):
+        """
+        初始化任务管理器
+
+        Args:
+            config: 任务管理配置
+        """
+        self.config = config or JobConfig()
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """获取或创建线程池执行器"""
+        if self._executor is None or self._executor._shutdown:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.config.max_workers,
+                thread_name_prefix="job"
+            )
+        return self._executor
+
+    def submit(
+        self,
+        kind: str,
+        fn: Callable[[Job], Any],
+        output_path: Optional[str] = None,
+        cleanup_paths: Optional[List[str]] = None
+    ) -> Job:
+        """
+        提交后台任务
+
+        Args:
+            kind: 任务类型，如 "video" 或 "batch"
+            fn: 任务函数，参数为 Job 实例
+            output_path: 任务生成的输出文件路径（如标注视频）
+            cleanup_paths: 任务被清理时需要删除的临时文件
+
+        Returns:
+            任务实例
+
+        Raises:
+            JobQueueFull: 排队中的任务数已达上限
+        """
+        with self._lock:
+            pending = sum(1 for job in self._jobs.values() if job.status == JOB_QUEUED)
+            if pending >= self.config.max_pending_jobs:
+                raise JobQueueFull(f"Too many pending jobs ({pending})")
+
+            job = Job(
+                job_id=str(uuid.uuid4()),
+                kind=kind,
+                output_path=output_path,
+                cleanup_paths=list(cleanup_paths or [])
+            )
+            self._jobs[job.job_id] = job
+            self._evict_finished_jobs()
+
+        job.future = self._get_executor().submit(self._run_job, job, fn)
+        return job
+
+    def _run_job(self, job: Job, fn: Callable[[Job], Any]) -> Any:
+        """在工作线程中执行任务"""
+        if job.cancel_event.is_set():
+            job.status = JOB_CANCELLED
+            job.finished_at = time.time()
+            return None
+
+        job.status = JOB_RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = fn(job)
+            job.status = JOB_COMPLETED
+            return job.result
+        except JobCancelled:
+            job.status = JOB_CANCELLED
+            return None
+        except Exception as e:
+            print(f"任务 {job.job_id} 失败：{e}")
+            traceback.print_exc()
+            job.status = JOB_FAILED
+            job.error = str(e)
+            return None
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """获取任务"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[Dict]:
+        """列出所有任务的状态"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.to_dict() for job in sorted(jobs, key=lambda j: j.created_at, reverse=True)]
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        请求取消任务：排队中的任务不再执行，运行中的任务在下一次报告进度时停止
+
+        Returns:
+            任务实例，不存在时返回 None
+        """
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job.status not in FINISHED_STATUSES:
+            job.cancel_event.set()
+            if job.future is not None and job.future.cancel():
+                job.status = JOB_CANCELLED
+                job.finished_at = time.time()
+        return job
+
+    def _evict_finished_jobs(self):
+        """超出保留数量时清理最早完成的任务及其文件（调用方持有锁）"""
+        finished = sorted(
+            (job for job in self._jobs.values() if job.status in FINISHED_STATUSES),
+            key=lambda j: j.finished_at or j.created_at
+        )
+        overflow = len(self._jobs) - self.config.max_retained_jobs
+        for job in finished[:max(overflow, 0)]:
+            self._cleanup_files(job)
+            del self._jobs[job.job_id]
+
+    def _cleanup_files(self, job: Job):
+        """删除任务关联的临时文件"""
+        paths = list(job.cleanup_paths)
+        if job.output_path:
+            paths.append(job.output_path)
+        for path in paths:
+            try:
+                if path and os.path.exists(path):
+                    os.unlink(path)
+            except OSError:
+                pass
+
+    def get_stats(self) -> Dict:
+        """获取任务统计信息"""
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {
+            "max_workers": self.config.max_workers,
+            "max_pending_jobs": self.config.max_pending_jobs,
+            "total": len(statuses),
+            **{status: statuses.count(status) for status in
+               (JOB_QUEUED, JOB_RUNNING, JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED)}
+        }
+
+    def shutdown(self):
+        """关闭任务管理器：取消所有未完成的任务"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            if job.status not in FINISHED_STATUSES:
+                job.cancel_event.set()
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+# 全局任务管理器实例（延迟初始化）
+_job_manager: Optional[JobManager] = None
+
+
+def get_job_manager(config: Optional[JobConfig] = None) -> JobManager:
+    """获取或创建全局任务管理器实例"""
+    global _job_manager
+    if _job_manager is None:
+        _job_manager = JobManager(config)
+    return _job_manager
+
+
+def shutdown_job_manager():
+    """关闭全局任务管理器"""
+    global _job_manager
+    if _job_manager:
+        _job_manager.shutdown()
+        _job_manager = None
@@ -0,0 +1,242 @@
+"""
+指标模块
+
+以 Prometheus 文本格式 (text/plain; version=0.0.4) 导出服务指标，不依赖 prometheus_client：
+- 分阶段耗时直方图：上传读取、解码、预处理、推理（视频为跟踪）、后处理、标注、编码，按端点和模型打标签
+- 请求耗时直方图、请求计数和进行中的请求数
+- 队列深度等瞬时值在抓取时通过回调采集，不在热路径上维护
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# 阶段名称
+STAGE_UPLOAD_READ = "upload_read"
+STAGE_DECODE = "decode"
+STAGE_PREPROCESS = "preprocess"
+STAGE_INFERENCE = "inference"
+STAGE_TRACK = "track"
+STAGE_POSTPROCESS = "postprocess"
+STAGE_ANNOTATE = "annotate"
+STAGE_ENCODE = "encode"
+
+# 检测结果 speed 字段（毫秒）中可以直接记录的阶段
+RESULT_SPEED_STAGES = (STAGE_PREPROCESS, STAGE_INFERENCE, STAGE_POSTPROCESS, STAGE_ANNOTATE)
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 抓取时采集的瞬时值：(指标名, 说明, 标签, 值)
+GaugeSample = Tuple[str, str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    """转义标签值"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    """格式化标签集合"""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    """格式化样本值"""
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Histogram:
+    """带标签的直方图"""
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str],
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List] = {}  # 标签值 → [各桶计数, 总和, 总数]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        """记录一次观测值（秒）"""
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        """导出为 Prometheus 文本行"""
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        for key, (counts, total, count) in sorted(series.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels({**labels, "le": _format_value(bound)})
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class Counter:
+    """带标签的计数器"""
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str]):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        """增加计数"""
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        """导出为 Prometheus 文本行"""
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """带标签的瞬时值"""
+
+    def dec(self, amount: float = 1, **labels):
+        """减少数值"""
+        self.inc(-amount, **labels)
+
+    def render(self) -> List[str]:
+        """导出为 Prometheus 文本行"""
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Metrics:
+    """
+    服务指标集合
+
+    直方图和计数器可以在任意线程中更新；队列深度等瞬时值由 add_collector 注册的回调在抓取时提供
+    """
+
+    def __init__(self):
+        self.stage_seconds = Histogram(
+            "yolo_stage_duration_seconds",
+            "Per-image (or per-frame) duration of each processing stage (upload_read is per request)",
+            ("stage", "endpoint", "model")
+        )
+        self.request_seconds = Histogram(
+            "yolo_request_duration_seconds",
+            "End-to-end HTTP request duration",
+            ("endpoint", "method", "status")
+        )
+        self.requests_total = Counter(
+            "yolo_requests_total",
+            "HTTP requests handled",
+            ("endpoint", "method", "status")
+        )
+        self.requests_in_flight = Gauge(
+            "yolo_requests_in_flight",
+            "HTTP requests currently being handled",
+            ("method",)
+        )
+        self.images_total = Counter(
+            "yolo_images_processed_total",
+            "Images (or frames) that went through inference",
+            ("endpoint", "model")
+        )
+        self._collectors: List[Callable[[], List[GaugeSample]]] = []
+        self._started_at = time.time()
+
+    def observe_stage(self, stage: str, seconds: float, endpoint: str, model: Optional[str] = None):
+        """记录一个阶段的耗时（秒）"""
+        self.stage_seconds.observe(seconds, stage=stage, endpoint=endpoint, model=model or "")
+
+    @contextmanager
+    def time_stage(self, stage: str, endpoint: str, model: Optional[str] = None) -> Iterator[None]:
+        """计时一个阶段"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(stage, time.perf_counter() - started, endpoint, model)
+
+    def observe_result(self, result: Dict, endpoint: str, model: Optional[str] = None):
+        """
+        从检测结果的 speed 字段（毫秒）记录预处理、推理、后处理和标注耗时
+
+        Args:
+            result: batch_predict_optimized / detect_objects 返回的单张结果
+            endpoint: 端点
+            model: 模型名称
+        """
+        speed = result.get("speed") or {}
+        for stage in RESULT_SPEED_STAGES:
+            if speed.get(stage) is not None:
+                self.observe_stage(stage, speed[stage] / 1000, endpoint, model)
+        self.images_total.inc(endpoint=endpoint, model=model or "")
+
+    def add_collector(self, collector: Callable[[], List[GaugeSample]]):
+        """注册抓取时调用的瞬时值采集回调"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """导出全部指标为 Prometheus 文本格式"""
+        lines = []
+        for metric in (self.stage_seconds, self.request_seconds, self.requests_total,
+                       self.requests_in_flight, self.images_total):
+            lines.extend(metric.render())
+
+        # 同名瞬时值合并在同一个 HELP / TYPE 下
+        samples: Dict[str, Tuple[str, List[Tuple[Dict[str, str], float]]]] = {}
+        samples["yolo_uptime_seconds"] = ("Seconds since the metrics registry was created",
+                                          [({}, time.time() - self._started_at)])
+        for collector in self._collectors:
+            try:
+                for name, description, labels, value in collector():
+                    samples.setdefault(name, (description, []))[1].append((labels, value))
+            except Exception as e:
+                print(f"指标采集失败：{e}")
+        for name, (description, values) in samples.items():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in values:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+# 全局指标实例（延迟初始化）
+_metrics: Optional[Metrics] = None
+
+
+def get_metrics() -> Metrics:
+    """获取或创建全局指标实例"""
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics()
+    return _metrics
@@ -0,0 +1,252 @@
+"""
+微批处理调度器模块
+
+将短时间窗口内到达的单张图片检测请求合并为一次批量推理：
+- 按 classes / conf_threshold / 是否标注 分组，只合并参数兼容的请求
+- 窗口由最大等待时间 (max_wait_ms) 和最大批大小 (max_batch_size) 共同决定
+- 每个调用方仍然拿到属于自己的那一份检测结果
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+import numpy as np
+
+
+@dataclass
+class MicroBatchConfig:
+    """微批处理配置"""
+    enabled: bool = True
+    max_wait_ms: float = 10.0
+    max_batch_size: int = 16
+
+
+@dataclass
+class _PendingRequest:
+    """等待合并的单个请求"""
+    image: np.ndarray
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.time)
+
+
+# 分组键：(类别 ID 元组, 置信度阈值, 是否返回标注图像)
+GroupKey = Tuple[Optional[Tuple[int, ...]], float, bool]
+
+
+class MicroBatcher:
+    """
+    微批处理调度器
+
+    位于 ObjectsDetector 之前，把并发到达的 detect 请求合并为 batch_predict_optimized 调用
+    """
+
+    def __init__(self, detector, config: Optional[MicroBatchConfig] = None, executor=None):
+        """
+        初始化调度器
+
+        Args:
+            detector: 检测器实例
+            config: 微批处理配置
+            executor: 推理执行器，为 None 时使用事件循环默认线程池
+        """
+        self.detector = detector
+        self.config = config or MicroBatchConfig()
+        self.executor = executor
+        self._pending: Dict[GroupKey, List[_PendingRequest]] = {}
+        self._timers: Dict[GroupKey, asyncio.TimerHandle] = {}
+        # 进行中的批次任务：事件循环只持有任务的弱引用，需要在这里保留直到完成
+        self._tasks: Set[asyncio.Task] = set()
+        self._inference_lock: Optional[asyncio.Lock] = None
+        self._stats = {
+            "requests": 0,
+            "completed": 0,
+            "batches": 0,
+            "max_observed_batch_size": 0,
+            "total_queue_wait_ms": 0.0,
+        }
+
+    def _make_key(
+        self,
+        class_ids: Optional[List[int]],
+        conf_threshold: float,
+        return_annotated: bool
+    ) -> GroupKey:
+        """生成分组键，只有参数完全兼容的请求才会被合并"""
+        classes_key = tuple(sorted(set(class_ids))) if class_ids else None
+        return classes_key, round(float(conf_threshold), 3), bool(return_annotated)
+
+    async def submit(
+        self,
+        image: np.ndarray,
+        classes: Optional[Union[List[int], List[str]]] = None,
+        conf_threshold: float = 0.5,
+        return_annotated: bool = False
+    ) -> Dict:
+        """
+        提交单张图片检测请求，等待所在批次完成后返回该图片的结果
+
+        Args:
+            image: 输入图像 (BGR 格式)
+            classes: 要检测的类别
+            conf_threshold: 置信度阈值
+            return_annotated: 是否返回标注图像
+
+        Returns:
+            检测结果字典，与 detect_objects 的返回格式一致
+        """
+        loop = asyncio.get_running_loop()
+
+        if not self.config.enabled or self.config.max_batch_size <= 1:
+            return await self._call(
+                self.detector.detect_objects,
+                image,
+                return_annotated=return_annotated,
+                classes=classes,
+                conf_threshold=conf_threshold
+            )
+
+        class_ids = self.detector._parse_classes(classes)
+        key = self._make_key(class_ids, conf_threshold, return_annotated)
+
+        future = loop.create_future()
+        queue = self._pending.setdefault(key, [])
+        queue.append(_PendingRequest(image=image, future=future))
+        self._stats["requests"] += 1
+
+        if len(queue) >= self.config.max_batch_size:
+            self._flush(key)
+        elif len(queue) == 1:
+            self._timers[key] = loop.call_later(
+                self.config.max_wait_ms / 1000.0, self._flush, key
+            )
+
+        return await future
+
+    async def _call(self, fn, *args, **kwargs):
+        """通过推理执行器（或默认线程池）执行阻塞的推理调用"""
+        if self.executor is not None:
+            return await self.executor.submit(fn, *args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, partial(fn, *args, **kwargs))
+
+    def _flush(self, key: GroupKey):
+        """取出某个分组的全部等待请求并调度一次批量推理"""
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+
+        batch = self._pending.pop(key, None)
+        if batch:
+            task = asyncio.ensure_future(self._run_batch(key, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, key: GroupKey, batch: List[_PendingRequest]):
+        """执行一个批次，任务被取消或意外失败时让所有调用方立即结束等待"""
+        try:
+            await self._dispatch_batch(key, batch)
+        except asyncio.CancelledError:
+            for request in batch:
+                if not request.future.done():
+                    request.future.cancel()
+            raise
+        except Exception as e:
+            print(f"微批处理批次失败：{e}")
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+
+    async def _dispatch_batch(self, key: GroupKey, batch: List[_PendingRequest]):
+        """执行一次批量推理并把结果分发给各个调用方"""
+        if self._inference_lock is None:
+            self._inference_lock = asyncio.Lock()
+
+        classes_key, conf_threshold, return_annotated = key
+        images = [request.image for request in batch]
+
+        # 同一时刻只跑一个批次，批次执行期间新到达的请求会自然聚合成下一批
+        async with self._inference_lock:
+            dispatched_at = time.time()
+            try:
+                results = await self._call(
+                    self.detector.batch_predict_optimized,
+                    images,
+                    return_annotated=return_annotated,
+                    classes=list(classes_key) if classes_key else None,
+                    conf_threshold=conf_threshold
+                )
+            except Exception as e:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                return
+
+        self._stats["batches"] += 1
+        self._stats["completed"] += len(batch)
+        self._stats["max_observed_batch_size"] = max(
+            self._stats["max_observed_batch_size"], len(batch)
+        )
+
+        for request, result in zip(batch, results):
+            wait_ms = (dispatched_at - request.enqueued_at) * 1000
+            self._stats["total_queue_wait_ms"] += wait_ms
+            result["micro_batch_size"] = len(batch)
+            result["queue_wait_ms"] = round(wait_ms, 2)
+            if not request.future.done():
+                request.future.set_result(result)
+
+    async def shutdown(self):
+        """取消还在等待合并的请求和进行中的批次，并等待批次任务结束"""
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        for queue in self._pending.values():
+            for request in queue:
+                if not request.future.done():
+                    request.future.cancel()
+        self._pending.clear()
+
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get_stats(self) -> Dict:
+        """获取调度统计信息"""
+        batches = self._stats["batches"]
+        completed = self._stats["completed"]
+        return {
+            "enabled": self.config.enabled,
+            "max_wait_ms": self.config.max_wait_ms,
+            "max_batch_size": self.config.max_batch_size,
+            "requests": self._stats["requests"],
+            "batches": batches,
+            "avg_batch_size": round(completed / batches, 2) if batches > 0 else 0,
+            "max_observed_batch_size": self._stats["max_observed_batch_size"],
+            "avg_queue_wait_ms": (
+                round(self._stats["total_queue_wait_ms"] / completed, 2)
+                if completed > 0 else 0
+            ),
+            "pending": sum(len(queue) for queue in self._pending.values()),
+            "running_batches": len(self._tasks)
+        }
+
+
+# 全局微批处理调度器实例（延迟初始化）
+_micro_batcher: Optional[MicroBatcher] = None
+
+
+def get_micro_batcher(
+    detector,
+    config: Optional[MicroBatchConfig] = None,
+    executor=None
+) -> MicroBatcher:
+    """获取或创建全局微批处理调度器实例"""
+    global _micro_batcher
+    if _micro_batcher is None:
+        _micro_batcher = MicroBatcher(detector, config, executor)
+    return _micro_batcher
@@ -0,0 +1,291 @@
+"""
+进程池推理模块
+
+把批量推理分片到多个 CPU 核心上执行：
+- 每个工作进程加载自己的模型，限定 PyTorch / OpenCV / OpenMP 线程数，可选绑定 CPU 核心
+- 图像通过共享内存传给工作进程，不经过 pickle 序列化
+- 标注直接绘制在共享内存中的输入图像上，主进程从同一块共享内存拷出
+- 按提交顺序返回结果
+
+线程池共享同一个 YOLO 实例时既没有并行加速，又有并发访问模型的风险；
+进程池中每个进程独占一个模型，吞吐量随物理核心数近似线性增长。
+"""
+
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import psutil
+
+# 共享内存中的图像布局：(字节偏移, 形状, dtype)
+FrameLayout = Tuple[int, Tuple[int, ...], str]
+
+
+@dataclass
+class ProcessPoolConfig:
+    """进程池推理配置"""
+    num_workers: Optional[int] = None  # 工作进程数，默认为物理核心数
+    threads_per_worker: int = 1  # 每个工作进程的推理线程数
+    pin_cores: bool = True  # 是否把工作进程绑定到固定的 CPU 核心
+
+
+# ---- 工作进程 ----
+
+_worker_detector = None
+
+
+def _init_worker(model_name: Optional[str], weights_path: Optional[str], threads: int,
+                 pin_cores: bool, counter, cpus: List[int]):
+    """工作进程初始化：限定线程数、绑定核心并加载模型"""
+    global _worker_detector
+
+    # 必须在导入 torch / cv2 之前设置
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    os.environ["CUDA_VISIBLE_DEVICES"] = ""
+
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+
+    if pin_cores and cpus:
+        start = (index * threads) % len(cpus)
+        try:
+            psutil.Process().cpu_affinity([cpus[(start + i) % len(cpus)] for i in range(threads)])
+        except (AttributeError, OSError):
+            pass
+
+    import cv2
+    import torch
+    torch.set_num_threads(threads)
+    cv2.setNumThreads(threads)
+
+    from app.core.config import ANNOTATION_STYLE
+    from app.utils.box_renderer import get_box_renderer, RenderStyle
+    get_box_renderer(RenderStyle(**ANNOTATION_STYLE))
+
+    from app.models.detector import ObjectsDetector
+    _worker_detector = ObjectsDetector(model_name, weights_path=weights_path)
+    _worker_detector.load_model()
+
+
+def _frames_from_shm(buffer, layouts: List[FrameLayout]) -> List[np.ndarray]:
+    """从共享内存构建图像视图（不拷贝）"""
+    return [
+        np.ndarray(shape, dtype=np.dtype(dtype), buffer=buffer, offset=offset)
+        for offset, shape, dtype in layouts
+    ]
+
+
+def _close_shm(shm: shared_memory.SharedMemory):
+    """关闭共享内存映射"""
+    try:
+        shm.close()
+    except BufferError:
+        # 仍有视图引用共享内存（如异常回溯中的局部变量），映射随这些视图一起回收
+        pass
+
+
+def _release_predictor_refs():
+    """丢弃 ultralytics 预测器对上一批输入图像的引用（batch、results 和 dataset 中的原图）"""
+    predictor = getattr(_worker_detector.model, "predictor", None)
+    if predictor is not None:
+        for attr in ("batch", "results", "dataset"):
+            if hasattr(predictor, attr):
+                setattr(predictor, attr, None)
+
+
+def _predict_in_shm(buffer, layouts: List[FrameLayout], options: Dict) -> List[Dict]:
+    """在共享内存中的图像上批量推理，标注写回原位；返回时不保留任何共享内存视图"""
+    frames = _frames_from_shm(buffer, layouts)
+    return_annotated = options.pop("return_annotated", False)
+    results = _worker_detector.batch_predict_optimized(
+        frames, return_annotated=return_annotated, **options
+    )
+    for frame, result in zip(frames, results):
+        annotated = result.get("annotated_image")
+        if annotated is not None:
+            # 标注图像写回输入所在的共享内存，由主进程拷出
+            if annotated is not frame:
+                frame[...] = annotated
+            result["annotated_image"] = None
+            result["annotated_in_shm"] = True
+        # 原始推理结果的 orig_img 是共享内存视图，不随结果返回
+        result.pop("raw_result", None)
+    return results
+
+
+def _worker_predict(shm_name: str, layouts: List[FrameLayout], options: Dict) -> List[Dict]:
+    """工作进程：从共享内存读取图像并批量推理"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        return _predict_in_shm(shm.buf, layouts, options)
+    finally:
+        _release_predictor_refs()
+        _close_shm(shm)
+
+
+def _copy_annotated_from_shm(buffer, layouts: List[FrameLayout], results: List[Dict]):
+    """把工作进程写回共享内存的标注图像拷出到结果中"""
+    frames = _frames_from_shm(buffer, layouts)
+    for frame, result in zip(frames, results):
+        if result.pop("annotated_in_shm", False):
+            result["annotated_image"] = frame.copy()
+
+
+# ---- 主进程 ----
+
+class ProcessPoolInference:
+    """
+    进程池推理
+
+    每个工作进程加载一份模型，submit 返回的 Future 按调用顺序收集即可得到有序结果
+    """
+
+    def __init__(self, model_name: Optional[str] = None, weights_path: Optional[str] = None,
+                 config: Optional[ProcessPoolConfig] = None):
+        """
+        初始化进程池
+
+        Args:
+            model_name: 工作进程加载的模型名称
+            weights_path: 自定义权重文件路径
+            config: 进程池配置
+        """
+        self.config = config or ProcessPoolConfig()
+        self.num_workers = self.config.num_workers or psutil.cpu_count(logical=False) or 1
+        self.model_name = model_name
+        self.weights_path = weights_path
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._stats = {"chunks": 0, "images": 0, "shm_bytes": 0}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """获取或创建进程池（spawn 方式，避免 fork 继承主进程的模型和线程状态）"""
+        with self._lock:
+            if self._executor is None:
+                ctx = multiprocessing.get_context("spawn")
+                try:
+                    cpus = sorted(psutil.Process().cpu_affinity())
+                except (AttributeError, OSError):
+                    cpus = list(range(psutil.cpu_count() or 1))
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.num_workers,
+                    mp_context=ctx,
+                    initializer=_init_worker,
+                    initargs=(
+                        self.model_name, self.weights_path, self.config.threads_per_worker,
+                        self.config.pin_cores, ctx.Value("i", 0), cpus
+                    )
+                )
+            return self._executor
+
+    def submit(self, images: List[np.ndarray], **options) -> Future:
+        """
+        提交一块图像到工作进程
+
+        Args:
+            images: 图像列表
+            **options: 传给 batch_predict_optimized 的参数（classes、conf_threshold、return_annotated 等）
+
+        Returns:
+            结果为检测结果列表的 Future，共享内存在完成后自动释放
+        """
+        layouts: List[FrameLayout] = []
+        offset = 0
+        for image in images:
+            layouts.append((offset, image.shape, image.dtype.str))
+            offset += image.nbytes
+
+        shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for image, (start, _, _) in zip(images, layouts):
+            np.ndarray(image.shape, dtype=image.dtype, buffer=shm.buf, offset=start)[...] = image
+
+        with self._lock:
+            self._stats["chunks"] += 1
+            self._stats["images"] += len(images)
+            self._stats["shm_bytes"] += offset
+
+        inner = self._get_executor().submit(_worker_predict, shm.name, layouts, dict(options))
+        outer: Future = Future()
+
+        def _done(future: Future):
+            try:
+                results = future.result()
+                _copy_annotated_from_shm(shm.buf, layouts, results)
+                outer.set_result(results)
+            except BaseException as e:
+                outer.set_exception(e)
+            finally:
+                _close_shm(shm)
+                shm.unlink()
+
+        inner.add_done_callback(_done)
+        return outer
+
+    def predict(self, images: List[np.ndarray], **options) -> List[Dict]:
+        """
+        把图像平均分给各工作进程并行推理，按输入顺序返回结果
+
+        Args:
+            images: 图像列表
+            **options: 传给 batch_predict_optimized 的参数
+
+        Returns:
+            检测结果列表
+        """
+        if not images:
+            return []
+        chunk_size = math.ceil(len(images) / self.num_workers)
+        futures = [
+            self.submit(images[i:i + chunk_size], **options)
+            for i in range(0, len(images), chunk_size)
+        ]
+        results = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+
+    def get_stats(self) -> Dict:
+        """获取进程池统计信息"""
+        with self._lock:
+            return {
+                "model": self.model_name,
+                "num_workers": self.num_workers,
+                "threads_per_worker": self.config.threads_per_worker,
+                "started": self._executor is not None,
+                **self._stats
+            }
+
+    def shutdown(self):
+        """关闭进程池"""
+        with self._lock:
+            if self._executor:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+# 全局进程池实例（按模型名称，延迟初始化）
+_process_pools: Dict[str, ProcessPoolInference] = {}
+
+
+def get_process_pool(model_name: Optional[str], weights_path: Optional[str] = None,
+                     config: Optional[ProcessPoolConfig] = None) -> ProcessPoolInference:
+    """获取或创建模型对应的全局进程池"""
+    key = model_name or ""
+    if key not in _process_pools:
+        _process_pools[key] = ProcessPoolInference(model_name, weights_path, config)
+    return _process_pools[key]
+
+
+def shutdown_process_pools():
+    """关闭所有进程池"""
+    for pool in list(_process_pools.values()):
+        pool.shutdown()
+    _process_pools.clear()
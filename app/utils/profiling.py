@@ -0,0 +1,187 @@
+"""
+请求采样分析模块
+
+在不重新部署的情况下分析个别慢请求：
+- 请求通过 profile 参数或 X-Profile 请求头开启分析，也可以按比例随机采样
+- 优先使用 pyinstrument（采样分析器，生成 HTML 火焰图），未安装时退回标准库 cProfile
+- 分析结果保存到目录中，按数量上限淘汰最早的文件，通过 ID 下载
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from pyinstrument import Profiler as _PyinstrumentProfiler
+except ImportError:
+    _PyinstrumentProfiler = None
+
+PROFILER_BACKEND = "pyinstrument" if _PyinstrumentProfiler is not None else "cprofile"
+
+# 分析结果 ID 只允许十六进制字符，避免路径穿越
+PROFILE_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+@dataclass
+class ProfilingConfig:
+    """请求分析配置"""
+    enabled: bool = True
+    sample_rate: float = 0.0  # 未显式请求时随机分析的请求比例
+    output_dir: str = field(default_factory=lambda: os.path.join(tempfile.gettempdir(), "yolo_profiles"))
+    max_profiles: int = 50
+    summary_lines: int = 25  # 响应中附带的文本摘要行数
+
+
+class RequestProfiler:
+    """
+    单请求分析器
+
+    run 在调用线程中执行函数并分析；推理在推理线程中执行，应把整个请求的同步处理过程交给 run，
+    而不是在事件循环线程中分析
+    """
+
+    def __init__(self, config: Optional[ProfilingConfig] = None):
+        """
+        初始化请求分析器
+
+        Args:
+            config: 请求分析配置
+        """
+        self.config = config or ProfilingConfig()
+        self._lock = threading.Lock()
+        self._stats = {"profiled": 0, "sampled": 0}
+
+    def should_profile(self, requested: bool) -> bool:
+        """判断当前请求是否需要分析（显式请求或命中随机采样）"""
+        if not self.config.enabled:
+            return False
+        if requested:
+            return True
+        if self.config.sample_rate > 0 and random.random() < self.config.sample_rate:
+            with self._lock:
+                self._stats["sampled"] += 1
+            return True
+        return False
+
+    def run(self, fn: Callable, *args, **kwargs) -> Tuple[Any, Dict]:
+        """
+        在分析器下执行函数
+
+        Args:
+            fn: 要分析的函数
+            *args, **kwargs: 传给函数的参数
+
+        Returns:
+            (函数返回值, 分析信息 {"id", "backend", "duration_ms", "summary"})
+        """
+        profile_id = uuid.uuid4().hex
+        started = time.perf_counter()
+        if _PyinstrumentProfiler is not None:
+            profiler = _PyinstrumentProfiler()
+            profiler.start()
+            try:
+                result = fn(*args, **kwargs)
+            finally:
+                profiler.stop()
+            duration_ms = (time.perf_counter() - started) * 1000
+            self._write(profile_id, ".html", profiler.output_html())
+            summary = profiler.output_text(unicode=True, color=False)
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                result = fn(*args, **kwargs)
+            finally:
+                profiler.disable()
+            duration_ms = (time.perf_counter() - started) * 1000
+            path = self._path(profile_id, ".prof")
+            profiler.dump_stats(str(path))
+            buffer = io.StringIO()
+            pstats.Stats(profiler, stream=buffer).sort_stats("cumulative").print_stats(self.config.summary_lines)
+            summary = buffer.getvalue()
+
+        with self._lock:
+            self._stats["profiled"] += 1
+        self._prune()
+        print(f"请求分析完成：{profile_id}（{PROFILER_BACKEND}，{duration_ms:.1f}ms）")
+
+        lines = [line for line in summary.splitlines() if line.strip()]
+        return result, {
+            "id": profile_id,
+            "backend": PROFILER_BACKEND,
+            "duration_ms": round(duration_ms, 2),
+            "summary": lines[:self.config.summary_lines]
+        }
+
+    def _path(self, profile_id: str, suffix: str) -> Path:
+        """分析结果文件路径"""
+        output_dir = Path(self.config.output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        return output_dir / f"{profile_id}{suffix}"
+
+    def _write(self, profile_id: str, suffix: str, content: str):
+        """写入分析结果"""
+        self._path(profile_id, suffix).write_text(content, encoding="utf-8")
+
+    def _prune(self):
+        """超出数量上限时删除最早的分析结果"""
+        files = sorted(Path(self.config.output_dir).glob("*.*"), key=lambda p: p.stat().st_mtime)
+        for path in files[:max(0, len(files) - self.config.max_profiles)]:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def find(self, profile_id: str) -> Optional[Path]:
+        """按 ID 查找分析结果文件"""
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        for suffix in (".html", ".prof"):
+            path = Path(self.config.output_dir) / f"{profile_id}{suffix}"
+            if path.exists():
+                return path
+        return None
+
+    def list_profiles(self) -> List[Dict]:
+        """列出保存的分析结果（最新的在前）"""
+        output_dir = Path(self.config.output_dir)
+        if not output_dir.exists():
+            return []
+        files = sorted(output_dir.glob("*.*"), key=lambda p: p.stat().st_mtime, reverse=True)
+        return [
+            {"id": path.stem, "format": path.suffix.lstrip("."), "size_bytes": path.stat().st_size,
+             "created_at": path.stat().st_mtime}
+            for path in files if PROFILE_ID_PATTERN.match(path.stem)
+        ]
+
+    def get_stats(self) -> Dict:
+        """获取分析统计信息"""
+        with self._lock:
+            return {
+                "enabled": self.config.enabled,
+                "backend": PROFILER_BACKEND,
+                "sample_rate": self.config.sample_rate,
+                **self._stats
+            }
+
+
+# 全局请求分析器实例（延迟初始化）
+_request_profiler: Optional[RequestProfiler] = None
+
+
+def get_request_profiler(config: Optional[ProfilingConfig] = None) -> RequestProfiler:
+    """获取或创建全局请求分析器实例"""
+    global _request_profiler
+    if _request_profiler is None:
+        _request_profiler = RequestProfiler(config)
+    return _request_profiler
@@ -0,0 +1,208 @@
+"""
+检测结果缓存模块
+
+按上传内容缓存单张图片的检测结果：
+- 缓存键由原始上传字节的 BLAKE2b 哈希、类别 ID、置信度阈值和模型标识组成
+- LRU + TTL 淘汰，同时限制条目数和估算内存占用
+- 单飞 (single-flight)：并发到达的相同请求共享一次推理
+"""
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+@dataclass
+class ResultCacheConfig:
+    """结果缓存配置"""
+    enabled: bool = True
+    max_entries: int = 512
+    ttl_seconds: float = 30.0
+    max_memory_mb: float = 128.0
+
+
+@dataclass
+class _CacheEntry:
+    """缓存条目"""
+    value: Dict
+    expires_at: float
+    size_bytes: int
+
+
+def estimate_result_size(result: Dict) -> int:
+    """粗略估算检测结果占用的内存（字节），标注图像按 data URL 字符串长度计算"""
+    size = 512
+    annotated = result.get("annotated_image")
+    if isinstance(annotated, (str, bytes)):
+        size += len(annotated)
+    size += 256 * int(result.get("object_count", 0))
+    return size
+
+
+class ResultCache:
+    """
+    LRU + TTL 检测结果缓存
+
+    只在事件循环线程中使用，不需要加锁
+    """
+
+    def __init__(self, config: Optional[ResultCacheConfig] = None):
+        """
+        初始化结果缓存
+
+        Args:
+            config: 结果缓存配置
+        """
+        self.config = config or ResultCacheConfig()
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._memory_bytes = 0
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+    @staticmethod
+    def make_key(
+        contents: bytes,
+        class_ids: Optional[List[int]],
+        conf_threshold: float,
+        model_id: str,
+        return_annotated: bool = True
+    ) -> str:
+        """
+        生成缓存键
+
+        Args:
+            contents: 原始上传字节
+            class_ids: 解析后的类别 ID
+            conf_threshold: 置信度阈值
+            model_id: 模型标识
+            return_annotated: 是否包含标注图像
+
+        Returns:
+            缓存键
+        """
+        digest = hashlib.blake2b(contents, digest_size=16).hexdigest()
+        classes_key = ",".join(str(c) for c in sorted(set(class_ids))) if class_ids else "*"
+        return f"{model_id}|{digest}|{classes_key}|{round(float(conf_threshold), 3)}|{int(bool(return_annotated))}"
+
+    def _get(self, key: str) -> Optional[Dict]:
+        """查找未过期的缓存条目，命中时移到 LRU 末尾"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.time():
+            self._remove(key)
+            self._stats["expirations"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry.value
+
+    def _put(self, key: str, value: Dict):
+        """写入缓存条目，超出条目数或内存上限时淘汰最久未使用的条目"""
+        size = estimate_result_size(value)
+        max_bytes = self.config.max_memory_mb * 1024 * 1024
+        if size > max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = _CacheEntry(value, time.time() + self.config.ttl_seconds, size)
+        self._memory_bytes += size
+
+        while self._entries and (
+            len(self._entries) > self.config.max_entries or self._memory_bytes > max_bytes
+        ):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._stats["evictions"] += 1
+
+    def _remove(self, key: str):
+        """删除缓存条目"""
+        entry = self._entries.pop(key)
+        self._memory_bytes -= entry.size_bytes
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Dict]]
+    ) -> Tuple[Dict, str]:
+        """
+        返回缓存结果；未命中时执行 compute，相同键的并发请求共享同一次计算
+
+        Args:
+            key: 缓存键
+            compute: 计算检测结果的协程函数
+
+        Returns:
+            (检测结果, 缓存状态："hit" / "miss" / "coalesced")
+        """
+        if not self.config.enabled:
+            return await compute(), "miss"
+
+        cached = self._get(key)
+        if cached is not None:
+            self._stats["hits"] += 1
+            return cached, "hit"
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._stats["coalesced"] += 1
+            # shield：某个调用方断开时不取消共享的计算
+            return await asyncio.shield(inflight), "coalesced"
+
+        self._stats["misses"] += 1
+        task = asyncio.ensure_future(self._compute_and_store(key, compute))
+        self._inflight[key] = task
+        return await asyncio.shield(task), "miss"
+
+    async def _compute_and_store(self, key: str, compute: Callable[[], Awaitable[Dict]]) -> Dict:
+        """执行计算，成功时写入缓存（失败不缓存）"""
+        try:
+            value = await compute()
+            self._put(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def clear(self):
+        """清空缓存"""
+        self._entries.clear()
+        self._memory_bytes = 0
+
+    def get_stats(self) -> Dict:
+        """获取缓存统计信息"""
+        lookups = self._stats["hits"] + self._stats["misses"] + self._stats["coalesced"]
+        return {
+            "enabled": self.config.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.config.max_entries,
+            "ttl_seconds": self.config.ttl_seconds,
+            "memory_mb": round(self._memory_bytes / (1024 * 1024), 2),
+            "max_memory_mb": self.config.max_memory_mb,
+            "inflight": len(self._inflight),
+            **self._stats,
+            "hit_rate": (
+                round((self._stats["hits"] + self._stats["coalesced"]) / lookups, 3)
+                if lookups > 0 else 0
+            )
+        }
+
+
+# 全局结果缓存实例（延迟初始化）
+_result_cache: Optional[ResultCache] = None
+
+
+def get_result_cache(config: Optional[ResultCacheConfig] = None) -> ResultCache:
+    """获取或创建全局结果缓存实例"""
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = ResultCache(config)
+    return _result_cache
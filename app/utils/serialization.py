@@ -0,0 +1,99 @@
+"""
+结果序列化模块
+
+提供检测结果的紧凑格式和快速序列化：
+- 列式 (columnar) 结果的类别名称表，只发送一次
+- 根据 Accept 头进行内容协商：MessagePack / orjson / 标准 JSON
+- orjson 和 msgpack 已列入 requirements.txt；未安装时自动回退到标准 JSON，/health 报告实际可用的序列化器
+"""
+
+import json
+from typing import Any, Dict, Iterable
+
+import numpy as np
+from fastapi import Request
+from fastapi.responses import Response
+
+from app.models.detector import COCO_CLASSES
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+RESULT_FORMATS = ("objects", "columnar")
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def build_class_table(class_ids: Iterable[int]) -> Dict[str, str]:
+    """构建类别名称表（类别 ID → 名称），列式结果中只发送一次"""
+    return {
+        str(class_id): COCO_CLASSES.get(class_id, f'unknown_{class_id}')
+        for class_id in sorted(set(int(c) for c in class_ids))
+    }
+
+
+def _default(obj: Any) -> Any:
+    """序列化 NumPy 类型"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+def get_serializer_info() -> Dict[str, Any]:
+    """实际可用的序列化器（orjson / msgpack 未安装时回退或不可用）"""
+    return {
+        "json": "orjson" if orjson is not None else "json",
+        "msgpack": msgpack is not None
+    }
+
+
+def dumps_json(content: Any) -> bytes:
+    """使用最快的可用 JSON 编码器序列化"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_msgpack(content: Any) -> bytes:
+    """序列化为 MessagePack"""
+    return msgpack.packb(content, default=_default, use_bin_type=True)
+
+
+def wants_msgpack(request: Request) -> bool:
+    """判断客户端是否通过 Accept 头请求 MessagePack"""
+    accept = request.headers.get("accept", "")
+    return any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES)
+
+
+def negotiated_response(request: Request, content: Any, status_code: int = 200) -> Response:
+    """
+    根据 Accept 头选择序列化方式并构建响应
+
+    Args:
+        request: 当前请求
+        content: 响应内容
+        status_code: HTTP 状态码
+
+    Returns:
+        MessagePack 响应（客户端请求且已安装 msgpack 时），否则为 JSON 响应
+    """
+    if msgpack is not None and wants_msgpack(request):
+        return Response(
+            content=dumps_msgpack(content),
+            status_code=status_code,
+            media_type="application/msgpack"
+        )
+    return Response(
+        content=dumps_json(content),
+        status_code=status_code,
+        media_type="application/json"
+    )
@@ -0,0 +1,338 @@
+"""
+视频流水线模块
+
+把视频处理拆成三个相互重叠的阶段：
+- 解码线程：按帧间隔读取/跳过视频帧，放入有界队列
+- 推理阶段：在调用方线程中按批取帧并执行跟踪
+- 标注/编码线程：绘制标注、缩放、转换颜色并写入输出视频
+
+OpenCV 解码和 x264 编码都会释放 GIL，三个阶段可以在多核上并行执行。
+各阶段的忙碌时间会被统计，用于计算利用率；提供 stage_observer 时逐帧上报解码、跟踪、标注和编码耗时。
+
+提供帧环形缓冲区时，解码直接写入预分配的帧槽（cap.read(image=slot)），
+标注直接绘制在帧槽上，帧槽在颜色转换完成后归还，缩放和颜色转换也写入复用的缓冲区，热路径上不再逐帧分配内存。
+"""
+
+import queue
+import threading
+import time
+import traceback
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.utils.frame_ring import FrameRingBuffer
+from app.utils.metrics import STAGE_ANNOTATE, STAGE_DECODE, STAGE_ENCODE, STAGE_TRACK
+
+# 队列结束标记
+_END = object()
+
+# 解码阶段产出的帧：(帧号, 帧)，被跳过的帧为 (帧号, None)
+DecodedFrame = Tuple[int, Optional[np.ndarray]]
+
+
+class StageStats:
+    """单个阶段的忙碌/等待时间统计"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy_time = 0.0
+        self.wait_time = 0.0
+
+    def to_dict(self, wall_time: float) -> Dict:
+        """转换为统计字典"""
+        return {
+            "items": self.items,
+            "busy_ms": round(self.busy_time * 1000, 2),
+            "wait_ms": round(self.wait_time * 1000, 2),
+            "utilization": round(self.busy_time / wall_time, 3) if wall_time > 0 else 0
+        }
+
+
+class VideoPipeline:
+    """
+    解码 → 推理 → 标注/编码 三阶段视频流水线
+
+    解码和编码各自运行在后台线程中，推理由调用方通过 iter_batches / submit_annotation 驱动
+    """
+
+    def __init__(
+        self,
+        cap: cv2.VideoCapture,
+        frame_interval: int = 1,
+        writer=None,
+        width: int = 0,
+        height: int = 0,
+        annotate_fn: Optional[Callable] = None,
+        queue_size: int = 32,
+        frame_ring: Optional[FrameRingBuffer] = None,
+        stage_observer: Optional[Callable[[str, float], None]] = None
+    ):
+        """
+        初始化视频流水线
+
+        Args:
+            cap: 已打开的视频读取器
+            frame_interval: 帧处理间隔，其余帧只 grab 不解码
+            writer: imageio 视频写入器，为 None 时不启动编码线程
+            width: 输出视频宽度
+            height: 输出视频高度
+            annotate_fn: 将推理结果绘制为 BGR 图像的函数
+            queue_size: 阶段之间队列的最大长度
+            frame_ring: 帧环形缓冲区，槽位数至少为每批推理帧数 + 1；为 None 时每帧分配新数组
+            stage_observer: 阶段耗时回调，参数为 (阶段名称, 单帧耗时秒数)，在各阶段所在线程中调用
+        """
+        self.cap = cap
+        self.frame_interval = max(1, int(frame_interval))
+        self.writer = writer
+        self.width = width
+        self.height = height
+        self.annotate_fn = annotate_fn
+        self.frame_ring = frame_ring
+        self.stage_observer = stage_observer
+        self._frame_slots: Dict[int, int] = {}
+        self._resize_buffer: Optional[np.ndarray] = None
+        self._rgb_buffer: Optional[np.ndarray] = None
+        self.ring_fallbacks = 0
+
+        self._decode_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._encode_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._decode_error: Optional[BaseException] = None
+
+        self.decode_stats = StageStats("decode")
+        self.inference_stats = StageStats("inference")
+        self.encode_stats = StageStats("encode")
+        self.frames_read = 0
+        self.frames_written = 0
+
+        self._decoder = threading.Thread(target=self._decode_loop, name="video-decode", daemon=True)
+        self._encoder = None
+        if writer is not None:
+            self._encoder = threading.Thread(target=self._encode_loop, name="video-encode", daemon=True)
+        self._started_at = 0.0
+        self._finished_at = 0.0
+
+    def start(self):
+        """启动解码和编码线程"""
+        self._started_at = time.time()
+        self._decoder.start()
+        if self._encoder is not None:
+            self._encoder.start()
+
+    def _observe(self, stage: str, seconds: float):
+        """上报一帧的阶段耗时，回调出错不影响视频处理"""
+        if self.stage_observer is None:
+            return
+        try:
+            self.stage_observer(stage, seconds)
+        except Exception as e:
+            print(f"阶段耗时上报失败：{e}")
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        """向有界队列放入数据，流水线停止时放弃"""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _decode_loop(self):
+        """解码线程：按帧间隔读取视频帧"""
+        frame_index = 0
+        try:
+            while not self._stop.is_set():
+                started = time.time()
+                if frame_index % self.frame_interval == 0:
+                    ret, frame = self._read_frame(frame_index)
+                else:
+                    # 只 grab 不 retrieve，省去像素格式转换和拷贝
+                    ret, frame = self.cap.grab(), None
+                elapsed = time.time() - started
+                self.decode_stats.busy_time += elapsed
+                if not ret:
+                    break
+                if frame is not None:
+                    self._observe(STAGE_DECODE, elapsed)
+
+                self.decode_stats.items += 1
+                started = time.time()
+                if not self._put(self._decode_queue, (frame_index, frame)):
+                    break
+                self.decode_stats.wait_time += time.time() - started
+                frame_index += 1
+        except BaseException as e:
+            self._decode_error = e
+        finally:
+            self.frames_read = frame_index
+            self._put(self._decode_queue, _END)
+
+    def _read_frame(self, frame_index: int) -> Tuple[bool, Optional[np.ndarray]]:
+        """读取一帧，有帧环形缓冲区时直接解码到空闲槽位"""
+        if self.frame_ring is None:
+            return self.cap.read()
+
+        slot = self.frame_ring.acquire(self._stop)
+        if slot is None:
+            return False, None
+        view = self.frame_ring.slot(slot)
+        ret, frame = self.cap.read(image=view)
+        if ret and frame is not None and frame.ctypes.data == view.ctypes.data:
+            self._frame_slots[frame_index] = slot
+            return ret, frame
+
+        # 实际帧尺寸与槽位不一致时 OpenCV 会分配新数组，归还槽位并使用该数组
+        self.frame_ring.release(slot)
+        if ret:
+            self.ring_fallbacks += 1
+        return ret, frame
+
+    def _release_frame(self, frame_index: int):
+        """帧处理完成后归还其占用的槽位"""
+        slot = self._frame_slots.pop(frame_index, None)
+        if slot is not None:
+            self.frame_ring.release(slot)
+
+    def iter_batches(self, batch_size: int) -> Iterator[List[DecodedFrame]]:
+        """
+        按批取出解码后的帧
+
+        每批最多包含 batch_size 个需要推理的帧，以及夹在其间被跳过的帧，顺序与视频一致
+
+        Args:
+            batch_size: 每批需要推理的帧数
+
+        Yields:
+            [(帧号, 帧或 None), ...]
+        """
+        batch_size = max(1, int(batch_size))
+        pending: List[DecodedFrame] = []
+        decoded = 0
+        while True:
+            started = time.time()
+            item = self._decode_queue.get()
+            self.inference_stats.wait_time += time.time() - started
+
+            if item is _END:
+                if self._decode_error is not None:
+                    raise self._decode_error
+                break
+
+            pending.append(item)
+            if item[1] is not None:
+                decoded += 1
+            if decoded >= batch_size:
+                yield pending
+                pending, decoded = [], 0
+
+        if pending:
+            yield pending
+
+    def record_inference(self, seconds: float, items: int):
+        """记录推理阶段的忙碌时间，按帧平均上报跟踪耗时"""
+        self.inference_stats.busy_time += seconds
+        self.inference_stats.items += items
+        if items > 0:
+            for _ in range(items):
+                self._observe(STAGE_TRACK, seconds / items)
+
+    def submit_annotation(self, frame_index: int, result=None):
+        """
+        把一帧交给标注/编码线程
+
+        Args:
+            frame_index: 帧号
+            result: 推理结果，为 None 表示跳过的帧（沿用上一帧的标注画面）
+        """
+        if self._encoder is None:
+            self._release_frame(frame_index)
+            return
+        started = time.time()
+        self._put(self._encode_queue, (frame_index, result))
+        self.inference_stats.wait_time += time.time() - started
+
+    def _encode_loop(self):
+        """标注/编码线程：绘制、缩放、转换颜色并写入视频"""
+        last_rgb = None
+        while True:
+            started = time.time()
+            item = self._encode_queue.get()
+            self.encode_stats.wait_time += time.time() - started
+            if item is _END:
+                break
+
+            frame_index, result = item
+            started = time.time()
+            try:
+                if result is not None:
+                    # 标注直接画在帧槽上，颜色转换写入独立缓冲区之后帧槽才能复用
+                    annotated = self.annotate_fn(result)
+                    annotated_at = time.time()
+                    self._observe(STAGE_ANNOTATE, annotated_at - started)
+                    if annotated.shape[1] != self.width or annotated.shape[0] != self.height:
+                        if self._resize_buffer is None:
+                            self._resize_buffer = np.empty((self.height, self.width, 3), dtype=np.uint8)
+                        annotated = cv2.resize(annotated, (self.width, self.height), dst=self._resize_buffer)
+                    if self._rgb_buffer is None or self._rgb_buffer.shape != annotated.shape:
+                        self._rgb_buffer = np.empty_like(annotated)
+                    # 写入器逐帧同步写出，颜色转换结果可以复用同一缓冲区
+                    last_rgb = cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB, dst=self._rgb_buffer)
+                    self._release_frame(frame_index)
+
+                if last_rgb is not None:
+                    self.writer.append_data(last_rgb)
+                    self.frames_written += 1
+                    if result is not None:
+                        # 缩放、颜色转换和写入计为编码；跳过的帧只重复写入上一帧，不计入
+                        self._observe(STAGE_ENCODE, time.time() - annotated_at)
+                    if self.frames_written % 30 == 0:
+                        print(f"已写入 {self.frames_written} 帧")
+            except Exception as e:
+                print(f"写入帧 {frame_index} 失败：{e}")
+                traceback.print_exc()
+            finally:
+                self._release_frame(frame_index)
+                self.encode_stats.busy_time += time.time() - started
+                self.encode_stats.items += 1
+
+    def close(self):
+        """
+        结束流水线：通知编码线程写完剩余帧，停止解码线程并等待线程退出
+        """
+        if self._encoder is not None and self._encoder.is_alive():
+            self._put(self._encode_queue, _END)
+            self._encoder.join()
+
+        self._stop.set()
+        # 清空解码队列，让阻塞在 put 上的解码线程退出
+        while self._decoder.is_alive():
+            try:
+                self._decode_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        # 归还未走完流水线的帧占用的槽位
+        for frame_index in list(self._frame_slots):
+            self._release_frame(frame_index)
+        self._finished_at = time.time()
+
+    def get_stats(self) -> Dict:
+        """获取各阶段的利用率统计"""
+        end = self._finished_at or time.time()
+        wall_time = end - self._started_at if self._started_at else 0.0
+        stages = {
+            "decode": self.decode_stats.to_dict(wall_time),
+            "inference": self.inference_stats.to_dict(wall_time)
+        }
+        if self._encoder is not None:
+            stages["encode"] = self.encode_stats.to_dict(wall_time)
+        stats = {
+            "wall_time_ms": round(wall_time * 1000, 2),
+            "stages": stages
+        }
+        if self.frame_ring is not None:
+            stats["frame_ring"] = {**self.frame_ring.get_stats(), "fallbacks": self.ring_fallbacks}
+        return stats
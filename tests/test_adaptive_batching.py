@@ -0,0 +1,78 @@
+"""自适应批大小控制器测试"""
+
+from app.utils.batch_processor import AdaptiveBatchController
+
+
+def test_latency_above_target_shrinks_proportionally():
+    controller = AdaptiveBatchController(8, target_latency_ms=100, probe_batches=1)
+
+    controller.record(8, 0.2)
+
+    assert controller.batch_size == 4
+
+
+def test_latency_well_below_target_grows_by_one():
+    controller = AdaptiveBatchController(4, target_latency_ms=100, probe_batches=1)
+
+    controller.record(4, 0.05)
+
+    assert controller.batch_size == 5
+
+
+def test_latency_mode_respects_bounds():
+    controller = AdaptiveBatchController(2, min_batch_size=2, max_batch_size=2, target_latency_ms=100, probe_batches=1)
+
+    controller.record(2, 1.0)
+    assert controller.batch_size == 2
+    controller.record(2, 0.01)
+    assert controller.batch_size == 2
+
+
+def test_decisions_wait_for_probe_batches():
+    controller = AdaptiveBatchController(8, target_latency_ms=100, probe_batches=3)
+
+    controller.record(8, 0.2)
+    controller.record(8, 0.2)
+    assert controller.batch_size == 8
+    controller.record(8, 0.2)
+    assert controller.batch_size == 4
+
+
+def test_partial_batches_only_update_statistics():
+    controller = AdaptiveBatchController(8, target_latency_ms=100, probe_batches=1)
+
+    controller.record(3, 1.0)
+
+    assert controller.batch_size == 8
+    stats = controller.get_stats()
+    assert stats["batches"] == 1
+    assert stats["latency_ms_by_batch_size"] == {3: 1000.0}
+
+
+def test_throughput_mode_climbs_and_reverses():
+    controller = AdaptiveBatchController(4, probe_batches=1)
+
+    controller.record(4, 0.04)  # 100 张/秒，继续增大
+    assert controller.batch_size == 5
+    controller.record(5, 0.1)  # 50 张/秒，不如 4，退回并反向
+    assert controller.batch_size == 4
+    controller.record(4, 0.04)  # 沿新方向继续试探
+    assert controller.batch_size == 3
+    assert controller.get_stats()["adjustments"] == 3
+
+
+def test_throughput_mode_turns_around_at_the_limit():
+    controller = AdaptiveBatchController(32, max_batch_size=32, probe_batches=1)
+
+    controller.record(32, 0.32)
+
+    assert controller.batch_size == 31
+
+
+def test_memory_limit_caps_next_batch_size():
+    controller = AdaptiveBatchController(16)
+
+    assert controller.next_batch_size(memory_limit=4) == 4
+    assert controller.next_batch_size(memory_limit=64) == 16
+    assert controller.next_batch_size(memory_limit=0) == 1
+    assert controller.get_stats()["memory_limited"] == 2
@@ -0,0 +1,93 @@
+"""基准测试对比和回归退出码测试"""
+
+import json
+import sys
+
+import pytest
+
+from app.benchmarks import runner
+from app.benchmarks.runner import compare_reports
+
+
+def _report(images_per_second: float, p50_ms: float, p95_ms: float, peak_rss_mb: float, **config) -> dict:
+    return {
+        "config": {"batch_size": 8, **config},
+        "scenarios": {
+            "process_batch": {
+                "images_per_second": images_per_second,
+                "p50_ms": p50_ms,
+                "p95_ms": p95_ms,
+                "peak_rss_mb": peak_rss_mb
+            }
+        }
+    }
+
+
+BASELINE = _report(100.0, 10.0, 20.0, 500.0)
+
+
+def test_changes_within_tolerance_are_not_regressions():
+    current = _report(95.0, 10.5, 21.0, 520.0)
+
+    comparison = compare_reports(current, BASELINE, tolerance=0.1)
+
+    assert comparison["regressions"] == []
+    metrics = comparison["scenarios"]["process_batch"]
+    assert metrics["images_per_second"]["change"] == -0.05
+    assert not any(metric["regressed"] for metric in metrics.values())
+
+
+def test_regressions_respect_metric_direction():
+    # 吞吐量下降、延迟上升算回归；吞吐量上升、延迟下降不算
+    current = _report(80.0, 8.0, 25.0, 500.0)
+
+    comparison = compare_reports(current, BASELINE, tolerance=0.1)
+
+    assert comparison["regressions"] == ["process_batch.images_per_second", "process_batch.p95_ms"]
+    assert not comparison["scenarios"]["process_batch"]["p50_ms"]["regressed"]
+
+
+def test_rss_tolerance_is_separate_and_config_diff_is_reported():
+    current = _report(100.0, 10.0, 20.0, 600.0, batch_size=16)
+
+    loose = compare_reports(current, BASELINE, tolerance=0.1, rss_tolerance=0.5)
+    strict = compare_reports(current, BASELINE, tolerance=0.1)
+
+    assert loose["regressions"] == []
+    assert strict["regressions"] == ["process_batch.peak_rss_mb"]
+    assert strict["config_diff"] == {"batch_size": {"baseline": 8, "current": 16}}
+
+
+def test_scenarios_missing_from_baseline_are_skipped():
+    current = _report(50.0, 30.0, 60.0, 900.0)
+    current["scenarios"]["detect_objects"] = current["scenarios"].pop("process_batch")
+
+    comparison = compare_reports(current, BASELINE)
+
+    assert comparison["scenarios"] == {}
+    assert comparison["regressions"] == []
+
+
+def _run_main(monkeypatch, tmp_path, current: dict):
+    baseline_path = tmp_path / "baseline.json"
+    baseline_path.write_text(json.dumps(BASELINE), encoding="utf-8")
+    monkeypatch.setattr(runner, "run_benchmarks", lambda *args, **kwargs: json.loads(json.dumps(current)))
+    monkeypatch.setattr(sys, "argv", ["benchmark", "--scenarios", "process_batch", "--compare", str(baseline_path)])
+    # main 会设置这两个环境变量，测试结束后还原
+    monkeypatch.setenv("CUDA_VISIBLE_DEVICES", "")
+    monkeypatch.setenv("YOLO_OFFLINE", "true")
+    runner.main()
+
+
+def test_main_exits_nonzero_on_regression(monkeypatch, tmp_path, capsys):
+    with pytest.raises(SystemExit) as exc_info:
+        _run_main(monkeypatch, tmp_path, _report(50.0, 10.0, 20.0, 500.0))
+
+    assert exc_info.value.code == 1
+    assert "process_batch.images_per_second" in capsys.readouterr().out
+
+
+def test_main_returns_normally_without_regression(monkeypatch, tmp_path, capsys):
+    _run_main(monkeypatch, tmp_path, _report(100.0, 10.0, 20.0, 500.0))
+
+    assert "未发现性能回归" in capsys.readouterr().out
@@ -0,0 +1,79 @@
+"""WebSocket 检测结果协议测试"""
+
+from app.utils.detection_protocol import (
+    BINARY_MAGIC, BINARY_VERSION, BOX_STRUCT, HEADER_STRUCT,
+    encode_detections_binary, encode_detections_json
+)
+
+
+def _result(objects):
+    return {
+        "objects": objects,
+        "image_shape": {"height": 480, "width": 640},
+        "inference_time_ms": 12.5
+    }
+
+
+def _object(x1, y1, x2, y2, class_id, confidence):
+    return {
+        "bbox": {"x1": x1, "y1": y1, "x2": x2, "y2": y2},
+        "class_id": class_id,
+        "confidence": confidence
+    }
+
+
+def _decode_binary(payload: bytes):
+    magic, version, _, count, seq, width, height, inference_ms = HEADER_STRUCT.unpack_from(payload)
+    boxes = [
+        BOX_STRUCT.unpack_from(payload, HEADER_STRUCT.size + i * BOX_STRUCT.size)
+        for i in range(count)
+    ]
+    return magic, version, seq, width, height, inference_ms, boxes
+
+
+def test_binary_round_trip():
+    payload = encode_detections_binary(_result([
+        _object(10, 20, 110, 220, 0, 0.9),
+        _object(300, 40, 400, 140, 2, 0.5)
+    ]), seq=7)
+
+    assert len(payload) == HEADER_STRUCT.size + 2 * BOX_STRUCT.size
+    magic, version, seq, width, height, inference_ms, boxes = _decode_binary(payload)
+    assert magic == BINARY_MAGIC
+    assert version == BINARY_VERSION
+    assert (seq, width, height) == (7, 640, 480)
+    assert inference_ms == 12.5
+    assert boxes == [(10, 20, 110, 220, 0, 230), (300, 40, 400, 140, 2, 128)]
+
+
+def test_binary_clips_out_of_range_values():
+    payload = encode_detections_binary(_result([_object(-5, 10, 70000, 20, 300, 1.5)]), seq=2 ** 32 + 3)
+
+    _, _, seq, _, _, _, boxes = _decode_binary(payload)
+    assert seq == 3
+    assert boxes == [(0, 10, 0xFFFF, 20, 300 & 0xFF, 255)]
+
+
+def test_binary_without_detections_is_header_only():
+    payload = encode_detections_binary(_result([]), seq=1)
+
+    assert len(payload) == HEADER_STRUCT.size
+    assert _decode_binary(payload)[-1] == []
+
+
+def test_json_flattens_boxes():
+    payload = encode_detections_json(_result([
+        _object(1, 2, 3, 4, 5, 0.6),
+        _object(5, 6, 7, 8, 9, 0.7)
+    ]), seq=3)
+
+    assert payload == {
+        "type": "detections",
+        "seq": 3,
+        "width": 640,
+        "height": 480,
+        "inference_time_ms": 12.5,
+        "boxes": [1, 2, 3, 4, 5, 6, 7, 8],
+        "class_ids": [5, 9],
+        "scores": [0.6, 0.7]
+    }
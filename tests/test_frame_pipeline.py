@@ -0,0 +1,71 @@
+"""最新帧优先缓冲区测试"""
+
+import asyncio
+
+from app.utils.frame_pipeline import LatestFrameSlot
+
+
+def test_newer_frame_replaces_unprocessed_one():
+    async def scenario():
+        slot = LatestFrameSlot()
+        slot.put(b"first")
+        slot.put(b"second")
+        return slot, await slot.get()
+
+    slot, (data, _, seq) = asyncio.run(scenario())
+
+    assert data == b"second"
+    assert seq == 2
+    stats = slot.get_stats()
+    assert stats["received"] == 2
+    assert stats["dropped"] == 1
+
+
+def test_get_waits_for_next_frame():
+    async def scenario():
+        slot = LatestFrameSlot()
+        waiter = asyncio.ensure_future(slot.get())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        slot.put(b"frame")
+        return await asyncio.wait_for(waiter, 1)
+
+    data, _, seq = asyncio.run(scenario())
+
+    assert data == b"frame"
+    assert seq == 1
+
+
+def test_close_wakes_waiter_and_drains_remaining_frame():
+    async def scenario():
+        slot = LatestFrameSlot()
+        waiter = asyncio.ensure_future(slot.get())
+        await asyncio.sleep(0)
+        slot.close()
+        empty = await asyncio.wait_for(waiter, 1)
+
+        slot = LatestFrameSlot()
+        slot.put(b"last")
+        slot.close()
+        return empty, await slot.get(), await slot.get()
+
+    empty, remaining, after = asyncio.run(scenario())
+
+    assert empty is None
+    assert remaining[0] == b"last"
+    assert after is None
+
+
+def test_stats_track_processed_frames():
+    async def scenario():
+        slot = LatestFrameSlot()
+        slot.put(b"frame")
+        _, received_at, _ = await slot.get()
+        slot.mark_processed(received_at)
+        return slot.get_stats()
+
+    stats = asyncio.run(scenario())
+
+    assert stats["processed"] == 1
+    assert stats["dropped"] == 0
+    assert stats["avg_latency_ms"] >= 0
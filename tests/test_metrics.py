@@ -0,0 +1,79 @@
+"""Prometheus 指标导出测试"""
+
+from app.utils.metrics import Counter, Gauge, Histogram, Metrics, STAGE_DECODE
+
+
+def _samples(text: str):
+    """解析指标文本中的样本行：{(名称及标签): 值}"""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = value
+    return samples
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency", ("endpoint",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value, endpoint="/detect")
+
+    samples = _samples("\n".join(histogram.render()))
+
+    assert samples['latency_seconds_bucket{endpoint="/detect",le="0.1"}'] == "2"
+    assert samples['latency_seconds_bucket{endpoint="/detect",le="1"}'] == "3"
+    assert samples['latency_seconds_bucket{endpoint="/detect",le="+Inf"}'] == "4"
+    assert samples['latency_seconds_count{endpoint="/detect"}'] == "4"
+    assert float(samples['latency_seconds_sum{endpoint="/detect"}']) == 2.65
+
+
+def test_render_headers_and_label_escaping():
+    counter = Counter("requests_total", "Requests", ("path",))
+    counter.inc(path='a"b\\c\nd')
+
+    lines = counter.render()
+
+    assert lines[:2] == ["# HELP requests_total Requests", "# TYPE requests_total counter"]
+    assert lines[2] == 'requests_total{path="a\\"b\\\\c\\nd"} 1'
+
+
+def test_gauge_goes_up_and_down():
+    gauge = Gauge("in_flight", "In flight", ("method",))
+    gauge.inc(method="GET")
+    gauge.inc(method="GET")
+    gauge.dec(method="GET")
+
+    lines = gauge.render()
+
+    assert lines[1] == "# TYPE in_flight gauge"
+    assert lines[2] == 'in_flight{method="GET"} 1'
+
+
+def test_observe_result_records_speed_stages_in_seconds():
+    metrics = Metrics()
+    metrics.observe_result({"speed": {"inference": 40.0, "preprocess": None}}, "/detect", "yolov8n")
+
+    samples = _samples(metrics.render())
+
+    assert samples['yolo_stage_duration_seconds_count{stage="inference",endpoint="/detect",model="yolov8n"}'] == "1"
+    assert float(samples['yolo_stage_duration_seconds_sum{stage="inference",endpoint="/detect",model="yolov8n"}']) == 0.04
+    assert not any('stage="preprocess"' in name for name in samples)
+    assert samples['yolo_images_processed_total{endpoint="/detect",model="yolov8n"}'] == "1"
+
+
+def test_collectors_are_sampled_at_render_time_and_failures_are_skipped():
+    metrics = Metrics()
+    depth = {"value": 3}
+    metrics.add_collector(lambda: [("queue_depth", "Queue depth", {"queue": "inference"}, depth["value"])])
+    metrics.add_collector(lambda: 1 / 0)
+    metrics.observe_stage(STAGE_DECODE, 0.01, "/detect")
+
+    first = _samples(metrics.render())
+    depth["value"] = 5
+    text = metrics.render()
+
+    assert first['queue_depth{queue="inference"}'] == "3"
+    assert _samples(text)['queue_depth{queue="inference"}'] == "5"
+    assert text.count("# TYPE queue_depth gauge") == 1
+    assert "yolo_uptime_seconds" in text
+    assert text.endswith("\n")
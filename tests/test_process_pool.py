@@ -0,0 +1,53 @@
+"""进程池推理端到端测试（模拟后端，不需要模型权重）"""
+
+import numpy as np
+import pytest
+
+import app.models.detector as detector_module
+from app.models.detector import ObjectsDetector
+from app.utils.batch_processor import BatchConfig, BatchProcessor
+from app.utils.process_pool import shutdown_process_pools
+
+
+@pytest.fixture
+def processor(monkeypatch):
+    # 当前进程的检测器在导入时已读取推理后端，直接替换；spawn 的工作进程重新导入，从环境变量读取
+    monkeypatch.setattr(detector_module, "DEFAULT_BACKEND", "mock")
+    monkeypatch.setenv("YOLO_BACKEND", "mock")
+    detector = ObjectsDetector()
+    detector.load_model()
+    yield BatchProcessor(detector, BatchConfig(batch_size=4, execution_mode="process", process_workers=2))
+    shutdown_process_pools()
+
+
+def _images():
+    rng = np.random.default_rng(0)
+    shapes = [(480, 640), (480, 640), (640, 480), (360, 640), (480, 640), (640, 480), (720, 1280)]
+    return [rng.integers(0, 255, (h, w, 3), dtype=np.uint8) for h, w in shapes]
+
+
+def test_process_mode_returns_ordered_results(processor):
+    images = _images()
+    originals = [image.copy() for image in images]
+
+    results = processor.process_batch(images, return_annotated=True)
+
+    assert len(results) == len(images)
+    for image, original, result in zip(images, originals, results):
+        assert result["success"], result.get("error")
+        assert result["image_shape"] == {"height": image.shape[0], "width": image.shape[1]}
+        assert result["object_count"] > 0
+        annotated = result["annotated_image"]
+        assert annotated.shape == image.shape
+        assert not np.array_equal(annotated, original)
+        # 标注绘制在共享内存中的副本上，调用方的输入不变
+        assert np.array_equal(image, original)
+
+
+def test_process_mode_matches_thread_mode(processor):
+    images = _images()
+
+    process_results = processor.process_batch(images)
+    thread_results = BatchProcessor(processor.detector, BatchConfig(batch_size=4)).process_batch(images)
+
+    assert [r["objects"] for r in process_results] == [r["objects"] for r in thread_results]
@@ -0,0 +1,142 @@
+"""检测结果缓存测试"""
+
+import asyncio
+
+import pytest
+
+import app.utils.result_cache as result_cache_module
+from app.utils.result_cache import ResultCache, ResultCacheConfig
+
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(result_cache_module, "time", fake)
+    return fake
+
+
+def _compute(value, calls):
+    async def compute():
+        calls.append(value)
+        await asyncio.sleep(0)
+        return {"value": value, "object_count": 0}
+    return compute
+
+
+def test_make_key_normalizes_classes_and_threshold():
+    key = ResultCache.make_key(b"image", [2, 0, 2], 0.50001, "yolov8n/pytorch")
+
+    assert key == ResultCache.make_key(b"image", [0, 2], 0.5, "yolov8n/pytorch")
+    assert key != ResultCache.make_key(b"image", [0, 2], 0.5, "yolov8s/pytorch")
+    assert key != ResultCache.make_key(b"other", [0, 2], 0.5, "yolov8n/pytorch")
+    assert key != ResultCache.make_key(b"image", [0, 2], 0.5, "yolov8n/pytorch", return_annotated=False)
+
+
+def test_hit_after_miss(clock):
+    cache = ResultCache()
+    calls = []
+
+    async def scenario():
+        first = await cache.get_or_compute("k", _compute(1, calls))
+        second = await cache.get_or_compute("k", _compute(2, calls))
+        return first, second
+
+    (first, first_status), (second, second_status) = asyncio.run(scenario())
+
+    assert (first_status, second_status) == ("miss", "hit")
+    assert first == second == {"value": 1, "object_count": 0}
+    assert calls == [1]
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ResultCache(ResultCacheConfig(ttl_seconds=10))
+    calls = []
+
+    async def scenario():
+        await cache.get_or_compute("k", _compute(1, calls))
+        clock.now += 9
+        _, before = await cache.get_or_compute("k", _compute(2, calls))
+        clock.now += 2
+        _, after = await cache.get_or_compute("k", _compute(3, calls))
+        return before, after
+
+    assert asyncio.run(scenario()) == ("hit", "miss")
+    assert calls == [1, 3]
+    assert cache.get_stats()["expirations"] == 1
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = ResultCache(ResultCacheConfig(max_entries=2))
+    calls = []
+
+    async def scenario():
+        await cache.get_or_compute("a", _compute("a", calls))
+        await cache.get_or_compute("b", _compute("b", calls))
+        await cache.get_or_compute("a", _compute("a2", calls))  # a 变为最近使用
+        await cache.get_or_compute("c", _compute("c", calls))  # 淘汰 b
+        statuses = []
+        for key in ("a", "c", "b"):
+            _, status = await cache.get_or_compute(key, _compute(key, calls))
+            statuses.append(status)
+        return statuses
+
+    assert asyncio.run(scenario()) == ["hit", "hit", "miss"]
+    assert cache.get_stats()["entries"] == 2
+
+
+def test_concurrent_requests_share_one_computation(clock):
+    cache = ResultCache()
+    calls = []
+
+    async def scenario():
+        return await asyncio.gather(*[
+            cache.get_or_compute("k", _compute(i, calls)) for i in range(5)
+        ])
+
+    results = asyncio.run(scenario())
+
+    assert calls == [0]
+    assert sorted(status for _, status in results) == ["coalesced"] * 4 + ["miss"]
+    assert all(value == {"value": 0, "object_count": 0} for value, _ in results)
+    assert cache.get_stats()["inflight"] == 0
+
+
+def test_failures_are_not_cached(clock):
+    cache = ResultCache()
+    calls = []
+
+    async def failing():
+        calls.append("fail")
+        raise RuntimeError("boom")
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await cache.get_or_compute("k", failing)
+        return await cache.get_or_compute("k", _compute(1, calls))
+
+    _, status = asyncio.run(scenario())
+
+    assert status == "miss"
+    assert calls == ["fail", 1]
+
+
+def test_disabled_cache_always_computes(clock):
+    cache = ResultCache(ResultCacheConfig(enabled=False))
+    calls = []
+
+    async def scenario():
+        await cache.get_or_compute("k", _compute(1, calls))
+        return await cache.get_or_compute("k", _compute(2, calls))
+
+    assert asyncio.run(scenario()) == ({"value": 2, "object_count": 0}, "miss")
+    assert calls == [1, 2]
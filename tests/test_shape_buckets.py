@@ -0,0 +1,47 @@
+"""批处理器形状分桶测试"""
+
+import numpy as np
+
+from app.utils.batch_processor import BatchConfig, BatchProcessor
+
+
+def _processor(**config) -> BatchProcessor:
+    return BatchProcessor(detector=None, config=BatchConfig(**config))
+
+
+def _image(height: int, width: int) -> np.ndarray:
+    return np.zeros((height, width, 3), dtype=np.uint8)
+
+
+def test_images_are_bucketed_by_orientation_and_aspect_ratio():
+    images = [_image(480, 640), _image(640, 480), _image(360, 640), _image(960, 1280), _image(720, 1280)]
+
+    buckets = _processor().shape_buckets(images)
+
+    assert buckets == [
+        ((480, 640), [0, 3]),
+        ((640, 480), [1]),
+        ((416, 640), [2, 4]),
+    ]
+
+
+def test_inference_sizes_are_stride_aligned_and_cover_the_image_ratio():
+    processor = _processor(imgsz=640, stride=32)
+    images = [_image(h, w) for h, w in [(100, 640), (300, 500), (640, 640), (1000, 333)]]
+
+    for (height, width), indices in processor.shape_buckets(images):
+        assert height % 32 == 0 and width % 32 == 0
+        assert max(height, width) == 640
+        image = images[indices[0]]
+        image_ratio = min(image.shape[:2]) / max(image.shape[:2])
+        assert min(height, width) / 640 >= image_ratio
+
+
+def test_square_images_use_the_full_size():
+    assert _processor().shape_buckets([_image(500, 500)]) == [((640, 640), [0])]
+
+
+def test_bucketing_disabled_keeps_a_single_bucket():
+    images = [_image(480, 640), _image(640, 480)]
+
+    assert _processor(enable_shape_bucketing=False).shape_buckets(images) == [(None, [0, 1])]